@@ -0,0 +1,19 @@
+# app/api/dependencies.py
+
+import hmac
+from fastapi import Header, HTTPException, Query, status
+from typing import Optional
+from app.core.config import settings
+from app.core.profiling import TOKEN_HEADER, TOKEN_QUERY_PARAM
+
+def require_debug_token(
+    header_token: Optional[str] = Header(None, alias=TOKEN_HEADER),
+    query_token: Optional[str] = Query(None, alias=TOKEN_QUERY_PARAM, description=f"Debug token, for clients that cannot set the {TOKEN_HEADER} header."),
+):
+    """
+    Guards the /debug endpoints, whose traces and profiles hold request data such as query
+    text, with `PROFILING_TOKEN`. They stay closed while no token is set.
+    """
+    token = header_token or query_token
+    if not settings.PROFILING_TOKEN or token is None or not hmac.compare_digest(token.encode(), settings.PROFILING_TOKEN.encode()):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="A valid debug token is required.")
@@ -0,0 +1,41 @@
+# app/api/routers/debug.py
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import Any, Optional
+from app.api.dependencies import require_debug_token
+from app.core.tracing import get_tracer
+from app.api.schemas.debug import TraceListResponse, TraceResponse
+
+router = APIRouter(
+    prefix="/debug",
+    tags=["Debug"],
+    dependencies=[Depends(require_debug_token)],
+    responses={403: {"description": "Missing or invalid debug token"}, 404: {"description": "Not found"}},
+)
+
+tracer = get_tracer()
+
+@router.get("/traces", response_model=TraceListResponse, summary="List Recent Traces")
+async def list_traces(
+    limit: int = Query(50, gt=0, le=1000),
+    min_duration: float = Query(0.0, ge=0, description="Only traces that took at least this many seconds."),
+    name: Optional[str] = Query(None, description="Only traces whose root span name contains this, e.g. '/rag/query'."),
+) -> Any:
+    """
+    Summaries of the sampled requests kept in memory, newest first.
+    """
+    return TraceListResponse(
+        sample_rate=tracer.sample_rate,
+        traces=tracer.traces(limit=limit, min_duration=min_duration, name=name),
+    )
+
+@router.get("/traces/{trace_id}", response_model=TraceResponse, summary="Get a Trace Waterfall")
+async def get_trace(trace_id: str) -> Any:
+    """
+    Every span of a trace ordered by start time, with its depth in the tree and its offset
+    from the start of the request.
+    """
+    try:
+        return TraceResponse(**tracer.get_trace(trace_id))
+    except KeyError as ke:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(ke.args[0]))
@@ -1,24 +1,45 @@
 # app/api/routers/embeddings.py
 
-from fastapi import APIRouter, HTTPException, status
-import matplotlib
-matplotlib.use('Agg')
-from typing import Any
+from fastapi import APIRouter, HTTPException, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+import os
+# Select the non-interactive backend without importing matplotlib at startup
+os.environ["MPLBACKEND"] = "Agg"
+from typing import Any, Union
+from app.core.config import settings
+from app.helpers.encoding import as_float32_array, encode_base64, encode_embeddings, negotiate_encoding
+from app.helpers.plotting_helpers import IMAGE_FORMATS
 from app.services.embeddings import TextEmbeddingHandler
+from app.services.plotting import PlotRenderer
+from app.services.projection import ProjectionManager, create_projection
 from app.api.schemas.embeddings import (
     EmbeddingRequest,
     EmbeddingResponse,
+    EmbeddingBase64Response,
+    EmbeddingBatchRequest,
+    EmbeddingBatchResponse,
+    EmbeddingBatchBase64Response,
     SimilarityRequest,
     SimilarityResponse,
     DistanceResponse,
+    SimilarityMatrixRequest,
+    SimilarityMatrixResponse,
+    Neighbor,
+    PlotComparisonRequest,
+    ScatterPlotRequest,
     PlotResponse,
+    PlotCacheStatsResponse,
     EmbeddingCoordinatesRequest,
     EmbeddingCoordinatesResponse,
-    Coordinate
+    EmbeddingCacheStatsResponse,
+    Coordinate,
+    ProjectionInfo,
+    ProjectionListResponse,
+    SchedulerStatsResponse,
+    MicroBatcherStatsResponse
 )
 import base64
-import io
-import matplotlib.pyplot as plt
 
 router = APIRouter(
     prefix="/embeddings",
@@ -29,18 +50,122 @@ router = APIRouter(
 # Initialize the handler once
 embedding_handler = TextEmbeddingHandler()
 
-@router.post("/embed", response_model=EmbeddingResponse, summary="Generate Text Embedding")
-def generate_embedding(request: EmbeddingRequest) -> Any:
+# Shared plot renderer: worker processes start on the first plot request
+plot_renderer = PlotRenderer(
+    max_workers=settings.PLOT_WORKERS,
+    cache_max_bytes=settings.PLOT_CACHE_MAX_BYTES,
+)
+
+# Fitted embed-coordinates projections, persisted per id
+projection_manager = ProjectionManager(
+    persist_dir=settings.PROJECTION_DIR,
+    max_loaded=settings.PROJECTION_MAX_LOADED,
+)
+
+def plot_response(image: bytes, format: str, response_type: str) -> Any:
+    """
+    Returns the image as raw bytes with its media type, or base64-encoded in a JSON body.
+    """
+    if response_type == "raw":
+        return Response(content=image, media_type=IMAGE_FORMATS[format])
+    return PlotResponse(image_base64=base64.b64encode(image).decode("utf-8"), format=format)
+
+# Binary bodies documented for the embedding endpoints, next to the JSON response model
+BINARY_EMBEDDING_RESPONSES = {
+    200: {
+        "content": {
+            "application/octet-stream": {},
+            "application/msgpack": {},
+        },
+        "description": "JSON by default. 'Accept: application/octet-stream' returns a header (b'EMB1', dtype code, "
+                       "ndim, reserved, then one uint32 per dimension) followed by raw little-endian float32 values. "
+                       "'Accept: application/msgpack' returns a map with shape, dtype and the raw values as bytes.",
+    },
+    406: {"description": "Only msgpack is acceptable and msgpack is not installed."},
+}
+
+def embedding_encoding(http_request: Request) -> str:
+    """
+    Negotiates the response encoding from the Accept header, before any embedding is computed.
+    """
+    encoding = negotiate_encoding(http_request.headers.get("accept"))
+    if encoding is None:
+        raise HTTPException(
+            status_code=status.HTTP_406_NOT_ACCEPTABLE,
+            detail="msgpack responses need the 'msgpack' package. Accept application/json or application/octet-stream instead."
+        )
+    return encoding
+
+def embeddings_response(embeddings, encoding: str, field: str) -> Response:
+    """
+    Serializes embeddings straight to a response body for the binary and base64 encodings,
+    without building and validating a pydantic model of every float.
+    """
+    array = as_float32_array(embeddings)
+    if encoding != "json":
+        content, media_type = encode_embeddings(array, encoding)
+        return Response(content=content, media_type=media_type)
+    return JSONResponse({field: encode_base64(array), "dtype": "float32", "shape": list(array.shape)})
+
+@router.post(
+    "/embed",
+    response_model=Union[EmbeddingResponse, EmbeddingBase64Response],
+    responses=BINARY_EMBEDDING_RESPONSES,
+    summary="Generate Text Embedding"
+)
+async def generate_embedding(request: EmbeddingRequest, http_request: Request) -> Any:
     try:
-        embedding = embedding_handler.get_embedding(text=request.text, model=request.model)
+        encoding = embedding_encoding(http_request)
+        embedding = await embedding_handler.aget_embedding(text=request.text, model=request.model)
+        if encoding != "json" or request.encoding_format == "base64":
+            return embeddings_response(embedding, encoding, "embedding")
         return EmbeddingResponse(embedding=embedding)
+    except HTTPException:
+        raise
+    except ValueError as ve:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+@router.post(
+    "/embed-batch",
+    response_model=Union[EmbeddingBatchResponse, EmbeddingBatchBase64Response],
+    responses=BINARY_EMBEDDING_RESPONSES,
+    summary="Generate Text Embeddings in Batch"
+)
+async def generate_embeddings_batch(request: EmbeddingBatchRequest, http_request: Request) -> Any:
+    try:
+        if not request.texts:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="The 'texts' list cannot be empty."
+            )
+        encoding = embedding_encoding(http_request)
+        embeddings = await embedding_handler.aget_embeddings_batch(texts=request.texts, model=request.model)
+        if encoding != "json" or request.encoding_format == "base64":
+            return embeddings_response(embeddings, encoding, "embeddings")
+        return EmbeddingBatchResponse(embeddings=embeddings)
+    except HTTPException:
+        raise
     except ValueError as ve:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
+@router.get("/cache-stats", response_model=EmbeddingCacheStatsResponse, summary="Embedding Cache Statistics")
+async def cache_stats() -> Any:
+    return EmbeddingCacheStatsResponse(**await run_in_threadpool(embedding_handler.cache.stats))
+
+@router.get("/scheduler-stats", response_model=SchedulerStatsResponse, summary="Provider Request Scheduler Statistics")
+async def scheduler_stats() -> Any:
+    return SchedulerStatsResponse(limiters=embedding_handler.scheduler.stats())
+
+@router.get("/batcher-stats", response_model=MicroBatcherStatsResponse, summary="Embedding Micro-Batcher Statistics")
+async def batcher_stats() -> Any:
+    return MicroBatcherStatsResponse(batchers=embedding_handler.batcher_stats())
+
 @router.post("/cosine-similarity", response_model=SimilarityResponse, summary="Calculate Cosine Similarity")
-def cosine_similarity(request: SimilarityRequest) -> Any:
+async def cosine_similarity(request: SimilarityRequest) -> Any:
     try:
         similarity = embedding_handler.calculate_cosine_similarity(request.embedding1, request.embedding2)
         return SimilarityResponse(similarity=similarity)
@@ -48,38 +173,125 @@ def cosine_similarity(request: SimilarityRequest) -> Any:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 @router.post("/euclidean-distance", response_model=DistanceResponse, summary="Calculate Euclidean Distance")
-def euclidean_distance(request: SimilarityRequest) -> Any:
+async def euclidean_distance(request: SimilarityRequest) -> Any:
     try:
         distance = embedding_handler.calculate_euclidean_distance(request.embedding1, request.embedding2)
         return DistanceResponse(distance=distance)
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
+@router.post("/similarity-matrix", response_model=SimilarityMatrixResponse, summary="Calculate Pairwise Similarity Matrix")
+async def similarity_matrix(request: SimilarityMatrixRequest) -> Any:
+    """
+    API endpoint to score N queries against M candidates (or all pairs of the queries) in one call.
+    """
+    try:
+        if request.query_texts:
+            queries = await embedding_handler.aget_embeddings_batch(texts=request.query_texts, model=request.model)
+        else:
+            queries = request.query_embeddings
+        if request.candidate_texts:
+            candidates = await embedding_handler.aget_embeddings_batch(texts=request.candidate_texts, model=request.model)
+        else:
+            candidates = request.candidate_embeddings
+        if not queries:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Provide either 'query_embeddings' or 'query_texts'."
+            )
+
+        result = await run_in_threadpool(
+            embedding_handler.similarity_matrix,
+            queries,
+            candidates,
+            metric=request.metric,
+            top_k=request.top_k,
+        )
+
+        if request.top_k is None:
+            return SimilarityMatrixResponse(metric=request.metric, scores=result["scores"])
+        return SimilarityMatrixResponse(
+            metric=request.metric,
+            neighbors=[
+                [Neighbor(index=index, score=score) for index, score in zip(row_indices, row_scores)]
+                for row_indices, row_scores in zip(result["indices"], result["scores"])
+            ]
+        )
+    except HTTPException:
+        raise
+    except ValueError as ve:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
 @router.post("/plot-comparison", response_model=PlotResponse, summary="Plot Embedding Comparison")
-def plot_comparison(request: SimilarityRequest) -> Any:
+async def plot_comparison(request: PlotComparisonRequest) -> Any:
+    """
+    API endpoint to plot embedding comparison and return the image, base64-encoded or as raw bytes.
+    """
+    try:
+        # Rendering runs in the plot worker pool and identical inputs are served from cache
+        image = await plot_renderer.render(
+            "comparison",
+            request.format,
+            embedding1=request.embedding1,
+            embedding2=request.embedding2,
+        )
+        return plot_response(image, request.format, request.response_type)
+    except ValueError as ve:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+@router.post("/plot-scatter", response_model=PlotResponse, summary="Plot Embeddings in 2D")
+async def plot_scatter(request: ScatterPlotRequest) -> Any:
     """
-    API endpoint to plot embedding comparison and return a base64-encoded image.
+    API endpoint to plot embeddings (or texts, embedded first) as a 2D PCA scatter plot.
     """
     try:
-        # Plot the embeddings and get the base64-encoded image
-        image_base64 = embedding_handler.plot_embedding_comparison(
-            request.embedding1, 
-            request.embedding2, 
-            type="base64"  # Use base64 output from the plotting function
+        embeddings = request.embeddings
+        if embeddings is None and request.texts:
+            embeddings = await embedding_handler.aget_embeddings_batch(texts=request.texts, model=request.model)
+        if not embeddings:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Provide either 'embeddings' or 'texts'."
+            )
+        if request.labels is not None and len(request.labels) != len(embeddings):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="'labels' must have one entry per embedding."
+            )
+
+        image = await plot_renderer.render(
+            "scatter",
+            request.format,
+            embeddings=embeddings,
+            labels=request.labels,
         )
-        
-        return PlotResponse(image_base64=image_base64)
+        return plot_response(image, request.format, request.response_type)
+    except HTTPException:
+        raise
+    except ValueError as ve:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
+@router.get("/plot-cache-stats", response_model=PlotCacheStatsResponse, summary="Rendered Plot Cache Statistics")
+async def plot_cache_stats() -> Any:
+    return PlotCacheStatsResponse(**plot_renderer.stats())
+
 @router.post(
     "/embed-coordinates",
     response_model=EmbeddingCoordinatesResponse,
     summary="Generate Embedding Coordinates from a List of Texts"
 )
-def embed_coordinates(request: EmbeddingCoordinatesRequest) -> Any:
+async def embed_coordinates(request: EmbeddingCoordinatesRequest) -> Any:
     """
-    API endpoint to generate 2D coordinates for a list of input texts.
+    API endpoint to generate 2D or 3D coordinates for a list of input texts.
+
+    With a `projection_id`, the fitted projection is kept: later requests only embed and
+    project their new texts into the same space instead of refitting on everything.
     """
     try:
         if not request.texts:
@@ -87,29 +299,76 @@ def embed_coordinates(request: EmbeddingCoordinatesRequest) -> Any:
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="The 'texts' list cannot be empty."
             )
-        
-        embeddings = []
-        for text in request.texts:
-            embedding = embedding_handler.get_embedding(text=text, model=request.model)
-            embeddings.append(embedding)
-        
-        # Use scatter_plot_embeddings to get 2D coordinates
-        coordinates_list = embedding_handler.scatter_plot_embeddings(
-            embeddings=embeddings,
-            response_type="coordinates"
-        )
-        
+
+        embeddings = await embedding_handler.aget_embeddings_batch(texts=request.texts, model=request.model)
+
+        # Fitting and projecting run off the event loop
+        fitted = request.projection_id is None or request.refit or not projection_manager.exists(request.projection_id)
+        if request.projection_id is None:
+            projection = create_projection(request.method, n_components=request.n_components)
+            coordinates = await run_in_threadpool(projection.fit, embeddings)
+        elif fitted:
+            projection, coordinates = await run_in_threadpool(
+                projection_manager.create, request.projection_id, embeddings,
+                method=request.method, n_components=request.n_components, model=request.model
+            )
+        else:
+            projection, coordinates = await run_in_threadpool(
+                projection_manager.project, request.projection_id, embeddings,
+                update=request.update, model=request.model
+            )
+
         # Combine texts with their coordinates
-        coordinates_response = EmbeddingCoordinatesResponse(
+        return EmbeddingCoordinatesResponse(
             coordinates=[
-                Coordinate(text=text, x=coord["x"], y=coord["y"]) 
-                for text, coord in zip(request.texts, coordinates_list)
-            ]
+                Coordinate(text=text, x=coord[0], y=coord[1], z=coord[2] if len(coord) > 2 else None)
+                for text, coord in zip(request.texts, coordinates.tolist())
+            ],
+            projection_id=request.projection_id,
+            method=projection.method,
+            fitted=fitted,
+            n_seen=projection.n_seen,
         )
-        
-        return coordinates_response
 
+    except HTTPException:
+        raise
     except ValueError as ve:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
+    except KeyError as ke:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(ke.args[0]))
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+def projection_info(projection_id: str, info: dict) -> ProjectionInfo:
+    return ProjectionInfo(
+        projection_id=projection_id,
+        **{key: info.get(key) for key in ("method", "n_components", "dim", "n_seen", "model", "explained_variance")}
+    )
+
+@router.get("/projections", response_model=ProjectionListResponse, summary="List Saved Projections")
+async def list_projections() -> Any:
+    projections = await run_in_threadpool(projection_manager.list)
+    return ProjectionListResponse(
+        projections=[projection_info(projection_id, info) for projection_id, info in projections.items()]
+    )
+
+@router.get("/projections/{projection_id}", response_model=ProjectionInfo, summary="Get a Saved Projection")
+async def get_projection(projection_id: str) -> Any:
+    try:
+        projection, model = await run_in_threadpool(projection_manager.get, projection_id)
+        return projection_info(projection_id, {**projection.info(), "model": model})
+    except ValueError as ve:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
+    except KeyError as ke:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(ke.args[0]))
+
+@router.delete("/projections/{projection_id}", response_model=ProjectionInfo, summary="Delete a Saved Projection")
+async def delete_projection(projection_id: str) -> Any:
+    try:
+        projection, model = await run_in_threadpool(projection_manager.get, projection_id)
+        await run_in_threadpool(projection_manager.drop, projection_id)
+        return projection_info(projection_id, {**projection.info(), "model": model})
+    except ValueError as ve:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
+    except KeyError as ke:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(ke.args[0]))
@@ -1,13 +1,24 @@
 # app/api/routers/indexer.py
 
-from fastapi import APIRouter, HTTPException, status
-from typing import Any
+import json
+from itertools import chain
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from typing import Any, Optional
+from app.core.config import settings
+from app.core.logging_config import setup_logging
 from app.services.indexer import NaiveIndexer
+from app.services.jobs import JobManager
 from app.api.schemas.indexer import (
     QueryRequest,
-    QueryResponse
+    QueryResponse,
+    SemanticCacheStatsResponse,
+    JobRequest,
+    JobResponse,
+    JobListResponse
 )
 
+logger = setup_logging()
 
 router = APIRouter(
     prefix="/rag",
@@ -15,27 +26,106 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
-# Initialize the handler once
+# Initialize the handler once; ingestion runs as background jobs instead of at import time
 indexer = NaiveIndexer()
-indexer.persist()
+job_manager = JobManager()
 
-@router.post("/query", response_model=QueryResponse, summary="Generate Text Embedding")
-def generate_embedding(request: QueryRequest) -> Any:
+JOB_FUNCTIONS = {
+    "persist": indexer.run_persist_job,
+    "ingest": indexer.run_ingest_job,
+}
+
+def submit_startup_ingestion():
+    """
+    Queues a persist job when no docstore exists yet. Workers that find one, or that lose the
+    race to another worker's job, reuse the persisted docstore instead of re-parsing the PDFs.
+    """
+    if settings.INGEST_ON_STARTUP and not indexer.has_persisted():
+        logger.info("No persisted docstore found, queueing a background persist job")
+        job_manager.submit("persist", indexer.run_persist_job, params={"only_if_missing": True})
+
+def format_ndjson(event: dict) -> str:
+    return json.dumps(event) + "\n"
+
+def format_sse(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+def stream_events(first_event: dict, events, formatter):
+    """
+    Serializes the query events, turning a failure mid-stream into a final "error" event since
+    the status code has already been sent.
+    """
     try:
-        answer = indexer.query(question=request.question)
-        return QueryResponse(answer=str(answer))
-    except ValueError as ve:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
+        for event in chain([first_event], events):
+            yield formatter(event)
     except Exception as e:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
-    
+        logger.error(f"Streaming query failed: {e}")
+        yield formatter({"type": "error", "detail": str(e)})
 
-@router.post("/persist", response_model=QueryResponse, summary="Generate Text Embedding")
-def generate_embedding(request: QueryRequest) -> Any:
+@router.post("/query", response_model=QueryResponse, summary="Generate Text Embedding")
+def generate_embedding(request: QueryRequest, http_request: Request) -> Any:
+    """
+    Answers a question over the ingested documents.
+
+    With `stream` set, the response is streamed instead: a "sources" event with the retrieved
+    nodes, one "token" event per generated token and a final "done" event with timings.
+    """
     try:
-        indexer.persist()
-        return QueryResponse(answer='DONE')
+        if request.stream:
+            events = indexer.stream_query(question=request.question, retrieval_mode=request.retrieval_mode)
+            # Run retrieval before responding so setup and retrieval errors still map to a status code
+            first_event = next(events)
+            if "text/event-stream" in http_request.headers.get("accept", ""):
+                return StreamingResponse(stream_events(first_event, events, format_sse), media_type="text/event-stream")
+            return StreamingResponse(stream_events(first_event, events, format_ndjson), media_type="application/x-ndjson")
+
+        return QueryResponse(**indexer.query(question=request.question, retrieval_mode=request.retrieval_mode))
     except ValueError as ve:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@router.get("/cache-stats", response_model=SemanticCacheStatsResponse, summary="Semantic Answer Cache Statistics")
+def cache_stats() -> Any:
+    if indexer.cache is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="The semantic cache is disabled.")
+    return SemanticCacheStatsResponse(**indexer.cache.stats())
+
+@router.delete("/cache", response_model=SemanticCacheStatsResponse, summary="Clear the Semantic Answer Cache")
+def clear_cache() -> Any:
+    if indexer.cache is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="The semantic cache is disabled.")
+    indexer.cache.invalidate()
+    return SemanticCacheStatsResponse(**indexer.cache.stats())
+
+@router.post("/persist", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED, summary="Persist and Ingest the PDFs")
+def persist(request: Optional[QueryRequest] = None) -> Any:
+    """
+    Queues a background persist job and returns it; poll `/rag/jobs/{id}` for progress.
+    """
+    job = job_manager.submit("persist", JOB_FUNCTIONS["persist"])
+    return JobResponse(**job.to_dict())
+
+@router.post("/jobs", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED, summary="Submit an Ingestion Job")
+def submit_job(request: JobRequest) -> Any:
+    job = job_manager.submit(request.kind, JOB_FUNCTIONS[request.kind])
+    return JobResponse(**job.to_dict())
+
+@router.get("/jobs", response_model=JobListResponse, summary="List Ingestion Jobs")
+def list_jobs() -> Any:
+    return JobListResponse(jobs=[JobResponse(**job.to_dict()) for job in job_manager.list()])
+
+@router.get("/jobs/{job_id}", response_model=JobResponse, summary="Get Ingestion Job Status")
+def get_job(job_id: str) -> Any:
+    try:
+        return JobResponse(**job_manager.get(job_id).to_dict())
+    except KeyError as ke:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(ke.args[0]))
+
+@router.delete("/jobs/{job_id}", response_model=JobResponse, summary="Cancel an Ingestion Job")
+def cancel_job(job_id: str) -> Any:
+    try:
+        return JobResponse(**job_manager.cancel(job_id).to_dict())
+    except KeyError as ke:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(ke.args[0]))
@@ -0,0 +1,55 @@
+# app/api/routers/metrics.py
+
+from fastapi import APIRouter, Response
+from app.core.metrics import CONTENT_TYPE, REGISTRY, stats_collector
+from app.api.routers.embeddings import embedding_handler, plot_renderer
+from app.api.routers.indexer import indexer
+
+router = APIRouter(
+    tags=["Metrics"],
+)
+
+
+def cache_stats() -> dict:
+    embedding = embedding_handler.cache.stats()
+    stats = {
+        "embedding": {**embedding, "entries": embedding["memory_entries"], "bytes": embedding["memory_bytes"]},
+        "plot": plot_renderer.stats(),
+    }
+    if indexer.cache is not None:
+        stats["semantic"] = indexer.cache.stats()
+    return stats
+
+
+# Cache, batcher and scheduler statistics are kept by the services and only read when scraped
+REGISTRY.register_collector(stats_collector("cache", "cache", cache_stats, {
+    "hits": ("hits_total", "counter", "Cache lookups answered from the cache"),
+    "misses": ("misses_total", "counter", "Cache lookups that missed"),
+    "evictions": ("evictions_total", "counter", "Entries evicted to stay within the cache budget"),
+    "hit_ratio": ("hit_ratio", "gauge", "Share of lookups answered from the cache"),
+    "entries": ("entries", "gauge", "Entries held in memory"),
+    "bytes": ("bytes", "gauge", "Bytes held in memory"),
+}))
+
+REGISTRY.register_collector(stats_collector("micro_batcher", "model", embedding_handler.batcher_stats, {
+    "requests": ("requests_total", "counter", "Single-text embed requests submitted"),
+    "batches": ("batches_total", "counter", "Batch calls sent to the provider"),
+    "mean_fill": ("mean_fill", "gauge", "Mean share of the batch size filled per call"),
+    "mean_added_latency_seconds": ("mean_added_latency_seconds", "gauge", "Mean time the first request of a batch waited"),
+    "pending": ("pending", "gauge", "Texts waiting for the next batch"),
+}))
+
+REGISTRY.register_collector(stats_collector("provider_limiter", "provider", embedding_handler.scheduler.stats, {
+    "queued": ("queued", "gauge", "Calls waiting for provider quota"),
+    "in_flight": ("in_flight", "gauge", "Provider calls in flight"),
+    "coalesced": ("coalesced_total", "counter", "Calls answered by an identical call already in flight"),
+    "paused_for": ("paused_seconds", "gauge", "Seconds left of a pause after a 429"),
+}))
+
+
+@router.get("/metrics", summary="Prometheus Metrics", response_class=Response)
+def metrics() -> Response:
+    """
+    Request, provider, RAG stage, plot and cache metrics in the Prometheus text format.
+    """
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
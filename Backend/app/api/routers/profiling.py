@@ -0,0 +1,55 @@
+# app/api/routers/profiling.py
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import FileResponse
+from typing import Any, Literal
+from app.api.dependencies import require_debug_token
+from app.core.profiling import get_profiler
+from app.api.schemas.profiling import ProfileListResponse, ProfileResponse
+
+profiler = get_profiler()
+
+router = APIRouter(
+    prefix="/debug",
+    tags=["Debug"],
+    dependencies=[Depends(require_debug_token)],
+    responses={403: {"description": "Missing or invalid debug token"}, 404: {"description": "Not found"}},
+)
+
+@router.get("/profiles", response_model=ProfileListResponse, summary="List Request Profiles")
+async def list_profiles(limit: int = Query(50, gt=0, le=1000)) -> Any:
+    """
+    The stored request profiles, newest first.
+    """
+    return ProfileListResponse(
+        profiler=profiler.mode,
+        sample_rate=profiler.sample_rate,
+        min_interval=profiler.min_interval,
+        profiles=profiler.store.list()[:limit],
+    )
+
+@router.get("/profiles/{profile_id}", response_model=ProfileResponse, summary="Get a Request Profile")
+async def get_profile(profile_id: str) -> Any:
+    """
+    A profile's hottest functions and, when memory was profiled, the source lines that
+    allocated the most memory during the request.
+    """
+    try:
+        return ProfileResponse(**profiler.store.get(profile_id))
+    except KeyError as ke:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(ke.args[0]))
+
+@router.get("/profiles/{profile_id}/{kind}", response_class=FileResponse, summary="Download a Profile Artifact")
+async def get_profile_artifact(profile_id: str, kind: Literal["svg", "folded", "pstats"]) -> Any:
+    """
+    Downloads a profile artifact:
+
+    - **svg**: flamegraph, viewable in a browser.
+    - **folded**: collapsed stacks, for flamegraph.pl or speedscope.
+    - **pstats**: cProfile statistics, for `python -m pstats` or snakeviz.
+    """
+    try:
+        path, media_type = profiler.store.artifact(profile_id, kind)
+        return FileResponse(path, media_type=media_type, filename=f"{profile_id}.{kind}")
+    except KeyError as ke:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(ke.args[0]))
@@ -0,0 +1,139 @@
+# app/api/routers/vector_index.py
+
+from fastapi import APIRouter, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from typing import Any
+from app.core.config import settings
+from app.services.vector_index import VectorIndexManager
+from app.api.routers.embeddings import embedding_handler
+from app.api.schemas.vector_index import (
+    IndexCreateRequest,
+    IndexInfo,
+    IndexListResponse,
+    IndexAddRequest,
+    IndexDeleteRequest,
+    IndexUpdateResponse,
+    IndexSearchRequest,
+    IndexSearchResponse,
+    IndexPersistResponse,
+    SearchHit
+)
+
+router = APIRouter(
+    prefix="/index",
+    tags=["Vector Index"],
+    responses={404: {"description": "Not found"}},
+)
+
+# Initialize the manager once
+index_manager = VectorIndexManager(persist_dir=settings.VECTOR_INDEX_DIR)
+
+def _get_index(name: str):
+    try:
+        return index_manager.get(name)
+    except KeyError as ke:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(ke.args[0]))
+
+@router.get("", response_model=IndexListResponse, summary="List Indexes")
+async def list_indexes() -> Any:
+    return IndexListResponse(
+        indexes=[IndexInfo(name=name, **info) for name, info in index_manager.list().items()]
+    )
+
+@router.post("/{name}", response_model=IndexInfo, summary="Create Index")
+async def create_index(name: str, request: IndexCreateRequest) -> Any:
+    try:
+        params = {}
+        if request.backend == "ivf":
+            params = {key: value for key, value in (("nlist", request.nlist), ("nprobe", request.nprobe)) if value}
+        index = index_manager.create(
+            name, backend=request.backend, metric=request.metric,
+            quantization=request.quantization, rescore=request.rescore, **params
+        )
+        return IndexInfo(name=name, **index.info())
+    except ValueError as ve:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
+
+@router.delete("/{name}", response_model=IndexInfo, summary="Drop Index")
+async def drop_index(name: str) -> Any:
+    index = _get_index(name)
+    index_manager.drop(name)
+    return IndexInfo(name=name, **index.info())
+
+@router.post("/{name}/add", response_model=IndexUpdateResponse, summary="Add Vectors or Texts to an Index")
+async def add_to_index(name: str, request: IndexAddRequest) -> Any:
+    index = _get_index(name)
+    try:
+        if not request.items:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="The 'items' list cannot be empty.")
+        if any(item.vector is None and item.text is None for item in request.items):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Every item needs a 'vector' or a 'text'.")
+
+        texts = [item.text for item in request.items if item.vector is None]
+        embedded = iter(await embedding_handler.aget_embeddings_batch(texts=texts, model=request.model) if texts else [])
+        vectors = [item.vector if item.vector is not None else next(embedded) for item in request.items]
+        metadata = [
+            {**(item.metadata or {}), **({"text": item.text} if item.text is not None else {})} or None
+            for item in request.items
+        ]
+
+        count = await run_in_threadpool(index.add, [item.id for item in request.items], vectors, metadata)
+        return IndexUpdateResponse(count=count, size=len(index))
+    except HTTPException:
+        raise
+    except ValueError as ve:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+@router.post("/{name}/delete", response_model=IndexUpdateResponse, summary="Delete Vectors from an Index")
+async def delete_from_index(name: str, request: IndexDeleteRequest) -> Any:
+    index = _get_index(name)
+    count = await run_in_threadpool(index.delete, request.ids)
+    return IndexUpdateResponse(count=count, size=len(index))
+
+@router.post("/{name}/search", response_model=IndexSearchResponse, summary="Search an Index")
+async def search_index(name: str, request: IndexSearchRequest) -> Any:
+    index = _get_index(name)
+    try:
+        if request.texts:
+            queries = await embedding_handler.aget_embeddings_batch(texts=request.texts, model=request.model)
+        else:
+            queries = request.vectors
+        if not queries:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Provide either 'vectors' or 'texts'.")
+
+        results = await run_in_threadpool(index.search, queries, request.k)
+        return IndexSearchResponse(
+            results=[
+                [SearchHit(id=item_id, score=score, metadata=index.metadata.get(item_id)) for item_id, score in hits]
+                for hits in results
+            ]
+        )
+    except HTTPException:
+        raise
+    except ValueError as ve:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+@router.post("/{name}/save", response_model=IndexPersistResponse, summary="Save an Index to Disk")
+async def save_index(name: str) -> Any:
+    index = _get_index(name)
+    try:
+        path = await run_in_threadpool(index_manager.save, name)
+        return IndexPersistResponse(name=name, path=path, size=len(index))
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+@router.post("/{name}/load", response_model=IndexPersistResponse, summary="Load an Index from Disk")
+async def load_index(name: str) -> Any:
+    try:
+        index = await run_in_threadpool(index_manager.load, name)
+        return IndexPersistResponse(name=name, path=index_manager.path(name), size=len(index))
+    except KeyError as ke:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(ke.args[0]))
+    except ValueError as ve:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
@@ -0,0 +1,37 @@
+# app/api/schemas/debug.py
+
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+
+class TraceSummary(BaseModel):
+    trace_id: str
+    name: str
+    start: float
+    duration: Optional[float] = None
+    spans: int
+    dropped_spans: int = 0
+    error: Optional[str] = None
+    attributes: Dict[str, Any] = {}
+
+class TraceListResponse(BaseModel):
+    sample_rate: float
+    traces: List[TraceSummary]
+
+class SpanInfo(BaseModel):
+    span_id: str
+    parent_id: Optional[str] = None
+    name: str
+    start: float
+    offset: float
+    duration: Optional[float] = None
+    depth: int
+    thread: str
+    error: Optional[str] = None
+    attributes: Dict[str, Any] = {}
+
+class TraceResponse(BaseModel):
+    trace_id: str
+    name: str
+    duration: Optional[float] = None
+    dropped_spans: int = 0
+    spans: List[SpanInfo]
@@ -1,15 +1,39 @@
 # app/api/schemas/embeddings.py
 
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Dict, List, Literal, Optional
+
+ENCODING_FORMAT_DESCRIPTION = (
+    "'float' for JSON number lists, 'base64' for the little-endian float32 bytes as a base64 string. "
+    "Send 'Accept: application/octet-stream' or 'application/msgpack' for a binary body instead."
+)
 
 class EmbeddingRequest(BaseModel):
     text: str = Field(..., example="Sample text to embed")
     model: Optional[str] = Field("light", example="v3")  # Default to 'light'
+    encoding_format: Literal["float", "base64"] = Field("float", description=ENCODING_FORMAT_DESCRIPTION)
 
 class EmbeddingResponse(BaseModel):
     embedding: List[float]
 
+class EmbeddingBase64Response(BaseModel):
+    embedding: str = Field(..., description="Base64 of the little-endian float32 values.")
+    dtype: str = "float32"
+    shape: List[int]
+
+class EmbeddingBatchRequest(BaseModel):
+    texts: List[str] = Field(..., example=["Hello world", "FastAPI is great"])
+    model: Optional[str] = Field("light", description="Model to use for embedding generation. Options: 'v3', 'light', 'v2', 'openai', 'local' (see EMBEDDING_MODELS).")
+    encoding_format: Literal["float", "base64"] = Field("float", description=ENCODING_FORMAT_DESCRIPTION)
+
+class EmbeddingBatchResponse(BaseModel):
+    embeddings: List[List[float]]
+
+class EmbeddingBatchBase64Response(BaseModel):
+    embeddings: str = Field(..., description="Base64 of the little-endian float32 (n, dim) matrix in row-major order.")
+    dtype: str = "float32"
+    shape: List[int]
+
 class SimilarityRequest(BaseModel):
     embedding1: List[float] = Field(..., example=[0.1, 0.2, 0.3])
     embedding2: List[float] = Field(..., example=[0.4, 0.5, 0.6])
@@ -17,20 +41,135 @@ class SimilarityRequest(BaseModel):
 class SimilarityResponse(BaseModel):
     similarity: float
 
+class SimilarityMatrixRequest(BaseModel):
+    query_embeddings: Optional[List[List[float]]] = Field(None, example=[[0.1, 0.2, 0.3]])
+    candidate_embeddings: Optional[List[List[float]]] = Field(None, example=[[0.4, 0.5, 0.6], [0.1, 0.2, 0.2]])
+    query_texts: Optional[List[str]] = Field(None, description="Texts to embed as queries, instead of query_embeddings.")
+    candidate_texts: Optional[List[str]] = Field(None, description="Texts to embed as candidates, instead of candidate_embeddings.")
+    model: Optional[str] = Field("light", description="Model used when texts are given. Options: 'v3', 'light', 'v2', 'openai', 'local' (see EMBEDDING_MODELS).")
+    metric: Literal["cosine", "dot", "l2"] = Field("cosine", description="Similarity (cosine, dot) or distance (l2).")
+    top_k: Optional[int] = Field(None, gt=0, description="Return only the k best candidates per query instead of the full matrix.")
+
+class Neighbor(BaseModel):
+    index: int
+    score: float
+
+class SimilarityMatrixResponse(BaseModel):
+    metric: str
+    scores: Optional[List[List[float]]] = None
+    neighbors: Optional[List[List[Neighbor]]] = None
+
 class DistanceResponse(BaseModel):
     distance: float
 
+class PlotComparisonRequest(SimilarityRequest):
+    format: Literal["png", "svg", "webp"] = Field("png", description="Image format of the plot.")
+    response_type: Literal["base64", "raw"] = Field(
+        "base64", description="'base64' for a JSON body, 'raw' for the image bytes with their media type."
+    )
+
+class ScatterPlotRequest(BaseModel):
+    embeddings: Optional[List[List[float]]] = Field(None, example=[[0.1, 0.2, 0.3], [0.4, 0.5, 0.6]])
+    texts: Optional[List[str]] = Field(None, description="Texts to embed and plot, instead of embeddings.")
+    labels: Optional[List[str]] = Field(None, description="Optional label per point, used for coloring.")
+    model: Optional[str] = Field("light", description="Model used when texts are given. Options: 'v3', 'light', 'v2', 'openai', 'local' (see EMBEDDING_MODELS).")
+    format: Literal["png", "svg", "webp"] = Field("png", description="Image format of the plot.")
+    response_type: Literal["base64", "raw"] = Field(
+        "base64", description="'base64' for a JSON body, 'raw' for the image bytes with their media type."
+    )
+
 class PlotResponse(BaseModel):
     image_base64: str  # Base64 encoded image
+    format: str = "png"
+
+class PlotCacheStatsResponse(BaseModel):
+    hits: int
+    misses: int
+    evictions: int
+    hit_ratio: float
+    entries: int
+    bytes: int
+    max_bytes: int
 
 class EmbeddingCoordinatesRequest(BaseModel):
     texts: List[str] = Field(..., example=["Hello world", "FastAPI is great"])
-    model: Optional[str] = Field("light", description="Model to use for embedding generation. Options: 'v3', 'light', 'v2'.")
+    model: Optional[str] = Field("light", description="Model to use for embedding generation. Options: 'v3', 'light', 'v2', 'openai', 'local' (see EMBEDDING_MODELS).")
+    projection_id: Optional[str] = Field(
+        None, description="Saved projection to use. It is fitted on these texts if it does not exist yet, "
+                          "otherwise the texts are projected into its existing space. Without an id, a throwaway projection is fitted."
+    )
+    method: Literal["pca", "incremental_pca", "umap", "tsne"] = Field("pca", description="Projection method used when fitting.")
+    n_components: Literal[2, 3] = Field(2, description="2D or 3D coordinates, used when fitting.")
+    update: bool = Field(False, description="Also fold the texts into an existing projection, which moves earlier points slightly.")
+    refit: bool = Field(False, description="Refit an existing projection from scratch on these texts.")
 
 class Coordinate(BaseModel):
     text: str
     x: float
     y: float
+    z: Optional[float] = None
 
 class EmbeddingCoordinatesResponse(BaseModel):
-    coordinates: List[Coordinate]
\ No newline at end of file
+    coordinates: List[Coordinate]
+    projection_id: Optional[str] = None
+    method: str = "pca"
+    fitted: bool = Field(True, description="Whether the projection was fitted by this request.")
+    n_seen: int = Field(0, description="Embeddings the projection has been fitted or updated with.")
+
+class ProjectionInfo(BaseModel):
+    projection_id: str
+    method: str
+    n_components: int
+    dim: Optional[int] = None
+    n_seen: int
+    model: Optional[str] = None
+    explained_variance: Optional[List[float]] = None
+
+class ProjectionListResponse(BaseModel):
+    projections: List[ProjectionInfo]
+
+class EmbeddingCacheStatsResponse(BaseModel):
+    hits: int
+    disk_hits: int
+    misses: int
+    evictions: int
+    disk_evictions: int
+    hit_ratio: float
+    memory_entries: int
+    memory_bytes: int
+    memory_max_bytes: int
+    disk_entries: int
+    disk_bytes: int
+
+class ProviderLimiterStats(BaseModel):
+    rpm: Optional[float] = None
+    tpm: Optional[float] = None
+    queued: int
+    in_flight: int
+    admitted: int
+    retries: int
+    throttled: int
+    failures: int
+    coalesced: int
+    wait_seconds: float
+    paused_for: float
+
+class SchedulerStatsResponse(BaseModel):
+    limiters: Dict[str, ProviderLimiterStats]
+
+class MicroBatcherStats(BaseModel):
+    max_batch_size: int
+    max_delay_seconds: float
+    requests: int
+    batches: int
+    full_batches: int
+    errors: int
+    pending: int
+    in_flight: int
+    requests_per_batch: float
+    mean_fill: float
+    mean_added_latency_seconds: float
+    max_added_latency_seconds: float
+
+class MicroBatcherStatsResponse(BaseModel):
+    batchers: Dict[str, MicroBatcherStats]
@@ -1,11 +1,56 @@
 # app/api/schemas/indexer.py
 
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Any, Dict, List, Literal, Optional
 
 class QueryRequest(BaseModel):
     question: str = Field(..., example="What is self attention?")
     model: Optional[str] = Field("light", example="v3")  # Default to 'light'
+    retrieval_mode: Optional[Literal["dense", "sparse", "hybrid"]] = Field(
+        None, description="'dense' (vectors), 'sparse' (BM25) or 'hybrid' (both, fused by reciprocal rank). Defaults to RAG_RETRIEVAL_MODE."
+    )
+    stream: bool = Field(
+        False, description="Stream the answer: the source nodes first, then the tokens as they are generated. "
+                           "NDJSON by default, server-sent events when the request accepts 'text/event-stream'."
+    )
 
 class QueryResponse(BaseModel):
-    answer: str
\ No newline at end of file
+    answer: str
+    sources: List[Dict[str, Any]] = []
+    cached: bool = Field(False, description="Whether the answer was served from the semantic cache")
+
+class SemanticCacheStatsResponse(BaseModel):
+    hits: int
+    exact_hits: int
+    semantic_hits: int
+    misses: int
+    hit_ratio: float
+    evictions: int
+    expirations: int
+    invalidations: int
+    entries: int
+    max_entries: int
+    threshold: float
+    ttl_seconds: Optional[float] = None
+    saved_seconds: float = Field(..., description="Generation time saved by cache hits, in seconds")
+
+class JobRequest(BaseModel):
+    kind: Literal["persist", "ingest"] = Field(
+        "persist", description="'persist' extracts the PDFs and ingests them, 'ingest' only re-ingests the persisted docstore."
+    )
+
+class JobResponse(BaseModel):
+    id: str
+    kind: str
+    status: str
+    cancel_requested: bool = False
+    params: Dict[str, Any] = {}
+    progress: Dict[str, Any] = {}
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+class JobListResponse(BaseModel):
+    jobs: List[JobResponse]
@@ -0,0 +1,33 @@
+# app/api/schemas/profiling.py
+
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+
+class Allocation(BaseModel):
+    location: str
+    size_diff: int
+    count_diff: int
+
+class ProfileSummary(BaseModel):
+    profile_id: str
+    method: str
+    path: str
+    route: Optional[str] = None
+    status: Optional[int] = None
+    trigger: str
+    profiler: str
+    started: float
+    duration: Optional[float] = None
+    artifacts: List[str] = []
+
+class ProfileListResponse(BaseModel):
+    profiler: str
+    sample_rate: float
+    min_interval: float
+    profiles: List[ProfileSummary]
+
+class ProfileResponse(ProfileSummary):
+    samples: Optional[int] = None
+    interval: Optional[float] = None
+    top_functions: List[Dict[str, Any]] = []
+    allocations: List[Allocation] = []
@@ -0,0 +1,66 @@
+# app/api/schemas/vector_index.py
+
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Literal, Optional
+
+class IndexCreateRequest(BaseModel):
+    backend: Literal["exact", "ivf"] = Field("exact", description="'exact' for brute-force search, 'ivf' for approximate search.")
+    metric: Literal["cosine", "dot", "l2"] = Field("cosine")
+    nlist: Optional[int] = Field(None, gt=0, description="IVF only: number of coarse cells.")
+    nprobe: Optional[int] = Field(None, gt=0, description="IVF only: number of cells scanned per query.")
+    quantization: Literal["none", "float16", "int8", "binary"] = Field(
+        "none", description="Compressed representation scanned by searches: float16, int8 with a per-vector scale, or sign bits compared by Hamming distance."
+    )
+    rescore: int = Field(
+        4, ge=0, description="Quantized indexes only: rescore the best k * rescore candidates against the float32 vectors (0 keeps only the codes)."
+    )
+
+class IndexInfo(BaseModel):
+    name: str
+    backend: str
+    metric: str
+    dim: Optional[int] = None
+    size: int
+    quantization: str = "none"
+    rescore: int = 0
+    memory_bytes: int = 0
+    params: Dict[str, Any] = {}
+
+class IndexListResponse(BaseModel):
+    indexes: List[IndexInfo]
+
+class IndexItem(BaseModel):
+    id: str = Field(..., example="doc-1")
+    vector: Optional[List[float]] = Field(None, description="Embedding to store. Omit to embed 'text' instead.")
+    text: Optional[str] = Field(None, example="Sample text to index")
+    metadata: Optional[Dict[str, Any]] = None
+
+class IndexAddRequest(BaseModel):
+    items: List[IndexItem]
+    model: Optional[str] = Field("light", description="Model used for items given as text. Options: 'v3', 'light', 'v2', 'openai', 'local' (see EMBEDDING_MODELS).")
+
+class IndexDeleteRequest(BaseModel):
+    ids: List[str]
+
+class IndexUpdateResponse(BaseModel):
+    count: int
+    size: int
+
+class IndexSearchRequest(BaseModel):
+    vectors: Optional[List[List[float]]] = Field(None, example=[[0.1, 0.2, 0.3]])
+    texts: Optional[List[str]] = Field(None, example=["What is self attention?"])
+    model: Optional[str] = Field("light", description="Model used when queries are given as text. Options: 'v3', 'light', 'v2', 'openai', 'local' (see EMBEDDING_MODELS).")
+    k: int = Field(10, gt=0)
+
+class SearchHit(BaseModel):
+    id: str
+    score: float
+    metadata: Optional[Dict[str, Any]] = None
+
+class IndexSearchResponse(BaseModel):
+    results: List[List[SearchHit]]
+
+class IndexPersistResponse(BaseModel):
+    name: str
+    path: str
+    size: int
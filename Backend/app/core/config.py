@@ -1,4 +1,5 @@
 import os
+from typing import Any, Dict, Literal, Optional
 from pydantic_settings import BaseSettings
 from pydantic import Field, ValidationError
 from app.core.logging_config import setup_logging
@@ -6,10 +7,87 @@ from app.core.logging_config import setup_logging
 logger = setup_logging()
 
 class Settings(BaseSettings):
-    COHERE_API_KEY: str = Field(..., description="API key for Cohere")
-    OPENAI_API_KEY: str = Field(..., description="API key for OpenAI")
-    QDRANT_API_KEY: str = Field(..., description="API key for Qdrant")
+    COHERE_API_KEY: Optional[str] = Field(None, description="API key for Cohere")
+    OPENAI_API_KEY: Optional[str] = Field(None, description="API key for OpenAI")
+    QDRANT_API_KEY: Optional[str] = Field(None, description="API key for Qdrant")
     QDRANT_URL: str = Field(..., description="URL for QDRANT")
+    QDRANT_COLLECTION: str = Field("SAMPLE", description="Qdrant collection used by the RAG indexer")
+    QDRANT_QUANTIZATION: Optional[Literal["int8", "binary"]] = Field(None, description="Quantize the vectors of a newly created Qdrant collection (rescored with the originals)")
+
+    PERSIST_DIR: str = Field("../database/persist/sample", description="Directory of the persisted source docstore")
+    PERSIST_FORMAT: Literal["json", "binary"] = Field("json", description="Format persist writes: llama_index JSON or the binary store (SQLite + memory-mapped embeddings)")
+    PDF_SOURCE: str = Field("app/database/sample/manifest.json", description="Directory of PDFs or JSON manifest to persist")
+    INGEST_WORKERS: Optional[int] = Field(None, description="Processes used for PDF extraction (defaults to the CPU count)")
+    INGEST_PAGES_PER_TASK: int = Field(8, description="Pages extracted per worker task")
+    INGEST_BATCH_SIZE: int = Field(256, description="Documents added to the docstore per batch")
+    INGESTION_PERSIST_DIR: str = Field("../database/persist/ingestion", description="Directory of the ingestion cache and dedup docstore")
+    RAG_LLM_PROVIDER: Literal["cohere", "openai", "fake"] = Field("cohere", description="LLM that answers RAG queries ('fake' is a local LLM for offline use)")
+    RAG_LLM_MODEL: str = Field("command-r-plus", description="Model name of the RAG LLM")
+    RAG_EMBED_PROVIDER: Literal["openai", "cohere", "hash"] = Field("openai", description="Embedding model used to ingest and query the RAG index ('hash' needs no API key)")
+    RAG_SIMILARITY_TOP_K: int = Field(2, description="Source nodes passed to the LLM per RAG query")
+    RAG_RETRIEVAL_MODE: Literal["dense", "sparse", "hybrid"] = Field("dense", description="Default RAG retrieval: Qdrant vectors, BM25, or both fused by reciprocal rank")
+    RAG_HYBRID_CANDIDATES: int = Field(10, description="Candidates taken from each retriever before hybrid fusion")
+    RAG_RRF_K: int = Field(60, description="Damping constant of reciprocal rank fusion")
+    FAKE_LLM_TOKEN_DELAY: float = Field(0.0, description="Seconds the fake LLM waits before each streamed token")
+    SEMANTIC_CACHE_ENABLED: bool = Field(True, description="Serve repeated or near-identical RAG questions from the semantic answer cache")
+    SEMANTIC_CACHE_THRESHOLD: float = Field(0.95, description="Minimum cosine similarity between questions for a semantic cache hit")
+    SEMANTIC_CACHE_TTL_SECONDS: Optional[float] = Field(3600, description="Seconds a cached answer stays valid (no expiry when unset)")
+    SEMANTIC_CACHE_MAX_ENTRIES: int = Field(1024, description="Cached answers kept before the least recently used are evicted")
+    INGEST_ON_STARTUP: bool = Field(True, description="Queue a background persist job at startup when no docstore has been persisted yet")
+
+    EMBEDDING_MODELS: Dict[str, Dict[str, Any]] = Field(
+        {
+            "v3": {"provider": "cohere", "model_name": "embed-english-v3.0"},
+            "light": {"provider": "cohere", "model_name": "embed-english-light-v3.0"},
+            "v2": {"provider": "cohere", "model_name": "embed-english-v2.0"},
+            "openai": {"provider": "openai", "model_name": "text-embedding-ada-002"},
+            "local": {"provider": "hash", "model_name": "hash-384", "dim": 384},
+        },
+        description="Embedding models by alias (JSON): provider ('cohere', 'openai' or 'hash'), model_name and provider options",
+    )
+    EMBEDDING_HTTP_MAX_CONNECTIONS: int = Field(100, description="Size of the pooled HTTP client shared by the embedding models")
+    EMBEDDING_HTTP_TIMEOUT: float = Field(60.0, description="Timeout in seconds for embedding provider calls")
+    EMBEDDING_MODEL_CONCURRENCY: int = Field(32, description="Maximum async provider calls in flight per embedding model")
+    EMBEDDING_CACHE_MAX_BYTES: int = Field(64 * 1024 * 1024, description="Byte budget of the in-process embedding cache")
+    EMBEDDING_CACHE_DISK_PATH: Optional[str] = Field(None, description="SQLite file for the on-disk embedding cache tier (disabled when unset)")
+    EMBEDDING_BATCH_SIZE: int = Field(96, description="Maximum texts per provider embedding call (Cohere allows 96)")
+    EMBEDDING_BATCH_CONCURRENCY: int = Field(4, description="Maximum provider batch calls in flight at once")
+    EMBEDDING_CACHE_DISK_MAX_BYTES: int = Field(512 * 1024 * 1024, description="Byte budget of the on-disk embedding cache tier")
+    EMBEDDING_MICRO_BATCH_SIZE: int = Field(32, description="Single-text embed requests sent together in one provider call at most")
+    EMBEDDING_MICRO_BATCH_MAX_DELAY_MS: float = Field(5.0, description="Milliseconds a single-text embed request waits for others to batch with (0 disables micro-batching)")
+
+    PROVIDER_RATE_LIMITS: Dict[str, Dict[str, float]] = Field(
+        {},
+        description="Outbound limits (JSON) by 'provider' or 'provider/model': rpm, tpm and optional burst_seconds, "
+                    "e.g. {\"cohere\": {\"rpm\": 100}}",
+    )
+    PROVIDER_MAX_RETRIES: int = Field(5, description="Retries of a provider call after a 429, 5xx or connection error")
+    PROVIDER_RETRY_BASE_DELAY: float = Field(0.5, description="Base of the jittered exponential backoff between retries, in seconds")
+    PROVIDER_RETRY_MAX_DELAY: float = Field(30.0, description="Longest wait between retries, in seconds")
+
+    METRICS_ENABLED: bool = Field(True, description="Collect request, provider and RAG stage metrics and serve them at /metrics")
+    TRACING_ENABLED: bool = Field(True, description="Record sampled requests as span trees, viewable at /debug/traces with PROFILING_TOKEN")
+    TRACE_SAMPLE_RATE: float = Field(0.0, description="Share of requests traced; requests with a sampled W3C traceparent header are always traced")
+    TRACE_BUFFER_SIZE: int = Field(200, description="Finished traces kept in memory for /debug/traces")
+    TRACE_MAX_SPANS: int = Field(1000, description="Spans recorded per trace; further spans are counted as dropped")
+    TRACE_FILE: Optional[str] = Field(None, description="JSON Lines file finished spans are appended to (disabled when unset)")
+    TRACE_OTLP_ENDPOINT: Optional[str] = Field(None, description="OTLP/HTTP JSON traces endpoint, e.g. http://localhost:4318/v1/traces (disabled when unset)")
+    PROFILING_ENABLED: bool = Field(False, description="Allow profiling live requests and serve the profiles at /debug/profiles")
+    PROFILING_TOKEN: Optional[str] = Field(None, description="Secret sent in the X-Profile-Token header or profile_token query parameter, both to have a request profiled and to read /debug/profiles and /debug/traces")
+    PROFILER: Literal["sampling", "cprofile"] = Field("sampling", description="Stack sampling of all threads (flamegraph), or cProfile of the event loop thread (pstats)")
+    PROFILE_SAMPLE_RATE: float = Field(0.0, description="Share of requests profiled without being asked to")
+    PROFILE_MIN_INTERVAL_SECONDS: float = Field(10.0, description="Minimum time between two profiles; requests in between are not profiled")
+    PROFILE_INTERVAL_MS: float = Field(5.0, description="Stack sampling interval of the sampling profiler")
+    PROFILE_MAX_SECONDS: float = Field(60.0, description="Sampling stops after this long, for long streaming responses")
+    PROFILE_MAX_PROFILES: int = Field(50, description="Profiles kept on disk; older ones are deleted")
+
+    VECTOR_INDEX_DIR: str = Field("../database/indexes", description="Directory where local vector indexes are saved")
+    PROJECTION_DIR: str = Field("../database/projections", description="Directory where fitted embedding projections are saved")
+    PROFILE_DIR: str = Field("../database/profiles", description="Directory where request profiles are saved")
+    PROJECTION_MAX_LOADED: int = Field(32, description="Fitted projections kept in memory; others are reloaded from disk")
+
+    PLOT_WORKERS: int = Field(2, description="Processes used to render plots (0 renders in threads instead)")
+    PLOT_CACHE_MAX_BYTES: int = Field(32 * 1024 * 1024, description="Byte budget of the rendered plot cache")
 
     class Config:
         env_file = ".env"
@@ -18,16 +96,17 @@ try:
     settings = Settings()
 
     # Ensure API keys are set in the environment for other modules to use
-    os.environ["COHERE_API_KEY"] = settings.COHERE_API_KEY
-    os.environ["OPENAI_API_KEY"] = settings.OPENAI_API_KEY
-    os.environ["QDRANT_API_KEY"] = settings.QDRANT_API_KEY
-    os.environ["QDRANT_URL"] = settings.QDRANT_URL
+    for name in ("COHERE_API_KEY", "OPENAI_API_KEY", "QDRANT_API_KEY", "QDRANT_URL"):
+        value = getattr(settings, name)
+        if value:
+            os.environ[name] = value
 
-    # Explicit check for OpenAI API Key
+    # Providers are created on first use, so a missing key only matters for the models that need it
+    if not settings.COHERE_API_KEY:
+        logger.warning("COHERE_API_KEY is not set; Cohere models and the RAG LLM are unavailable.")
     if not settings.OPENAI_API_KEY:
-        raise ValueError(
-            "No API key found for OpenAI.\n"
-            "Please set either the OPENAI_API_KEY environment variable or openai.api_key prior to initialization.\n"
+        logger.warning(
+            "No API key found for OpenAI; OpenAI models and RAG ingestion are unavailable. "
             "API keys can be found or created at https://platform.openai.com/account/api-keys"
         )
 
@@ -14,6 +14,10 @@ def setup_logging():
     logger = logging.getLogger("Backend")
     logger.setLevel(getattr(logging, log_level))  # Dynamically set the logging level
 
+    # Every module calls setup_logging(); only attach handlers the first time
+    if logger.handlers:
+        return logger
+
     # Define log format
     formatter = logging.Formatter(
         fmt="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
@@ -0,0 +1,531 @@
+# app/core/profiling.py
+
+import cProfile
+import hmac
+import html
+import json
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from typing import Optional
+from urllib.parse import parse_qs
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.logging_config import setup_logging
+
+logger = setup_logging()
+
+PROFILE_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+# Where requests send the profiling token, both to be profiled and to read the profiles
+TOKEN_HEADER = "X-Profile-Token"
+TOKEN_QUERY_PARAM = "profile_token"
+
+# Artifacts a profile can have, by kind: file suffix and media type
+ARTIFACTS = {
+    "folded": (".folded", "text/plain; charset=utf-8"),
+    "svg": (".svg", "image/svg+xml"),
+    "pstats": (".pstats", "application/octet-stream"),
+}
+
+# Leaf frames of threads that are waiting for work rather than doing it
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),
+    ("queue.py", "get"),
+}
+
+
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    marker = filename.rfind("site-packages" + os.sep)
+    if marker >= 0:
+        filename = filename[marker + len("site-packages") + 1:]
+    elif filename.startswith(os.getcwd()):
+        filename = os.path.relpath(filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ",")
+
+
+class SamplingProfiler:
+    """
+    Samples the Python stacks of every thread of the process from a background thread.
+
+    A request's work is spread over the event loop and worker threads, so all threads are
+    sampled and each stack is rooted at its thread name; threads waiting for work are skipped.
+    Requests served concurrently show up in the same profile. Stacks are kept as collapsed
+    ("folded") stacks with their sample counts, the input format of flamegraph tools.
+    """
+
+    def __init__(self, interval: float = 0.005, max_seconds: float = 60.0):
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        deadline = time.perf_counter() + self.max_seconds
+        while not self._stop.wait(self.interval) and time.perf_counter() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top_functions(self, limit: int = 20) -> list:
+        """
+        Functions with the most samples spent in them (self), with the samples spent
+        under them (total).
+        """
+        own, total = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")[1:]
+            if frames:
+                own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        return [
+            {"function": function, "self_samples": own[function], "total_samples": total[function]}
+            for function, _ in own.most_common(limit)
+        ]
+
+
+def flamegraph_svg(stacks: Counter, title: str, width: int = 1200, row_height: int = 16) -> str:
+    """
+    Renders folded stacks as a static SVG flamegraph, hover a frame for its name and samples.
+    """
+    root = {"children": {}, "count": 0}
+    for stack, count in stacks.items():
+        node = root
+        node["count"] += count
+        for frame in stack.split(";"):
+            node = node["children"].setdefault(frame, {"children": {}, "count": 0})
+            node["count"] += count
+    if root["count"] == 0:
+        return (f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="40">'
+                f'<text x="10" y="24">{html.escape(title)}: no samples</text></svg>')
+
+    rects = []
+    max_depth = 0
+
+    def layout(node, x, depth):
+        nonlocal max_depth
+        max_depth = max(max_depth, depth)
+        for name, child in sorted(node["children"].items()):
+            child_width = child["count"] / root["count"] * width
+            if child_width >= 1.0:
+                rects.append((name, child["count"], x, depth, child_width))
+                layout(child, x, depth + 1)
+            x += child_width
+
+    layout(root, 0.0, 0)
+    height = (max_depth + 2) * row_height + 24
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" font-family="monospace" font-size="11">',
+        f'<text x="4" y="16">{html.escape(title)}</text>',
+    ]
+    for name, count, x, depth, rect_width in rects:
+        y = height - (depth + 1) * row_height
+        hue = 20 + (hash(name) % 40)
+        label = html.escape(name)
+        share = count / root["count"] * 100
+        parts.append(
+            f'<g><title>{label} ({count} samples, {share:.1f}%)</title>'
+            f'<rect x="{x:.1f}" y="{y}" width="{rect_width:.1f}" height="{row_height - 1}" fill="hsl({hue},90%,60%)"/>'
+        )
+        characters = int(rect_width / 7)
+        if characters >= 3:
+            text = name if len(name) <= characters else name[:characters - 2] + ".."
+            parts.append(f'<text x="{x + 2:.1f}" y="{y + row_height - 4}">{html.escape(text)}</text>')
+        parts.append("</g>")
+    parts.append("</svg>")
+    return "\n".join(parts)
+
+
+class ProfileSession:
+    """
+    One profiled request: starts the profiler (and tracemalloc when asked) and writes the
+    artifacts when it is finished.
+    """
+
+    def __init__(self, profiler: "RequestProfiler", method: str, path: str, memory: bool, trigger: str):
+        self.profiler = profiler
+        self.profile_id = uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.route = None
+        self.status = None
+        self.memory = memory
+        self.trigger = trigger
+        self.kind = profiler.mode
+        self.started = time.time()
+        self.duration = None
+        self._sampler = None
+        self._cprofile = None
+        self._snapshot = None
+        self._final_snapshot = None
+        self._owns_tracemalloc = False
+
+    def start(self):
+        if self.memory:
+            self._owns_tracemalloc = not tracemalloc.is_tracing()
+            if self._owns_tracemalloc:
+                tracemalloc.start()
+            self._snapshot = tracemalloc.take_snapshot()
+        if self.kind == "sampling":
+            self._sampler = SamplingProfiler(self.profiler.interval, self.profiler.max_seconds)
+            self._sampler.start()
+        else:
+            # cProfile only sees the thread it is enabled in, here the event loop
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        self._started = time.perf_counter()
+
+    def stop(self):
+        self.duration = time.perf_counter() - self._started
+        if self._sampler is not None:
+            self._sampler.stop()
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        if self._snapshot is not None:
+            self._final_snapshot = tracemalloc.take_snapshot()
+            if self._owns_tracemalloc:
+                tracemalloc.stop()
+
+    def allocations(self, limit: int = 20) -> list:
+        """
+        Source lines that allocated the most memory still held at the end of the request.
+        """
+        if self._snapshot is None:
+            return []
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+        differences = self._final_snapshot.filter_traces(filters).compare_to(
+            self._snapshot.filter_traces(filters), "lineno"
+        )
+        return [
+            {
+                "location": f"{diff.traceback[0].filename}:{diff.traceback[0].lineno}",
+                "size_diff": diff.size_diff,
+                "count_diff": diff.count_diff,
+            }
+            for diff in differences[:limit]
+        ]
+
+    def save(self) -> dict:
+        """
+        Writes the artifacts and the metadata file, and returns the metadata.
+        """
+        store = self.profiler.store
+        metadata = {
+            "profile_id": self.profile_id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": self.status,
+            "trigger": self.trigger,
+            "profiler": self.kind,
+            "started": self.started,
+            "duration": self.duration,
+            "allocations": self.allocations(),
+        }
+        title = f"{self.method} {self.route or self.path} ({self.duration:.3f}s)"
+        if self._sampler is not None:
+            metadata["samples"] = self._sampler.samples
+            metadata["interval"] = self._sampler.interval
+            metadata["top_functions"] = self._sampler.top_functions()
+            store.write(self.profile_id, "folded", self._sampler.folded().encode("utf-8"))
+            store.write(self.profile_id, "svg", flamegraph_svg(self._sampler.stacks, title).encode("utf-8"))
+            metadata["artifacts"] = ["folded", "svg"]
+        else:
+            path = store.artifact_file(self.profile_id, "pstats")
+            self._cprofile.dump_stats(path)
+            stats = pstats.Stats(self._cprofile)
+            metadata["top_functions"] = [
+                {
+                    "function": f"{name} ({filename}:{lineno})",
+                    "calls": calls,
+                    "self_seconds": own_time,
+                    "total_seconds": total_time,
+                }
+                for (filename, lineno, name), (_, calls, own_time, total_time, _) in
+                sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:20]
+            ]
+            metadata["artifacts"] = ["pstats"]
+        store.save_metadata(metadata)
+        return metadata
+
+
+class ProfileStore:
+    """
+    Profile artifacts on disk, one metadata file per profile. Only the newest
+    `max_profiles` profiles are kept.
+    """
+
+    def __init__(self, directory: str, max_profiles: int = 50):
+        self.directory = directory
+        self.max_profiles = max_profiles
+        self._lock = threading.Lock()
+
+    def _path(self, profile_id: str, suffix: str) -> str:
+        if not PROFILE_ID_RE.match(profile_id):
+            raise KeyError(f"Profile {profile_id} not found.")
+        return os.path.join(self.directory, profile_id + suffix)
+
+    def artifact_file(self, profile_id: str, kind: str) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        return self._path(profile_id, ARTIFACTS[kind][0])
+
+    def write(self, profile_id: str, kind: str, data: bytes):
+        with open(self.artifact_file(profile_id, kind), "wb") as file:
+            file.write(data)
+
+    def save_metadata(self, metadata: dict):
+        path = self._path(metadata["profile_id"], ".json")
+        with open(path + ".tmp", "w", encoding="utf-8") as file:
+            json.dump(metadata, file)
+        os.replace(path + ".tmp", path)
+        self._prune()
+
+    def _prune(self):
+        with self._lock:
+            profiles = self.list()
+            for metadata in profiles[self.max_profiles:]:
+                for suffix in [".json", *(suffix for suffix, _ in ARTIFACTS.values())]:
+                    try:
+                        os.remove(self._path(metadata["profile_id"], suffix))
+                    except FileNotFoundError:
+                        pass
+
+    def list(self) -> list:
+        """
+        Metadata of the stored profiles, newest first.
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), encoding="utf-8") as file:
+                    profiles.append(json.load(file))
+            except (OSError, ValueError):
+                continue
+        return sorted(profiles, key=lambda metadata: metadata["started"], reverse=True)
+
+    def get(self, profile_id: str) -> dict:
+        try:
+            with open(self._path(profile_id, ".json"), encoding="utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            raise KeyError(f"Profile {profile_id} not found.")
+
+    def artifact(self, profile_id: str, kind: str):
+        """
+        Returns (path, media type) of an artifact of a stored profile.
+        """
+        metadata = self.get(profile_id)
+        if kind not in metadata.get("artifacts", []):
+            raise KeyError(f"Profile {profile_id} has no '{kind}' artifact, it has: {', '.join(metadata.get('artifacts', []))}.")
+        suffix, media_type = ARTIFACTS[kind]
+        return self._path(profile_id, suffix), media_type
+
+
+class RequestProfiler:
+    """
+    Decides which requests are profiled.
+
+    A request is profiled when it carries the profiling token (`X-Profile-Token` header or
+    `profile_token` query parameter), or at random with probability `sample_rate`. Either way at
+    most one request is profiled at a time, and a profile starts at least `min_interval`
+    seconds after the previous one ended, so leaving profiling enabled costs one header lookup per request.
+    """
+
+    def __init__(self, token: Optional[str], directory: str, mode: str = "sampling", sample_rate: float = 0.0,
+                 min_interval: float = 10.0, interval: float = 0.005, max_seconds: float = 60.0,
+                 max_profiles: int = 50):
+        if mode == "sampling" and not hasattr(sys, "_current_frames"):
+            logger.warning("Stack sampling is not supported by this Python, profiling with cProfile instead")
+            mode = "cprofile"
+        self.token = token
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.min_interval = min_interval
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.store = ProfileStore(directory, max_profiles)
+        self._lock = threading.Lock()
+        self._active = False
+        self._last_end = float("-inf")
+
+    def check_token(self, token: Optional[str]) -> bool:
+        return bool(self.token) and token is not None and hmac.compare_digest(token.encode(), self.token.encode())
+
+    def _acquire(self) -> bool:
+        with self._lock:
+            if self._active or time.monotonic() - self._last_end < self.min_interval:
+                return False
+            self._active = True
+            return True
+
+    def _release(self):
+        with self._lock:
+            self._active = False
+            self._last_end = time.monotonic()
+
+    def begin(self, method: str, path: str, token: Optional[str], memory: bool):
+        """
+        Starts profiling a request if it may be profiled. Returns (session or None, status),
+        the status telling a client that asked for a profile why it got none.
+        """
+        if token is not None:
+            if not self.check_token(token):
+                return None, "invalid-token"
+            trigger = "requested"
+        elif self.sample_rate > 0 and random.random() < self.sample_rate:
+            trigger, memory = "sampled", False
+        else:
+            return None, None
+        if not self._acquire():
+            return None, "rate-limited"
+        try:
+            session = ProfileSession(self, method, path, memory, trigger)
+            session.start()
+        except Exception:
+            self._release()
+            raise
+        return session, "profiled"
+
+    def end(self, session: ProfileSession):
+        """
+        Stops profiling a request. Must run in the thread that began it, as cProfile is per thread.
+        """
+        try:
+            session.stop()
+        finally:
+            self._release()
+
+    def save(self, session: ProfileSession) -> Optional[dict]:
+        try:
+            metadata = session.save()
+        except Exception as e:
+            logger.error(f"Could not save profile {session.profile_id}: {e}")
+            return None
+        logger.info(f"Profiled {session.method} {session.path} in {session.duration:.3f}s: {session.profile_id}")
+        return metadata
+
+
+_profiler = None
+
+
+def get_profiler() -> RequestProfiler:
+    """
+    The process-wide request profiler, configured from settings.
+    """
+    global _profiler
+    if _profiler is None:
+        from app.core.config import settings
+
+        if not settings.PROFILING_TOKEN:
+            logger.warning("PROFILING_TOKEN is not set; only PROFILE_SAMPLE_RATE profiles requests, and /debug is closed.")
+        _profiler = RequestProfiler(
+            token=settings.PROFILING_TOKEN,
+            directory=settings.PROFILE_DIR,
+            mode=settings.PROFILER,
+            sample_rate=settings.PROFILE_SAMPLE_RATE,
+            min_interval=settings.PROFILE_MIN_INTERVAL_SECONDS,
+            interval=settings.PROFILE_INTERVAL_MS / 1000,
+            max_seconds=settings.PROFILE_MAX_SECONDS,
+            max_profiles=settings.PROFILE_MAX_PROFILES,
+        )
+    return _profiler
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware running the requests selected by `RequestProfiler` under the profiler.
+
+    Ask for a profile with the `X-Profile-Token: <token>` header or `?profile_token=<token>`,
+    and for allocation statistics as well with `X-Profile-Memory: 1` or `profile_memory=1`.
+    The response then carries `X-Profile-Status` and, when profiled, `X-Profile-Id`. Streaming
+    responses are profiled until their last byte is sent. Requests reading the profiles under
+    /debug, which send the same token, are never profiled.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.profiler = get_profiler()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith("/debug/"):
+            await self.app(scope, receive, send)
+            return
+        token = memory = None
+        for key, value in scope["headers"]:
+            if key == TOKEN_HEADER.lower().encode():
+                token = value.decode("latin-1")
+            elif key == b"x-profile-memory":
+                memory = value.decode("latin-1")
+        if token is None and TOKEN_QUERY_PARAM.encode() in scope.get("query_string", b""):
+            query = parse_qs(scope["query_string"].decode("latin-1"))
+            token = query.get(TOKEN_QUERY_PARAM, [None])[0]
+            memory = memory or query.get("profile_memory", [None])[0]
+        session, profile_status = self.profiler.begin(
+            scope["method"], scope["path"], token, memory in ("1", "true", "yes")
+        )
+        if profile_status is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_profile(message):
+            if message["type"] == "http.response.start":
+                headers = [*message.get("headers", []), (b"x-profile-status", profile_status.encode("latin-1"))]
+                if session is not None:
+                    session.status = message["status"]
+                    headers.append((b"x-profile-id", session.profile_id.encode("latin-1")))
+                message["headers"] = headers
+            await send(message)
+
+        if session is None:
+            await self.app(scope, receive, send_with_profile)
+            return
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            route = scope.get("route")
+            session.route = getattr(route, "path", None)
+            self.profiler.end(session)
+            # Rendering and writing the artifacts would block the event loop
+            await run_in_threadpool(self.profiler.save, session)
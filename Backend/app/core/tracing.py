@@ -0,0 +1,415 @@
+# app/core/tracing.py
+
+import contextvars
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from app.core.logging_config import setup_logging
+
+logger = setup_logging()
+
+TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+_current = contextvars.ContextVar("trace_span", default=None)
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+class Trace:
+    """
+    The spans of one sampled request, exported together when its root span ends.
+    """
+
+    __slots__ = ("trace_id", "spans", "max_spans", "dropped", "_lock")
+
+    def __init__(self, trace_id: str, max_spans: int):
+        self.trace_id = trace_id
+        self.spans = []
+        self.max_spans = max_spans
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def add(self, span: "Span"):
+        with self._lock:
+            if len(self.spans) < self.max_spans:
+                self.spans.append(span)
+            else:
+                self.dropped += 1
+
+
+class Span:
+    """
+    A timed operation within a trace. Use it as a context manager: entering makes it the
+    current span of the context, so spans opened inside it (in this task, or in threads and
+    tasks that inherit the context) become its children.
+    """
+
+    __slots__ = ("trace", "span_id", "parent_id", "name", "attributes", "start", "end", "_started", "error",
+                 "thread", "_token", "_on_end")
+
+    def __init__(self, trace: Trace, name: str, parent_id: Optional[str], attributes: dict,
+                 on_end: Callable[["Span"], None] = None):
+        self.trace = trace
+        self.span_id = _new_id(64)
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self.end = None
+        self.error = None
+        self.thread = threading.current_thread().name
+        self._token = None
+        self._on_end = on_end
+
+    @property
+    def trace_id(self) -> str:
+        return self.trace.trace_id
+
+    @property
+    def duration(self) -> Optional[float]:
+        return None if self.end is None else self.end - self.start
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes):
+        self.attributes.update(attributes)
+
+    def finish(self, error: BaseException = None):
+        if self.end is not None:
+            return
+        self.end = self.start + (time.perf_counter() - self._started)
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        self.trace.add(self)
+        if self._on_end is not None:
+            self._on_end(self)
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            _current.reset(self._token)
+        except ValueError:
+            # Exited in another context than it was entered in (e.g. a callback on another task)
+            pass
+        self.finish(exc)
+        return False
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration": self.duration,
+            "thread": self.thread,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    """
+    Stands in for a span when the request is not sampled, so instrumented code never checks.
+    """
+
+    __slots__ = ()
+    span_id = None
+    trace_id = None
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, **attributes):
+        pass
+
+    def finish(self, error=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def current_span():
+    return _current.get()
+
+
+def span(name: str, **attributes):
+    """
+    Opens a child span of the current span, or a no-op span outside a sampled trace.
+    """
+    parent = _current.get()
+    if parent is None:
+        return NOOP_SPAN
+    return Span(parent.trace, name, parent.span_id, attributes)
+
+
+def bind_context(fn: Callable) -> Callable:
+    """
+    Wraps `fn` to run in a copy of the caller's context, so spans opened by executor threads
+    are parented to the caller's span. Each call gets its own copy, so the wrapper can run in
+    several threads at once.
+    """
+    if _current.get() is None:
+        return fn
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+
+    return run
+
+
+def parse_traceparent(header: Optional[str]):
+    """
+    Reads a W3C traceparent header. Returns (trace_id, parent span id, sampled) or None.
+    """
+    match = TRACEPARENT_RE.match((header or "").strip().lower())
+    if match is None:
+        return None
+    trace_id, parent_id, flags = match.groups()
+    return trace_id, parent_id, bool(int(flags, 16) & 1)
+
+
+def otlp_payload(spans: list, service_name: str) -> dict:
+    """
+    OTLP/HTTP JSON body for finished spans.
+    """
+    def attribute(key, value):
+        if isinstance(value, bool):
+            encoded = {"boolValue": value}
+        elif isinstance(value, int):
+            encoded = {"intValue": str(value)}
+        elif isinstance(value, float):
+            encoded = {"doubleValue": value}
+        else:
+            encoded = {"stringValue": str(value)}
+        return {"key": key, "value": encoded}
+
+    return {"resourceSpans": [{
+        "resource": {"attributes": [attribute("service.name", service_name)]},
+        "scopeSpans": [{
+            "scope": {"name": "app.core.tracing"},
+            "spans": [{
+                "traceId": item["trace_id"],
+                "spanId": item["span_id"],
+                **({"parentSpanId": item["parent_id"]} if item["parent_id"] else {}),
+                "name": item["name"],
+                "kind": 1,
+                "startTimeUnixNano": str(int(item["start"] * 1e9)),
+                "endTimeUnixNano": str(int((item["start"] + (item["duration"] or 0.0)) * 1e9)),
+                "attributes": [attribute(key, value) for key, value in item["attributes"].items()],
+                "status": {"code": 2, "message": item["error"]} if item["error"] else {"code": 1},
+            } for item in spans],
+        }],
+    }]}
+
+
+class Tracer:
+    """
+    Starts sampled traces and exports them when their root span ends.
+
+    Sampling is decided once per request: a `traceparent` header with the sampled flag
+    always records, otherwise a request is recorded with probability `sample_rate`. With a
+    rate of 0, unsampled requests only pay for one random draw and no-op spans.
+
+    Finished traces go to an in-memory ring buffer of the last `buffer_size` traces and, from
+    a background thread, to a JSON Lines file (one span per line) and an OTLP/HTTP collector
+    when configured.
+    """
+
+    def __init__(self, sample_rate: float = 0.0, buffer_size: int = 200, max_spans: int = 1000,
+                 file_path: str = None, otlp_endpoint: str = None, service_name: str = "vectorplayground-backend"):
+        self.sample_rate = sample_rate
+        self.buffer_size = buffer_size
+        self.max_spans = max_spans
+        self.file_path = file_path
+        self.otlp_endpoint = otlp_endpoint
+        self.service_name = service_name
+        self._buffer = OrderedDict()
+        self._lock = threading.Lock()
+        self._queue = None
+        self._worker = None
+
+    def should_sample(self, forced: bool = False) -> bool:
+        return forced or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    def start_trace(self, name: str, traceparent: str = None, **attributes):
+        """
+        Opens the root span of a request, or returns a no-op span when it is not sampled.
+        """
+        parent = parse_traceparent(traceparent)
+        if not self.should_sample(forced=parent is not None and parent[2]):
+            return NOOP_SPAN
+        trace_id, parent_id = (parent[0], parent[1]) if parent is not None else (_new_id(128), None)
+        return Span(Trace(trace_id, self.max_spans), name, parent_id, attributes, on_end=self._export)
+
+    def _export(self, root: Span):
+        trace = root.trace
+        with self._lock:
+            self._buffer[trace.trace_id] = (root, trace)
+            self._buffer.move_to_end(trace.trace_id)
+            while len(self._buffer) > self.buffer_size:
+                self._buffer.popitem(last=False)
+        if self.file_path or self.otlp_endpoint:
+            self._enqueue([item.to_dict() for item in trace.spans])
+
+    def _enqueue(self, spans: list):
+        with self._lock:
+            if self._worker is None:
+                self._queue = queue.Queue(maxsize=1000)
+                self._worker = threading.Thread(target=self._run_exporter, name="trace-exporter", daemon=True)
+                self._worker.start()
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            logger.warning("Trace export queue is full, dropping a trace")
+
+    def _run_exporter(self):
+        client = None
+        while True:
+            spans = self._queue.get()
+            if self.file_path:
+                try:
+                    directory = os.path.dirname(self.file_path)
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                    with open(self.file_path, "a", encoding="utf-8") as file:
+                        file.writelines(json.dumps(item, default=str) + "\n" for item in spans)
+                except OSError as e:
+                    logger.error(f"Could not write traces to {self.file_path}: {e}")
+            if self.otlp_endpoint:
+                import httpx
+
+                client = client or httpx.Client(timeout=5.0)
+                try:
+                    client.post(self.otlp_endpoint, json=otlp_payload(spans, self.service_name)).raise_for_status()
+                except Exception as e:
+                    logger.warning(f"Could not export traces to {self.otlp_endpoint}: {e}")
+
+    def traces(self, limit: int = 50, min_duration: float = 0.0, name: str = None) -> list:
+        """
+        Summaries of the buffered traces, newest first.
+        """
+        with self._lock:
+            items = list(self._buffer.values())
+        summaries = []
+        for root, trace in reversed(items):
+            if (root.duration or 0.0) < min_duration or (name and name not in root.name):
+                continue
+            summaries.append({
+                "trace_id": trace.trace_id,
+                "name": root.name,
+                "start": root.start,
+                "duration": root.duration,
+                "spans": len(trace.spans),
+                "dropped_spans": trace.dropped,
+                "error": root.error,
+                "attributes": root.attributes,
+            })
+            if len(summaries) >= limit:
+                break
+        return summaries
+
+    def get_trace(self, trace_id: str) -> dict:
+        """
+        The spans of a buffered trace as a waterfall: ordered by start, with their depth and
+        their offset from the start of the trace.
+        """
+        with self._lock:
+            entry = self._buffer.get(trace_id)
+        if entry is None:
+            raise KeyError(f"Trace {trace_id} not found.")
+        root, trace = entry
+        with trace._lock:
+            spans = sorted(trace.spans, key=lambda item: item.start)
+        depth = {}
+        waterfall = []
+        for item in spans:
+            depth[item.span_id] = depth.get(item.parent_id, -1) + 1
+            waterfall.append({**item.to_dict(), "depth": depth[item.span_id], "offset": item.start - root.start})
+        return {"trace_id": trace_id, "name": root.name, "duration": root.duration,
+                "dropped_spans": trace.dropped, "spans": waterfall}
+
+
+_tracer = None
+
+
+def get_tracer() -> Tracer:
+    """
+    The process-wide tracer, configured from settings.
+    """
+    global _tracer
+    if _tracer is None:
+        from app.core.config import settings
+
+        _tracer = Tracer(
+            sample_rate=settings.TRACE_SAMPLE_RATE,
+            buffer_size=settings.TRACE_BUFFER_SIZE,
+            max_spans=settings.TRACE_MAX_SPANS,
+            file_path=settings.TRACE_FILE,
+            otlp_endpoint=settings.TRACE_OTLP_ENDPOINT,
+        )
+    return _tracer
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening the root span of sampled requests, named after the route
+    template. Sampled responses carry the trace id in `X-Trace-Id`.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.tracer = get_tracer()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        traceparent = None
+        for key, value in scope["headers"]:
+            if key == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+        root = self.tracer.start_trace(f"{scope['method']} {scope['path']}", traceparent, **{
+            "http.method": scope["method"], "http.target": scope["path"],
+        })
+        if root is NOOP_SPAN:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_trace(message):
+            if message["type"] == "http.response.start":
+                root.set_attribute("http.status_code", message["status"])
+                message.setdefault("headers", [])
+                message["headers"] = [*message["headers"], (b"x-trace-id", root.trace_id.encode("latin-1"))]
+            await send(message)
+
+        with root:
+            try:
+                await self.app(scope, receive, send_with_trace)
+            finally:
+                route = scope.get("route")
+                if route is not None:
+                    root.name = f"{scope['method']} {route.path}"
@@ -0,0 +1,158 @@
+import base64
+import struct
+
+import numpy as np
+
+# Binary layout of application/octet-stream responses: a fixed header, the shape as one uint32
+# per dimension, then the values as raw little-endian float32 in row-major order.
+MAGIC = b"EMB1"
+HEADER = struct.Struct("<4sBBH")  # magic, dtype code, ndim, reserved
+DTYPES = {1: np.dtype("<f4")}
+DTYPE_CODES = {dtype: code for code, dtype in DTYPES.items()}
+
+# Accepted media types and the encoding they select; JSON is the fallback
+MEDIA_TYPES = {
+    "application/json": "json",
+    "application/octet-stream": "binary",
+    "application/msgpack": "msgpack",
+    "application/x-msgpack": "msgpack",
+}
+ENCODING_MEDIA_TYPES = {
+    "json": "application/json",
+    "binary": "application/octet-stream",
+    "msgpack": "application/msgpack",
+}
+
+
+def msgpack_available() -> bool:
+    try:
+        import msgpack  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def parse_accept(accept: str) -> list:
+    """
+    Parses an Accept header into (media type, quality) pairs, best first.
+    Ties keep the order in which the client listed them.
+    """
+    ranges = []
+    for part in (accept or "").split(","):
+        media_type, *params = [item.strip() for item in part.split(";")]
+        if not media_type:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        ranges.append((media_type.lower(), quality))
+    return sorted(ranges, key=lambda item: item[1], reverse=True)
+
+
+def negotiate_encoding(accept: str):
+    """
+    Picks the response encoding for an Accept header.
+
+    Returns:
+    - str: "json", "binary" or "msgpack". Unknown media types and wildcards fall back to JSON.
+    - None: when the client only accepts msgpack and msgpack is not installed.
+    """
+    unavailable = False
+    for media_type, quality in parse_accept(accept):
+        if quality <= 0:
+            continue
+        encoding = MEDIA_TYPES.get(media_type)
+        if encoding == "msgpack" and not msgpack_available():
+            unavailable = True
+            continue
+        if encoding is not None:
+            return encoding
+        if media_type in ("*/*", "application/*"):
+            return "json"
+    return None if unavailable else "json"
+
+
+def as_float32_array(embeddings) -> np.ndarray:
+    """
+    Converts one embedding (dim,) or a list of embeddings (n, dim) to little-endian float32.
+    """
+    array = np.asarray(embeddings, dtype="<f4")
+    if array.ndim not in (1, 2):
+        raise ValueError("Embeddings must be a vector or a list of vectors.")
+    return np.ascontiguousarray(array)
+
+
+def encode_binary(array: np.ndarray) -> bytes:
+    """
+    Packs a float32 array as header + shape + raw little-endian values.
+    """
+    array = as_float32_array(array)
+    return b"".join((
+        HEADER.pack(MAGIC, DTYPE_CODES[array.dtype], array.ndim, 0),
+        struct.pack(f"<{array.ndim}I", *array.shape),
+        array.tobytes(),
+    ))
+
+
+def decode_binary(payload: bytes) -> np.ndarray:
+    """
+    Reads an array written by `encode_binary` without copying the values.
+    """
+    magic, dtype_code, ndim, _ = HEADER.unpack_from(payload)
+    if magic != MAGIC or dtype_code not in DTYPES:
+        raise ValueError("Not an embedding payload.")
+    shape = struct.unpack_from(f"<{ndim}I", payload, HEADER.size)
+    offset = HEADER.size + 4 * ndim
+    return np.frombuffer(payload, dtype=DTYPES[dtype_code], offset=offset).reshape(shape)
+
+
+def encode_msgpack(array: np.ndarray) -> bytes:
+    """
+    Packs a float32 array as a msgpack map with its shape, dtype and the raw values as bytes.
+    """
+    import msgpack
+
+    array = as_float32_array(array)
+    return msgpack.packb({"shape": list(array.shape), "dtype": "float32", "data": array.tobytes()})
+
+
+def decode_msgpack(payload: bytes) -> np.ndarray:
+    import msgpack
+
+    message = msgpack.unpackb(payload)
+    return np.frombuffer(message["data"], dtype="<f4").reshape(message["shape"])
+
+
+def encode_base64(array: np.ndarray) -> str:
+    """
+    Base64 of the raw little-endian float32 values, for JSON bodies.
+    """
+    return base64.b64encode(as_float32_array(array).tobytes()).decode("ascii")
+
+
+def decode_base64(data: str, dim: int = None) -> np.ndarray:
+    array = np.frombuffer(base64.b64decode(data), dtype="<f4")
+    return array if dim is None else array.reshape(-1, dim)
+
+
+def encode_embeddings(embeddings, encoding: str):
+    """
+    Serializes embeddings for a response.
+
+    Parameters:
+    - embeddings: One embedding or a list of embeddings.
+    - encoding (str): "binary" or "msgpack".
+
+    Returns:
+    - tuple: The body bytes and their media type.
+    """
+    if encoding == "binary":
+        return encode_binary(embeddings), ENCODING_MEDIA_TYPES["binary"]
+    if encoding == "msgpack":
+        return encode_msgpack(embeddings), ENCODING_MEDIA_TYPES["msgpack"]
+    raise ValueError(f"Invalid encoding: {encoding}. Pick one of 'binary' or 'msgpack'.")
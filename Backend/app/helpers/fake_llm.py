@@ -0,0 +1,61 @@
+# app/helpers/fake_llm.py
+
+import re
+import time
+from typing import Any
+
+from llama_index.core.base.llms.types import CompletionResponse, CompletionResponseGen, LLMMetadata
+from llama_index.core.llms.callbacks import llm_completion_callback
+from llama_index.core.llms.custom import CustomLLM
+from llama_index.core.bridge.pydantic import Field
+
+# The QA prompts of llama_index put the retrieved chunks between two rules of dashes
+CONTEXT_RE = re.compile(r"-{5,}\n(.*?)\n-{5,}", re.DOTALL)
+TOKEN_RE = re.compile(r"\S+\s*")
+
+
+class FakeLLM(CustomLLM):
+    """
+    Local, deterministic LLM for exercising the RAG pipeline offline.
+
+    It answers by quoting the start of the retrieved context (or the prompt when there is
+    none) and streams the answer word by word, optionally sleeping between tokens to imitate
+    generation latency.
+    """
+
+    max_tokens: int = Field(default=64, description="Maximum number of words in an answer.")
+    token_delay: float = Field(default=0.0, description="Seconds to sleep before each streamed token.")
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "FakeLLM"
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(num_output=self.max_tokens, model_name="fake")
+
+    def _answer_tokens(self, prompt: str) -> list:
+        match = CONTEXT_RE.search(prompt)
+        source = match.group(1) if match else prompt
+        # Skip the "key: value" metadata lines that precede each chunk
+        lines = [line for line in source.splitlines() if line.strip() and not re.match(r"^\w+: ", line)]
+        words = TOKEN_RE.findall(" ".join(lines))[:self.max_tokens]
+        return ["Based on the retrieved context: "] + words
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        return CompletionResponse(text="".join(self._answer_tokens(prompt)))
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponseGen:
+        tokens = self._answer_tokens(prompt)
+
+        def gen() -> CompletionResponseGen:
+            text = ""
+            for token in tokens:
+                if self.token_delay:
+                    time.sleep(self.token_delay)
+                text += token
+                yield CompletionResponse(text=text, delta=token)
+
+        return gen()
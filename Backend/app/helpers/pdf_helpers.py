@@ -0,0 +1,137 @@
+import fitz
+from app.helpers.text_cleaning_helpers import clean
+
+
+def get_document(file_path, pages):
+    """
+    Opens a PDF file and optionally selects specific pages to create a document object.
+
+    This function utilizes the `fitz` library to open a PDF file located at `file_path`. 
+    If a list of `pages` is provided, the function selects only these pages from the document.
+    This is useful for focusing on certain parts of a PDF without loading the entire document into memory.
+
+    Parameters:
+        file_path (str): The path to the PDF file to be opened.
+        pages (list of int, optional): A list of page numbers to select from the PDF. 
+            If `None`, the entire document is loaded.
+
+    """
+    document = fitz.open(file_path)
+    if pages is not None:
+        document.select(pages)  # Select specific pages if pages are provided
+    return document
+
+def handle_chapter_headers_footers(strings, flag):
+    """
+    Modify a list of strings based on a specified flag and join them into a single string.
+
+    This function first removes any empty strings from the input list. It then checks if the
+    remaining list has more than three elements. If so, it modifies the list by removing the
+    first element, last element, or both, based on the value of the flag. The final list is then
+    joined into a single string with spaces separating the elements.
+
+    Parameters:
+        strings (list of str): The list of strings to modify.
+        flag (str): A flag indicating the modification to perform on the list:
+            - 'remove_first': Remove the first element of the list.
+            - 'remove_last': Remove the last element of the list.
+            - 'remove_first_last': Remove both the first and last elements of the list.
+            - 'remove_first_two': Remove the first two elements of the list.
+            - Any other value leaves the list unchanged.
+
+    Returns:
+        str: A single string composed of the modified list elements, separated by spaces.
+    """
+    # Filter out empty strings
+    filtered_strings = [s for s in strings if s]
+
+    # Check if the filtered list has more than three elements
+    if len(filtered_strings) > 3:
+        if flag == 'remove_first':
+            filtered_strings = filtered_strings[1:]  # Slice off the first element
+        elif flag == 'remove_last':
+            filtered_strings = filtered_strings[:-1]  # Slice off the last element
+        elif flag == 'remove_first_last':
+            filtered_strings = filtered_strings[1:-1]  # Slice off the first and last elements
+        elif flag == 'remove_first_two':
+            filtered_strings = filtered_strings[2:]  # Slice off the first two elements
+
+    # Join all strings with a space and return the result
+    return ' '.join(filtered_strings).strip()
+
+def extract_text(page, file_name, title, author, flag, opt="text"):
+    """
+    Extracts text from a specified page of a document and returns a dictionary containing
+    the extracted text and associated metadata.
+
+    The function first retrieves text from the given `page` object using the specified `opt` method.
+    It then processes this text to remove chapter headers, footers, and applies various cleaning
+    procedures according to the `flag` and other parameters set in the `clean` function.
+
+    Parameters:
+        page (fitz.Page): The page object from which to extract text.
+        file_name (str): The name of the file from which the page is taken.
+        title (str): The title of the document.
+        author (str): The author of the document.
+        flag (str): A flag used to customize how chapter headers and footers are handled.
+        opt (str, optional): The method of text extraction to be used by `get_text`.
+            Defaults to "text", but can be changed to other methods supported by the library.
+
+    Returns:
+        dict: A dictionary with two keys:
+            - 'text': A string containing the cleaned and processed text from the page.
+            - 'metadata': A dictionary containing metadata about the text, including the
+                        page number, file name, title, and author.
+    """
+
+    text = page.get_text(opt, sort=True)
+
+    text = text.split("\n")
+
+    text = handle_chapter_headers_footers(text, flag)
+
+    text = clean(
+        text,
+        extra_whitespace=True,
+        broken_paragraphs=True,
+        bullets=True,
+        ascii=True,
+        lowercase=False,
+        citations=True,
+        merge_split_words=True,
+    )
+
+    return {
+        "text": text,
+        "metadata": {
+            "page_number": page.number,
+            "file_name": file_name,
+            "title": title,
+            "author": author
+        }
+    }
+
+
+def extract_pages(file_path, title, author, flag, page_numbers, opt="text"):
+    """
+    Opens a PDF and extracts the given pages with `extract_text`.
+
+    This is the unit of work of the parallel ingestion stage: it only takes picklable arguments
+    and returns plain dictionaries, so it can run in a worker process.
+
+    Parameters:
+        file_path (str): The path to the PDF file.
+        title (str): The title of the document.
+        author (str): The author of the document.
+        flag (str): How chapter headers and footers are handled, see `handle_chapter_headers_footers`.
+        page_numbers (list of int): The zero-based page numbers to extract.
+        opt (str, optional): The text extraction method passed to `get_text`.
+
+    Returns:
+        list of dict: One `extract_text` result per page, in the order of `page_numbers`.
+    """
+    with fitz.open(file_path) as document:
+        return [
+            extract_text(document.load_page(number), file_path, title, author, flag, opt=opt)
+            for number in page_numbers
+        ]
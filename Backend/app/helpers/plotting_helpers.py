@@ -0,0 +1,154 @@
+import io
+
+import numpy as np
+
+# Output formats supported by the renderers and their media types
+IMAGE_FORMATS = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+    "webp": "image/webp",
+}
+
+
+def _new_figure(figsize: tuple):
+    """
+    Creates a standalone figure bound to an Agg canvas. Unlike pyplot, nothing is registered in
+    global state, so figures can be drawn concurrently and are freed with their last reference.
+    """
+    # matplotlib is imported on first render, not when the API starts
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=figsize)
+    FigureCanvasAgg(figure)
+    return figure
+
+
+def _encode(figure, fmt: str) -> bytes:
+    """
+    Serializes a figure to PNG, SVG or WebP bytes (WebP goes through Pillow).
+    """
+    if fmt not in IMAGE_FORMATS:
+        raise ValueError(f"Invalid image format: {fmt}. Pick one of {', '.join(IMAGE_FORMATS)}.")
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format=fmt, bbox_inches="tight")
+    return buffer.getvalue()
+
+
+def reduce_to_2d(embeddings) -> np.ndarray:
+    """
+    Projects embeddings to 2D with PCA. Inputs that are already 2D are returned as they are.
+
+    Parameters:
+    - embeddings: A list of embeddings, each of shape (n_features,).
+
+    Returns:
+    - np.ndarray: A (n, 2) array of coordinates.
+    """
+    embeddings = np.array(embeddings)
+    if embeddings.shape[1] > 2:
+        from sklearn.decomposition import PCA
+
+        return PCA(n_components=2).fit_transform(embeddings)
+    return embeddings
+
+
+def render_comparison(embedding1: list, embedding2: list, fmt: str = "png") -> bytes:
+    """
+    Draws two embeddings as 2D vectors from the origin, using their first two dimensions.
+
+    Parameters:
+    - embedding1 (list): The first embedding vector.
+    - embedding2 (list): The second embedding vector.
+    - fmt (str): "png", "svg" or "webp".
+
+    Returns:
+    - bytes: The encoded image.
+    """
+    vector_a = np.array(embedding1[:2])  # Use first two dimensions for plotting
+    vector_b = np.array(embedding2[:2])
+
+    distance = np.linalg.norm(vector_a - vector_b)
+
+    figure = _new_figure((8, 8))
+    ax = figure.subplots()
+    origin = np.array([0, 0])  # Origin point
+
+    # Plot both vectors
+    ax.quiver(*origin, *vector_a, angles='xy', scale_units='xy', scale=1, color='blue', label='Vector A')
+    ax.quiver(*origin, *vector_b, angles='xy', scale_units='xy', scale=1, color='red', label='Vector B')
+
+    # Draw a line connecting the tips of the vectors
+    ax.plot([vector_a[0], vector_b[0]], [vector_a[1], vector_b[1]], linestyle='--', color='gray', label='Distance')
+
+    # Annotate the plot with the distance
+    midpoint = (vector_a + vector_b) / 2
+    ax.text(midpoint[0], midpoint[1], f'Distance: {distance:.2f}', fontsize=12, color='green')
+
+    # Dynamically set plot limits to zoom in when vectors are smaller, with 10% padding
+    max_x = max(abs(vector_a[0]), abs(vector_b[0]))
+    max_y = max(abs(vector_a[1]), abs(vector_b[1]))
+    padding = max(max_x, max_y) * 0.1
+    ax.set_xlim(-max_x - padding, max_x + padding)
+    ax.set_ylim(-max_y - padding, max_y + padding)
+
+    # Add grid, legend, and labels
+    ax.grid()
+    ax.legend()
+    ax.axhline(0, color='black', linewidth=0.5)
+    ax.axvline(0, color='black', linewidth=0.5)
+    ax.set_xlabel('X-axis')
+    ax.set_ylabel('Y-axis')
+    ax.set_title('Embedding Comparison')
+
+    return _encode(figure, fmt)
+
+
+def render_scatter(embeddings: list, labels: list = None, fmt: str = "png") -> bytes:
+    """
+    Draws embeddings as a 2D scatter plot after reducing them with PCA.
+
+    Parameters:
+    - embeddings (list): A list of embeddings, each of shape (n_features,).
+    - labels (list): Optional labels used to color the points.
+    - fmt (str): "png", "svg" or "webp".
+
+    Returns:
+    - bytes: The encoded image.
+    """
+    reduced_embeddings = reduce_to_2d(embeddings)
+
+    figure = _new_figure((8, 8))
+    ax = figure.subplots()
+    if labels is not None:
+        labels = np.array(labels)
+        for label in np.unique(labels):
+            indices = np.where(labels == label)
+            ax.scatter(
+                reduced_embeddings[indices, 0],
+                reduced_embeddings[indices, 1],
+                label=f"Label {label}",
+                s=100
+            )
+    else:
+        ax.scatter(
+            reduced_embeddings[:, 0],
+            reduced_embeddings[:, 1],
+            s=100,
+            color='blue'
+        )
+
+    ax.set_title('2D Visualization of Embeddings')
+    ax.set_xlabel('Dimension 1')
+    ax.set_ylabel('Dimension 2')
+    if labels is not None:
+        ax.legend()
+    ax.grid(True)
+
+    return _encode(figure, fmt)
+
+
+RENDERERS = {
+    "comparison": render_comparison,
+    "scatter": render_scatter,
+}
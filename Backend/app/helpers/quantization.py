@@ -0,0 +1,197 @@
+import numpy as np
+
+from app.helpers.vector_math import as_float32_matrix
+
+QUANTIZATIONS = ("none", "float16", "int8", "binary")
+
+
+def popcount64(words: np.ndarray) -> np.ndarray:
+    """
+    Number of set bits of every uint64, with the branch-free SWAR reduction.
+    """
+    words = words - ((words >> np.uint64(1)) & np.uint64(0x5555555555555555))
+    words = (words & np.uint64(0x3333333333333333)) + ((words >> np.uint64(2)) & np.uint64(0x3333333333333333))
+    words = (words + (words >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    return (words * np.uint64(0x0101010101010101)) >> np.uint64(56)
+
+
+class Quantizer:
+    """
+    Compresses float32 vectors into codes and scores queries directly against the codes.
+
+    `encode` returns the codes plus per-vector float32 side data (scales, norms) that
+    `scores` and `decode` need. Scores follow the metric's direction: larger is closer for
+    "cosine"/"dot", smaller is closer for "l2", except where `higher_is_better` says otherwise.
+    """
+
+    name = None
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    @property
+    def code_shape(self) -> tuple:
+        return (self.dim,)
+
+    code_dtype = np.float32
+    aux_size = 0
+
+    def bytes_per_vector(self) -> int:
+        return int(np.prod(self.code_shape)) * np.dtype(self.code_dtype).itemsize + 4 * self.aux_size
+
+    def higher_is_better(self, metric: str) -> bool:
+        return metric != "l2"
+
+    def encode(self, vectors: np.ndarray):
+        raise NotImplementedError
+
+    def decode(self, codes: np.ndarray, aux: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def scores(self, queries: np.ndarray, codes: np.ndarray, aux: np.ndarray, metric: str) -> np.ndarray:
+        """
+        Approximate (n_queries, n_codes) scores. Cosine indexes store normalized vectors, so
+        "cosine" is scored as a dot product here.
+        """
+        return _metric_scores(queries, self.decode(codes, aux), metric)
+
+
+def _metric_scores(queries: np.ndarray, candidates: np.ndarray, metric: str, candidate_sq_norms=None) -> np.ndarray:
+    products = queries @ candidates.T
+    if metric != "l2":
+        return products
+    if candidate_sq_norms is None:
+        candidate_sq_norms = np.einsum("ij,ij->i", candidates, candidates)
+    squared = np.einsum("ij,ij->i", queries, queries)[:, np.newaxis] + candidate_sq_norms[np.newaxis, :] - 2.0 * products
+    np.maximum(squared, 0.0, out=squared)
+    return np.sqrt(squared, out=squared)
+
+
+class Float16Quantizer(Quantizer):
+    """
+    Half precision: 2 bytes per dimension, with a relative error of about 1e-3.
+    """
+
+    name = "float16"
+    code_dtype = np.float16
+
+    def encode(self, vectors: np.ndarray):
+        return vectors.astype(np.float16), np.empty((len(vectors), 0), dtype=np.float32)
+
+    def decode(self, codes: np.ndarray, aux: np.ndarray) -> np.ndarray:
+        return codes.astype(np.float32)
+
+
+class Int8Quantizer(Quantizer):
+    """
+    Symmetric scalar quantization: each vector is scaled by its own max |x| / 127 and rounded
+    to int8. 1 byte per dimension plus the scale and the squared norm of the reconstruction.
+    """
+
+    name = "int8"
+    code_dtype = np.int8
+    aux_size = 2
+
+    def encode(self, vectors: np.ndarray):
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(vectors / scales[:, np.newaxis]), -127, 127).astype(np.int8)
+        sq_norms = np.einsum("ij,ij->i", codes, codes, dtype=np.float32) * scales ** 2
+        return codes, np.stack([scales, sq_norms], axis=1).astype(np.float32)
+
+    def decode(self, codes: np.ndarray, aux: np.ndarray) -> np.ndarray:
+        return codes.astype(np.float32) * aux[:, :1]
+
+    def scores(self, queries: np.ndarray, codes: np.ndarray, aux: np.ndarray, metric: str) -> np.ndarray:
+        # q . (s * c) == s * (q . c), so the codes are only widened, never rescaled
+        products = (queries @ codes.astype(np.float32).T) * aux[:, 0][np.newaxis, :]
+        if metric != "l2":
+            return products
+        squared = np.einsum("ij,ij->i", queries, queries)[:, np.newaxis] + aux[:, 1][np.newaxis, :] - 2.0 * products
+        np.maximum(squared, 0.0, out=squared)
+        return np.sqrt(squared, out=squared)
+
+
+class BinaryQuantizer(Quantizer):
+    """
+    Sign quantization: one bit per dimension, packed into bytes, searched by Hamming distance.
+
+    Codes are padded with zero bits to whole 64-bit words, so small query batches XOR and
+    popcount a word at a time; larger batches unpack each block of codes to +/-1 and use a
+    matrix multiply instead. Scores are `dim - 2 * hamming`, the dot product of the +/-1
+    sign vectors, for every metric. It only preserves the ranking roughly, so binary search
+    is meant to be followed by rescoring against the full-precision vectors.
+    """
+
+    name = "binary"
+    code_dtype = np.uint8
+    matmul_min_queries = 16
+
+    @property
+    def code_shape(self) -> tuple:
+        return (8 * ((self.dim + 63) // 64),)
+
+    def higher_is_better(self, metric: str) -> bool:
+        return True
+
+    def encode(self, vectors: np.ndarray):
+        codes = np.zeros((len(vectors), *self.code_shape), dtype=np.uint8)
+        codes[:, :(self.dim + 7) // 8] = np.packbits(vectors > 0, axis=1)
+        return codes, np.empty((len(vectors), 0), dtype=np.float32)
+
+    def decode(self, codes: np.ndarray, aux: np.ndarray) -> np.ndarray:
+        signs = np.unpackbits(codes, axis=1, count=self.dim).astype(np.float32)
+        return (2.0 * signs - 1.0) / np.sqrt(self.dim)
+
+    def hamming(self, query_codes: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """
+        (n_queries, n_codes) Hamming distances between packed codes.
+        """
+        words = np.ascontiguousarray(codes).view(np.uint64)
+        distances = np.empty((len(query_codes), len(codes)), dtype=np.int32)
+        for i, query_words in enumerate(np.ascontiguousarray(query_codes).view(np.uint64)):
+            distances[i] = popcount64(np.bitwise_xor(words, query_words)).sum(axis=1)
+        return distances
+
+    def scores(self, queries: np.ndarray, codes: np.ndarray, aux: np.ndarray, metric: str) -> np.ndarray:
+        if len(queries) >= self.matmul_min_queries:
+            signs = np.where(queries > 0, 1.0, -1.0).astype(np.float32)
+            return signs @ (2.0 * np.unpackbits(codes, axis=1, count=self.dim).astype(np.float32) - 1.0).T
+        query_codes, _ = self.encode(queries)
+        return (self.dim - 2 * self.hamming(query_codes, codes)).astype(np.float32)
+
+
+QUANTIZERS = {
+    Float16Quantizer.name: Float16Quantizer,
+    Int8Quantizer.name: Int8Quantizer,
+    BinaryQuantizer.name: BinaryQuantizer,
+}
+
+
+def get_quantizer(quantization: str, dim: int):
+    """
+    Returns the quantizer for a mode, or None for "none" (plain float32).
+    """
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Invalid quantization: {quantization}. Pick one of {', '.join(QUANTIZATIONS)}.")
+    if quantization == "none":
+        return None
+    return QUANTIZERS[quantization](dim)
+
+
+def quantize(vectors, quantization: str):
+    """
+    Quantizes a list of vectors.
+
+    Parameters:
+    - vectors: The vectors to compress, shape (n, dim).
+    - quantization (str): "float16", "int8" or "binary".
+
+    Returns:
+    - tuple: The codes and the per-vector side data (scales and norms for int8, else empty).
+    """
+    vectors = as_float32_matrix(vectors)
+    quantizer = get_quantizer(quantization, vectors.shape[1])
+    if quantizer is None:
+        return vectors, np.empty((len(vectors), 0), dtype=np.float32)
+    return quantizer.encode(vectors)
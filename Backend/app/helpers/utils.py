@@ -1,20 +1,11 @@
+import inspect
+import os
 import random
-import time
 #from datasets import Dataset
-from tqdm import tqdm
 from collections import defaultdict
-from qdrant_client import QdrantClient, AsyncQdrantClient
-from llama_index.core import VectorStoreIndex, StorageContext
-from llama_index.core.ingestion import IngestionPipeline
-from llama_index.core.query_pipeline import QueryPipeline
-from llama_index.core.settings import Settings
-from llama_index.core.storage.docstore import SimpleDocumentStore
-from llama_index.embeddings.cohere import CohereEmbedding
-from llama_index.embeddings.openai import OpenAIEmbedding
-from llama_index.llms.cohere import Cohere
-from llama_index.llms.openai import OpenAI
-
-from llama_index.vector_stores.qdrant import QdrantVectorStore
+
+# llama_index and the provider SDKs take seconds to import, so each helper imports what it
+# needs when it is called rather than when the API starts.
 
 def setup_llm(provider, model, api_key, **kwargs):
     """
@@ -24,15 +15,22 @@ def setup_llm(provider, model, api_key, **kwargs):
     - api_key (str): The API key for authenticating with the LLM service.
     - model (str): The model identifier for the LLM service.
     """
-        
+    from llama_index.core.settings import Settings
+
     if provider == "cohere":
+        from llama_index.llms.cohere import Cohere
         Settings.llm = Cohere(model=model, api_key=api_key, **kwargs)
     elif provider == "openai":
+        from llama_index.llms.openai import OpenAI
         Settings.llm = OpenAI(model=model, api_key=api_key, **kwargs)
+    elif provider == "fake":
+        # Offline LLM for tests and local development, needs no API key
+        from app.helpers.fake_llm import FakeLLM
+        Settings.llm = FakeLLM(**kwargs)
     # elif provider == "mistral":
     #     Settings.llm = MistralAI(model=model, api_key=api_key, **kwargs)
     else:
-        raise ValueError(f"Invalid provider: {provider}. Pick one of 'cohere', 'openai', or 'mistral'.")
+        raise ValueError(f"Invalid provider: {provider}. Pick one of 'cohere', 'openai', 'fake', or 'mistral'.")
 
 def setup_embed_model(provider, **kwargs):
     """
@@ -41,16 +39,23 @@ def setup_embed_model(provider, **kwargs):
     Parameters:
     - model_name (str): The model identifier for the embedding service.
     """
+    from llama_index.core.settings import Settings
+
     if provider == "cohere":
+        from llama_index.embeddings.cohere import CohereEmbedding
         Settings.embed_model = CohereEmbedding(model_name="embed-english-v3.0", **kwargs)
     elif provider == "openai":
+        from llama_index.embeddings.openai import OpenAIEmbedding
         Settings.embed_model = OpenAIEmbedding(model_name="text-embedding-3-large", **kwargs)
+    elif provider == "hash":
+        from app.services.hash_embedding import HashEmbedding
+        Settings.embed_model = HashEmbedding(**kwargs)
     # elif provider == "fastembed":
     #     Settings.embed_model = FastEmbedEmbedding(model_name="BAAI/bge-base-en-v1.5", **kwargs)
     else:
-        raise ValueError(f"Invalid provider: {provider}. Pick one of 'cohere', 'fastembed', or 'openai'.")
+        raise ValueError(f"Invalid provider: {provider}. Pick one of 'cohere', 'fastembed', 'hash', or 'openai'.")
 
-def setup_vector_store(qdrant_url, qdrant_api_key, collection_name, enable_hybrid=False):
+def setup_vector_store(qdrant_url, qdrant_api_key, collection_name, enable_hybrid=False, quantization=None):
     """
     Creates and returns a QdrantVectorStore instance configured with the specified parameters.
 
@@ -58,30 +63,64 @@ def setup_vector_store(qdrant_url, qdrant_api_key, collection_name, enable_hybri
     - qdrant_url (str): The URL for the Qdrant service.
     - qdrant_api_key (str): The API key for authenticating with the Qdrant service.
     - collection_name (str): The name of the collection to be used in the vector store.
+    - quantization (str, optional): "int8" or "binary" to let Qdrant keep quantized vectors in RAM
+        and rescore with the originals. Only applies when the collection is created.
 
     Returns:
     - QdrantVectorStore: An instance of QdrantVectorStore configured with the specified Qdrant client
     """
+    from qdrant_client import QdrantClient, AsyncQdrantClient, models
+    from llama_index.vector_stores.qdrant import QdrantVectorStore
+
+    quantization_config = None
+    if quantization == "int8":
+        quantization_config = models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, always_ram=True)
+        )
+    elif quantization == "binary":
+        quantization_config = models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=True))
+    elif quantization is not None:
+        raise ValueError(f"Invalid quantization: {quantization}. Pick one of 'int8' or 'binary'.")
+    # Older llama-index-vector-stores-qdrant releases swallow unknown keyword arguments
+    if quantization_config is not None and "quantization_config" not in inspect.signature(QdrantVectorStore.__init__).parameters:
+        raise ValueError(
+            "QDRANT_QUANTIZATION is not supported by the installed llama-index-vector-stores-qdrant, "
+            "install the version pinned in requirements.txt."
+        )
+
     client = QdrantClient(location=qdrant_url, api_key=qdrant_api_key)
     aclient = AsyncQdrantClient(location=qdrant_url, api_key=qdrant_api_key)
-    vector_store = QdrantVectorStore(client=client, aclient=aclient, collection_name=collection_name, enable_hybrid=enable_hybrid)
+    vector_store = QdrantVectorStore(
+        client=client, aclient=aclient, collection_name=collection_name,
+        enable_hybrid=enable_hybrid, quantization_config=quantization_config,
+    )
     return vector_store
 
 def get_documents_from_docstore(persist_dir):
     """
     Retrieves the Document objects out of a specified document store.
 
+    When `persist_dir` holds a binary store, a lazy sequence is returned instead and each
+    Document is only materialized when accessed.
+
     Parameters:
     - persist_dir: The document store from which to retrieve the documents.
 
     Returns:
-    - list: A list of Documents from the document store.
+    - list: A list (or lazy sequence) of Documents from the document store.
     """
+    from app.services.binary_store import BinaryStore, is_binary_store
+
+    if is_binary_store(persist_dir):
+        return BinaryStore(persist_dir).documents()
+
+    from llama_index.core.storage.docstore import SimpleDocumentStore
+
     docstore = SimpleDocumentStore.from_persist_dir(persist_dir=persist_dir)
     documents = list(docstore.docs.values())
     return documents
 
-def create_index(from_where, embed_model=Settings.embed_model, **kwargs):
+def create_index(from_where, embed_model=None, **kwargs):
     """
     Creates and returns a VectorStoreIndex instance configured with the specified parameters.
 
@@ -95,6 +134,11 @@ def create_index(from_where, embed_model=Settings.embed_model, **kwargs):
     Returns:
     - VectorStoreIndex: An instance of VectorStoreIndex configured with the specified Qdrant client and vector store.
     """
+    from llama_index.core import VectorStoreIndex
+    from llama_index.core.settings import Settings
+
+    if embed_model is None:
+        embed_model = Settings.embed_model
     if from_where=="vector_store":
         index = VectorStoreIndex.from_vector_store(embed_model=embed_model, **kwargs)
         return index
@@ -104,28 +148,40 @@ def create_index(from_where, embed_model=Settings.embed_model, **kwargs):
     else:
         raise ValueError(f"Invalid option: {from_where}. Pick one of 'vector_store', or 'docs'.")
 
-def ingest(transformations, documents, **kwargs):
+def ingest(transformations, documents, persist_dir=None, **kwargs):
     """
     Createsan IngestionPipeline and ingests the documents.
 
     Parameters:
     - transformations (list): A list of transformations to apply in the pipeline.
     - documents (list): A list of Document objects to be ingested.
+    - persist_dir (str, optional): Directory holding the pipeline's ingestion cache and docstore.
+        When given, previous state is loaded before the run and saved after it, so documents whose
+        content hash is unchanged are skipped and repeated transformations are served from the cache.
     - **kwargs: Additional keyword arguments for configuring the pipeline, such as:
         - docstore: An instance of a document store.
         - vector_store: An instance of a vector store.
         - cache: An instance of an ingestion cache.
 
     Returns:
-    
+    - list: The nodes that were (re)processed in this run.
     """
-    
+    from llama_index.core.ingestion import IngestionPipeline
+
     pipeline = IngestionPipeline(
         transformations=transformations,
         **kwargs
     )
-    
-    return pipeline.run(nodes=documents)
+
+    if persist_dir is not None and os.path.exists(persist_dir):
+        pipeline.load(persist_dir)
+
+    nodes = pipeline.run(nodes=documents)
+
+    if persist_dir is not None:
+        pipeline.persist(persist_dir)
+
+    return nodes
 
 def create_query_pipeline(chain, verbose=True):
     """
@@ -138,6 +194,8 @@ def create_query_pipeline(chain, verbose=True):
     Returns:
     - QueryPipeline: An instance of QueryPipeline configured with the specified chain of components.
     """
+    from llama_index.core.query_pipeline import QueryPipeline
+
     pipeline = QueryPipeline(
         chain=chain,
         verbose=verbose
@@ -250,24 +308,34 @@ def sample_documents(documents_by_author, num_samples=10):
     # Return the list of all sampled documents.
     return sampled_documents
 
-def run_generations_on_eval_set(eval_dataset, col_name, query_pipeline, time_out=True):
+def run_generations_on_eval_set(eval_dataset, col_name, query_pipeline, time_out=True, concurrency=4,
+                                checkpoint_path=None, return_report=False, **runner_kwargs):
     """
     Processes an evaluation dataset to add a new column with answers generated by a query pipeline.
-    
-    This function iterates over each item in a provided dataset, uses a query pipeline to generate an answer
-    for each question, and then appends these answers as a new column in the dataset. If `time_out` is True,
-    the function pauses for 25 seconds after every 5 queries to comply with API rate limits. Progress is visually
-    tracked using a tqdm progress bar.
-    
+
+    The questions are answered concurrently by an `EvaluationRunner`. If `time_out` is True, the
+    run is held to 12 questions per minute (the old pause of 25 seconds after every 5 queries),
+    and throttled calls are retried instead of failing. With a `checkpoint_path`, every answer
+    is saved as it arrives, and calling the function again with the same path only answers the
+    questions that are missing.
+
     Parameters:
         eval_dataset (Dataset): A Hugging Face `Dataset` object containing at least a 'question' field.
         col_name (str): The name of the new column to add to the dataset with the generated answers.
+            The latency of each answer is added as `<col_name>_latency_seconds`.
         query_pipeline: The query pipeline object used to generate answers.
-        time_out (bool): If True, pauses execution to respect API rate limits. Default is True.
-        
+        time_out (bool): If True, limits the request rate to respect API rate limits. Default is True.
+        concurrency (int): Questions answered at once. Default is 4.
+        checkpoint_path (str, optional): JSON Lines file to resume from and save answers to.
+        return_report (bool): If True, also returns the `EvaluationReport` with the latency
+            percentiles, throughput, tokens and cost of the run.
+        **runner_kwargs: Further `EvaluationRunner` options, such as `prompt_cost_per_1k`,
+            `completion_cost_per_1k` or `max_cost`.
+
     Returns:
-        Dataset: The original dataset augmented with a new column containing the generated answers.
-    
+        Dataset: The original dataset augmented with the generated answers and their latencies
+        (and the report, if `return_report` is True).
+
     Example:
         from datasets import load_dataset
         query_pipeline = setup_query_pipeline(api_key="your_api_key")
@@ -275,17 +343,18 @@ def run_generations_on_eval_set(eval_dataset, col_name, query_pipeline, time_out
         updated_dataset = run_generations_on_eval_set(eval_dataset, 'generated_answers', query_pipeline)
         print(updated_dataset)
     """
-    responses = []
-
-    # Use tqdm to create a progress bar over the dataset iteration
-    for i, row in tqdm(enumerate(eval_dataset), total=len(eval_dataset), desc="Generating answers"):
-        response = query_pipeline.run(row['question'])
-        responses.append(response.response)
-        
-        # Pause after every 5 queries to respect the API rate limit, if time_out is True
-        if time_out and (i + 1) % 5 == 0:
-            time.sleep(25)
-    
-    # Add the responses as a new column to the dataset
-    eval_dataset = eval_dataset.add_column(col_name, responses)
-    return eval_dataset
\ No newline at end of file
+    from app.services.evaluation import EvaluationRunner, pipeline_answer_fn
+
+    if time_out:
+        runner_kwargs.setdefault("requests_per_minute", 12)
+    runner = EvaluationRunner(
+        pipeline_answer_fn(query_pipeline), concurrency=concurrency, checkpoint_path=checkpoint_path, **runner_kwargs
+    )
+    report = runner.run([row['question'] for row in eval_dataset])
+
+    # Add the responses as new columns to the dataset
+    eval_dataset = eval_dataset.add_column(col_name, report.column("answer"))
+    eval_dataset = eval_dataset.add_column(f"{col_name}_latency_seconds", report.column("latency_seconds"))
+    if return_report:
+        return eval_dataset, report
+    return eval_dataset
@@ -0,0 +1,105 @@
+import numpy as np
+
+METRICS = ("cosine", "dot", "l2")
+
+
+def as_float32_matrix(vectors) -> np.ndarray:
+    """
+    Converts a vector or a list of vectors into a contiguous 2D float32 matrix.
+
+    Parameters:
+    - vectors: A list of vectors, a single vector, or a numpy array.
+
+    Returns:
+    - np.ndarray: A (n, dim) float32 matrix.
+    """
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[np.newaxis, :]
+    if matrix.ndim != 2:
+        raise ValueError(f"Expected a list of vectors, got an array of shape {matrix.shape}.")
+    return np.ascontiguousarray(matrix)
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """
+    L2-normalizes every row of a matrix. Zero rows are left as zeros.
+    """
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def higher_is_better(metric: str) -> bool:
+    """
+    Whether a larger score means a closer match for the given metric.
+    """
+    return metric != "l2"
+
+
+def pairwise_scores(queries, candidates, metric: str = "cosine") -> np.ndarray:
+    """
+    Computes the (n_queries, n_candidates) score matrix with a single float32 matrix multiply.
+
+    Parameters:
+    - queries: The query vectors, shape (n, dim).
+    - candidates: The candidate vectors, shape (m, dim).
+    - metric (str): "cosine" for cosine similarity, "dot" for inner product, or "l2" for Euclidean distance.
+
+    Returns:
+    - np.ndarray: The float32 score matrix.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Invalid metric: {metric}. Pick one of {', '.join(METRICS)}.")
+
+    queries = as_float32_matrix(queries)
+    candidates = as_float32_matrix(candidates)
+    if queries.shape[1] != candidates.shape[1]:
+        raise ValueError(
+            f"Dimension mismatch: queries have {queries.shape[1]} dimensions, candidates have {candidates.shape[1]}."
+        )
+
+    if metric == "cosine":
+        return normalize_rows(queries) @ normalize_rows(candidates).T
+
+    products = queries @ candidates.T
+    if metric == "dot":
+        return products
+
+    # ||q - c||^2 = ||q||^2 + ||c||^2 - 2 q.c, clipped against rounding below zero
+    squared = (
+        np.einsum("ij,ij->i", queries, queries)[:, np.newaxis]
+        + np.einsum("ij,ij->i", candidates, candidates)[np.newaxis, :]
+        - 2.0 * products
+    )
+    np.maximum(squared, 0.0, out=squared)
+    return np.sqrt(squared, out=squared)
+
+
+def top_k(scores: np.ndarray, k: int, largest: bool = True):
+    """
+    Selects the k best entries of every row with argpartition, then sorts only those k.
+
+    Parameters:
+    - scores (np.ndarray): A (n, m) score matrix.
+    - k (int): The number of entries to keep per row. Clipped to m.
+    - largest (bool): Keep the largest scores if True, the smallest otherwise.
+
+    Returns:
+    - tuple: (indices, values), both of shape (n, min(k, m)), best first.
+    """
+    n_candidates = scores.shape[1]
+    k = min(k, n_candidates)
+    if k <= 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.int64), empty.astype(scores.dtype)
+
+    ranked = -scores if largest else scores
+    if k < n_candidates:
+        indices = np.argpartition(ranked, k - 1, axis=1)[:, :k]
+    else:
+        indices = np.broadcast_to(np.arange(n_candidates), scores.shape).copy()
+    partial = np.take_along_axis(ranked, indices, axis=1)
+    order = np.argsort(partial, axis=1, kind="stable")
+    indices = np.take_along_axis(indices, order, axis=1)
+    return indices, np.take_along_axis(scores, indices, axis=1)
@@ -1,14 +1,30 @@
 # app/main.py
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.routers import embeddings, indexer
+from app.api.routers import embeddings, indexer, vector_index
+from app.core.config import settings
+from app.core.metrics import MetricsMiddleware
+from app.core.profiling import ProfilingMiddleware
+from app.core.tracing import TracingMiddleware
 from fastapi.responses import JSONResponse
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Ingestion runs in the background, so serving never waits for the PDFs to be parsed
+    indexer.submit_startup_ingestion()
+    yield
+    # Close the pooled provider connections on shutdown
+    await embeddings.embedding_handler.aclose()
+    embeddings.plot_renderer.shutdown()
+    indexer.job_manager.shutdown()
+
 app = FastAPI(
     title="Text Embedding API",
     description="API for generating and comparing text embeddings",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Add CORS middleware
@@ -25,6 +41,27 @@ app.include_router(embeddings.router)
 
 app.include_router(indexer.router)
 
+app.include_router(vector_index.router)
+
+if settings.TRACING_ENABLED:
+    from app.api.routers import debug
+
+    app.add_middleware(TracingMiddleware)
+    app.include_router(debug.router)
+
+if settings.PROFILING_ENABLED:
+    from app.api.routers import profiling
+
+    app.add_middleware(ProfilingMiddleware)
+    app.include_router(profiling.router)
+
+if settings.METRICS_ENABLED:
+    from app.api.routers import metrics
+
+    # Outermost, so the timings include the other middleware
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(metrics.router)
+
 # Optionally, add a root endpoint
 @app.get("/", tags=["Root"])
 def read_root():
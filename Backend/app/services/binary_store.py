@@ -0,0 +1,434 @@
+# app/services/binary_store.py
+
+"""
+Binary persistence for docstores and vector stores.
+
+A store is a directory holding three files:
+
+- `nodes.sqlite`: one row per node with its id, type, text, metadata and remaining fields,
+  indexed by node id.
+- `embeddings.npy`: a float32 (n, dim) matrix, opened memory-mapped. Only present when at
+  least one node has an embedding; `nodes.emb_row` points into it.
+- `store.json`: format version, node count and embedding dimension, written last.
+
+Opening a store reads `store.json` and nothing else, so it takes the same time and memory for
+a hundred nodes as for millions. Nodes are materialized one at a time, only when accessed.
+
+Migrate a JSON persist directory (docstore.json / default__vector_store.json) with:
+
+    python -m app.services.binary_store migrate --src ../database/persist/sample --dst ../database/persist/sample_bin
+"""
+
+import argparse
+import collections.abc
+import json
+import os
+import shutil
+import sqlite3
+import time
+
+import numpy as np
+
+from app.core.logging_config import setup_logging
+from app.helpers.vector_math import higher_is_better, pairwise_scores, top_k as select_top_k
+
+logger = setup_logging()
+
+FORMAT_VERSION = 1
+NODES_FILE = "nodes.sqlite"
+EMBEDDINGS_FILE = "embeddings.npy"
+META_FILE = "store.json"
+
+DOCSTORE_FILE = "docstore.json"
+VECTOR_STORE_FILE = "default__vector_store.json"
+
+
+def is_binary_store(path: str) -> bool:
+    return os.path.exists(os.path.join(path, META_FILE))
+
+
+def remove_binary_store(path: str):
+    """
+    Deletes the binary store files in `path`, leaving anything else in the directory alone.
+    """
+    for name in (META_FILE, NODES_FILE, EMBEDDINGS_FILE):
+        target = os.path.join(path, name)
+        if os.path.exists(target):
+            os.remove(target)
+
+
+class BinaryStoreWriter:
+    """
+    Streams nodes into a new binary store.
+
+    Rows go to SQLite and embeddings to a raw float32 scratch file as they arrive, so memory
+    stays flat. On `close` the embeddings become `embeddings.npy` and the files are moved into
+    `path`, with `store.json` last so a first write is only recognized once it is complete.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.tmp_path = f"{os.path.normpath(path)}.tmp"
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+        os.makedirs(self.tmp_path)
+
+        self._conn = sqlite3.connect(os.path.join(self.tmp_path, NODES_FILE))
+        self._conn.execute("PRAGMA synchronous=OFF")
+        self._conn.execute(
+            """
+            CREATE TABLE nodes (
+                row INTEGER PRIMARY KEY,
+                node_id TEXT NOT NULL UNIQUE,
+                doc_type TEXT NOT NULL,
+                ref_doc_id TEXT,
+                doc_hash TEXT,
+                text TEXT,
+                metadata TEXT,
+                data TEXT NOT NULL,
+                emb_row INTEGER
+            )
+            """
+        )
+        self._raw_path = os.path.join(self.tmp_path, "embeddings.f32")
+        self._raw = open(self._raw_path, "wb")
+        self.count = 0
+        self.embedding_count = 0
+        self.dim = None
+
+    def add(self, node_id: str, doc_type: str, data: dict, doc_hash: str = None,
+            ref_doc_id: str = None, embedding=None):
+        """
+        Adds one node from its serialized form (`__type__` and `__data__` of the JSON docstore).
+        """
+        data = dict(data)
+        text = data.pop("text", None)
+        metadata = data.pop("metadata", None)
+        stored_embedding = data.pop("embedding", None)
+        if embedding is None:
+            embedding = stored_embedding
+
+        emb_row = None
+        if embedding is not None:
+            vector = np.asarray(embedding, dtype=np.float32)
+            if self.dim is None:
+                self.dim = vector.shape[0]
+            elif vector.shape[0] != self.dim:
+                raise ValueError(f"Node '{node_id}' has {vector.shape[0]} dimensions, expected {self.dim}.")
+            self._raw.write(vector.tobytes())
+            emb_row = self.embedding_count
+            self.embedding_count += 1
+
+        self._conn.execute(
+            "INSERT INTO nodes (row, node_id, doc_type, ref_doc_id, doc_hash, text, metadata, data, emb_row) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                self.count, node_id, doc_type, ref_doc_id, doc_hash, text,
+                json.dumps(metadata) if metadata is not None else None,
+                json.dumps(data), emb_row,
+            ),
+        )
+        self.count += 1
+
+    def add_documents(self, documents):
+        """
+        Adds llama_index nodes or documents.
+        """
+        for document in documents:
+            self.add(
+                document.node_id,
+                document.get_type(),
+                document.dict(),
+                doc_hash=document.hash,
+                ref_doc_id=document.ref_doc_id,
+                embedding=document.embedding,
+            )
+
+    def close(self) -> dict:
+        self._conn.commit()
+        self._conn.close()
+        self._raw.close()
+
+        if self.embedding_count:
+            raw = np.memmap(self._raw_path, dtype=np.float32, mode="r", shape=(self.embedding_count, self.dim))
+            out = np.lib.format.open_memmap(
+                os.path.join(self.tmp_path, EMBEDDINGS_FILE), mode="w+", dtype=np.float32,
+                shape=(self.embedding_count, self.dim),
+            )
+            block = max(1, (64 * 1024 * 1024) // (4 * self.dim))
+            for start in range(0, self.embedding_count, block):
+                out[start:start + block] = raw[start:start + block]
+            out.flush()
+            del raw, out
+        os.remove(self._raw_path)
+
+        meta = {
+            "format_version": FORMAT_VERSION,
+            "count": self.count,
+            "embeddings": self.embedding_count,
+            "dim": self.dim,
+            "created_at": time.time(),
+        }
+        with open(os.path.join(self.tmp_path, META_FILE), "w") as f:
+            json.dump(meta, f)
+
+        os.makedirs(self.path, exist_ok=True)
+        for name in (NODES_FILE, EMBEDDINGS_FILE, META_FILE):
+            source = os.path.join(self.tmp_path, name)
+            target = os.path.join(self.path, name)
+            if os.path.exists(source):
+                os.replace(source, target)
+            elif os.path.exists(target):
+                os.remove(target)
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+        logger.info(f"Wrote binary store {self.path}: {meta}")
+        return meta
+
+    def abort(self):
+        self._conn.close()
+        self._raw.close()
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class BinaryStore:
+    """
+    Read-only view of a binary store. The SQLite file and the embedding matrix are opened on
+    first access, and embeddings are memory-mapped, so pages are only read when touched.
+    """
+
+    def __init__(self, path: str):
+        if not is_binary_store(path):
+            raise FileNotFoundError(f"No binary store found in {path}.")
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as f:
+            self.meta = json.load(f)
+        if self.meta.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported binary store version: {self.meta.get('format_version')}.")
+        self._conn = None
+        self._embeddings = None
+
+    def __len__(self) -> int:
+        return self.meta["count"]
+
+    @property
+    def dim(self):
+        return self.meta["dim"]
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            uri = f"file:{os.path.abspath(os.path.join(self.path, NODES_FILE))}?mode=ro"
+            self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        return self._conn
+
+    @property
+    def embeddings(self):
+        """
+        The (n, dim) float32 embedding matrix as a read-only memmap, or None without embeddings.
+        """
+        if self._embeddings is None and self.meta["embeddings"]:
+            self._embeddings = np.load(os.path.join(self.path, EMBEDDINGS_FILE), mmap_mode="r")
+        return self._embeddings
+
+    def _materialize(self, row: tuple, with_embedding: bool = False):
+        from llama_index.core.storage.docstore.utils import json_to_doc
+
+        node_id, doc_type, text, metadata, data, emb_row = row
+        data = json.loads(data)
+        data["text"] = text
+        data["metadata"] = json.loads(metadata) if metadata is not None else {}
+        if with_embedding and emb_row is not None:
+            data["embedding"] = self.embeddings[emb_row].tolist()
+        return json_to_doc({"__type__": doc_type, "__data__": data})
+
+    _COLUMNS = "node_id, doc_type, text, metadata, data, emb_row"
+
+    def get(self, node_id: str, with_embedding: bool = False):
+        """
+        Materializes one node by id. Raises KeyError when it does not exist.
+        """
+        row = self.conn.execute(f"SELECT {self._COLUMNS} FROM nodes WHERE node_id = ?", (node_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"Node '{node_id}' does not exist.")
+        return self._materialize(row, with_embedding)
+
+    def get_row(self, index: int, with_embedding: bool = False):
+        row = self.conn.execute(f"SELECT {self._COLUMNS} FROM nodes WHERE row = ?", (index,)).fetchone()
+        if row is None:
+            raise IndexError(index)
+        return self._materialize(row, with_embedding)
+
+    def get_embedding(self, node_id: str):
+        """
+        Returns a node's embedding as a zero-copy view into the memmap, or None.
+        """
+        row = self.conn.execute("SELECT emb_row FROM nodes WHERE node_id = ?", (node_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"Node '{node_id}' does not exist.")
+        return None if row[0] is None else self.embeddings[row[0]]
+
+    def node_ids(self) -> list:
+        return [row[0] for row in self.conn.execute("SELECT node_id FROM nodes ORDER BY row")]
+
+    def iter_nodes(self, batch_size: int = 256, with_embedding: bool = False):
+        cursor = self.conn.execute(f"SELECT {self._COLUMNS} FROM nodes ORDER BY row")
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            for row in rows:
+                yield self._materialize(row, with_embedding)
+
+    def documents(self) -> "LazyNodeList":
+        return LazyNodeList(self)
+
+    def search(self, query, k: int = 10, metric: str = "cosine", block_rows: int = 16384) -> list:
+        """
+        Exact top-k search over the memory-mapped embeddings, scanned in blocks.
+        Only the k best nodes are read from SQLite and materialized.
+
+        Returns:
+        - list: (node, score) pairs, best first.
+        """
+        embeddings = self.embeddings
+        if embeddings is None:
+            return []
+        largest = higher_is_better(metric)
+        best_rows = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+        for start in range(0, embeddings.shape[0], block_rows):
+            scores = pairwise_scores(query, embeddings[start:start + block_rows], metric=metric)[0]
+            rows = np.concatenate([best_rows, np.arange(start, start + scores.shape[0])])
+            scores = np.concatenate([best_scores, scores])
+            indices, _ = select_top_k(scores[np.newaxis, :], k, largest=largest)
+            best_rows, best_scores = rows[indices[0]], scores[indices[0]]
+
+        placeholders = ",".join("?" * len(best_rows))
+        found = {
+            row[-1]: row
+            for row in self.conn.execute(
+                f"SELECT {self._COLUMNS} FROM nodes WHERE emb_row IN ({placeholders})",
+                [int(r) for r in best_rows],
+            )
+        }
+        return [(self._materialize(found[int(r)]), float(s)) for r, s in zip(best_rows, best_scores)]
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        self._embeddings = None
+
+
+class LazyNodeList(collections.abc.Sequence):
+    """
+    A list-like view of every node in a store, materializing nodes only when they are accessed.
+    """
+
+    def __init__(self, store: BinaryStore):
+        self.store = store
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.store.get_row(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        return self.store.get_row(index)
+
+    def __iter__(self):
+        return self.store.iter_nodes()
+
+
+def migrate(src: str, dst: str) -> dict:
+    """
+    Converts a JSON persist directory into a binary store.
+
+    Nodes come from `docstore.json`; embeddings come from the nodes themselves or from
+    `default__vector_store.json`. Vector-store entries without a docstore node are kept with
+    their metadata and no text.
+
+    Parameters:
+    - src (str): The JSON persist directory.
+    - dst (str): The directory of the binary store to write.
+
+    Returns:
+    - dict: The metadata of the written store.
+    """
+    docstore_path = os.path.join(src, DOCSTORE_FILE)
+    vector_store_path = os.path.join(src, VECTOR_STORE_FILE)
+    if not os.path.exists(docstore_path) and not os.path.exists(vector_store_path):
+        raise FileNotFoundError(f"Neither {DOCSTORE_FILE} nor {VECTOR_STORE_FILE} exists in {src}.")
+
+    docstore = {}
+    if os.path.exists(docstore_path):
+        with open(docstore_path) as f:
+            docstore = json.load(f)
+    vector_store = {}
+    if os.path.exists(vector_store_path):
+        with open(vector_store_path) as f:
+            vector_store = json.load(f)
+
+    nodes = docstore.get("docstore/data", {})
+    hashes = docstore.get("docstore/metadata", {})
+    embedding_dict = vector_store.get("embedding_dict", {})
+    ref_doc_ids = vector_store.get("text_id_to_ref_doc_id", {})
+    vector_metadata = vector_store.get("metadata_dict", {})
+
+    with BinaryStoreWriter(dst) as writer:
+        for node_id, node in nodes.items():
+            data = node["__data__"]
+            writer.add(
+                node_id,
+                node["__type__"],
+                data,
+                doc_hash=hashes.get(node_id, {}).get("doc_hash"),
+                ref_doc_id=hashes.get(node_id, {}).get("ref_doc_id") or ref_doc_ids.get(node_id),
+                embedding=embedding_dict.get(node_id, data.get("embedding")),
+            )
+        for node_id, embedding in embedding_dict.items():
+            if node_id in nodes:
+                continue
+            metadata = vector_metadata.get(node_id, {})
+            writer.add(
+                node_id,
+                "1",  # TextNode
+                {"id_": node_id, "metadata": metadata},
+                ref_doc_id=ref_doc_ids.get(node_id),
+                embedding=embedding,
+            )
+    with open(os.path.join(dst, META_FILE)) as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Binary docstore / vector store tools.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = commands.add_parser("migrate", help="Convert a JSON persist directory into a binary store.")
+    migrate_parser.add_argument("--src", required=True, help="JSON persist directory")
+    migrate_parser.add_argument("--dst", required=True, help="Binary store directory to write")
+    info_parser = commands.add_parser("info", help="Print the metadata of a binary store.")
+    info_parser.add_argument("--path", required=True)
+    args = parser.parse_args(argv)
+
+    if args.command == "migrate":
+        start = time.perf_counter()
+        meta = migrate(args.src, args.dst)
+        print(f"Migrated {meta['count']} nodes ({meta['embeddings']} embeddings) to {args.dst} "
+              f"in {time.perf_counter() - start:.2f}s")
+    else:
+        print(json.dumps(BinaryStore(args.path).meta, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+# app/services/bm25.py
+
+import json
+import math
+import os
+import re
+import shutil
+import threading
+import time
+from array import array
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.logging_config import setup_logging
+
+logger = setup_logging()
+
+FORMAT_VERSION = 1
+MANIFEST_FILE = "bm25.json"
+POSTINGS_FILE = "postings.npz"
+# Names the version directory holding the current manifest and postings
+CURRENT_FILE = "CURRENT"
+
+TOKEN_RE = re.compile(r"\w+")
+STOPWORDS = frozenset(
+    "a an and are as at be been but by can for from has have in into is it its of on or that the "
+    "their then there these they this to was were which while will with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased word tokens without stopwords. Digits and underscores are kept, so terms such
+    as "gpt", "2" or "cls" stay searchable.
+    """
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    In-process BM25 inverted index over text nodes, built incrementally.
+
+    Each term keeps its postings as two compact typed arrays (int32 rows, uint16 term
+    frequencies). Removing a node only tombstones its row and keeps corpus statistics
+    exact; dead rows are dropped from the postings when the index is saved. Nodes are
+    grouped by their reference document, so re-adding a document replaces all of its nodes.
+    The index stores no text, only the node ids needed to join with the vector store.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.node_ids: List[str] = []
+        self.ref_doc_ids: List[str] = []
+        self._row_by_id = {}
+        self._rows_by_ref_doc = {}
+        self._doc_lens = array("i")
+        self._alive = bytearray()
+        self._terms = {}
+        self._postings_rows: List[array] = []
+        self._postings_tfs: List[array] = []
+        self._live = 0
+        self._total_len = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return self._live
+
+    @property
+    def vocabulary_size(self) -> int:
+        return len(self._terms)
+
+    # ------------------------------------------------------------------ updates
+
+    def add(self, node_id: str, text: str, ref_doc_id: Optional[str] = None):
+        """
+        Indexes one node, replacing a node with the same id.
+        """
+        with self._lock:
+            self._remove_row(self._row_by_id.get(node_id))
+            counts = {}
+            for token in tokenize(text):
+                counts[token] = counts.get(token, 0) + 1
+
+            row = len(self.node_ids)
+            ref_doc_id = ref_doc_id or node_id
+            self.node_ids.append(node_id)
+            self.ref_doc_ids.append(ref_doc_id)
+            self._row_by_id[node_id] = row
+            self._rows_by_ref_doc.setdefault(ref_doc_id, []).append(row)
+            length = sum(counts.values())
+            self._doc_lens.append(length)
+            self._alive.append(1)
+            self._live += 1
+            self._total_len += length
+
+            for token, count in counts.items():
+                term = self._terms.get(token)
+                if term is None:
+                    term = self._terms[token] = len(self._postings_rows)
+                    self._postings_rows.append(array("i"))
+                    self._postings_tfs.append(array("H"))
+                self._postings_rows[term].append(row)
+                self._postings_tfs[term].append(min(count, 65535))
+
+    def add_nodes(self, nodes: Iterable) -> int:
+        """
+        Indexes llama_index nodes. Every document the nodes come from is replaced as a whole,
+        so chunks of a changed document that no longer exist are removed.
+
+        Returns:
+        - int: The number of nodes added.
+        """
+        nodes = list(nodes)
+        with self._lock:
+            for ref_doc_id in {node.ref_doc_id or node.node_id for node in nodes}:
+                self.delete_ref_doc(ref_doc_id)
+            for node in nodes:
+                self.add(node.node_id, node.get_content(), node.ref_doc_id)
+        return len(nodes)
+
+    def delete_ref_doc(self, ref_doc_id: str) -> int:
+        with self._lock:
+            rows = self._rows_by_ref_doc.pop(ref_doc_id, [])
+            for row in rows:
+                self._remove_row(row)
+            return len(rows)
+
+    def _remove_row(self, row: Optional[int]):
+        if row is None or not self._alive[row]:
+            return
+        self._alive[row] = 0
+        self._live -= 1
+        self._total_len -= self._doc_lens[row]
+        del self._row_by_id[self.node_ids[row]]
+
+    # ------------------------------------------------------------------- search
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """
+        Scores the live nodes against the query with Okapi BM25.
+
+        Returns:
+        - list: Up to k (node_id, score) tuples with a positive score, best first.
+        """
+        if k <= 0:
+            raise ValueError("k must be a positive integer.")
+        with self._lock:
+            if not self._live:
+                return []
+            alive = np.frombuffer(self._alive, dtype=np.bool_)
+            doc_lens = np.frombuffer(self._doc_lens, dtype=np.int32)
+            avgdl = self._total_len / self._live or 1.0
+            scores = np.zeros(len(self.node_ids), dtype=np.float32)
+
+            for token in set(tokenize(query)):
+                term = self._terms.get(token)
+                if term is None:
+                    continue
+                rows = np.frombuffer(self._postings_rows[term], dtype=np.int32)
+                tfs = np.frombuffer(self._postings_tfs[term], dtype=np.uint16).astype(np.float32)
+                live = alive[rows]
+                rows, tfs = rows[live], tfs[live]
+                if not len(rows):
+                    continue
+                idf = math.log(1 + (self._live - len(rows) + 0.5) / (len(rows) + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * doc_lens[rows] / avgdl)
+                scores[rows] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+
+            candidates = np.flatnonzero(scores > 0)
+            if len(candidates) > k:
+                candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+            candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+            return [(self.node_ids[row], float(scores[row])) for row in candidates]
+
+    # -------------------------------------------------------------- persistence
+
+    def info(self) -> dict:
+        return {
+            "nodes": self._live,
+            "rows": len(self.node_ids),
+            "terms": len(self._terms),
+            "postings": sum(len(rows) for rows in self._postings_rows),
+            "k1": self.k1,
+            "b": self.b,
+        }
+
+    @staticmethod
+    def current_version(directory: str) -> Optional[str]:
+        """
+        The version last saved to `directory`, or None when no index was saved there.
+        """
+        try:
+            with open(os.path.join(directory, CURRENT_FILE)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    @classmethod
+    def exists(cls, directory: str) -> bool:
+        return cls.current_version(directory) is not None
+
+    def save(self, directory: str) -> str:
+        """
+        Saves the live nodes as CSR postings (postings.npz) plus a JSON manifest.
+
+        Both files go to a new version directory, and the CURRENT file naming it is replaced
+        last, so readers always load a manifest and postings from the same save. The version
+        before it is kept for readers still loading it; older ones are removed.
+
+        Returns:
+        - str: The saved version.
+        """
+        with self._lock:
+            previous = self.current_version(directory)
+            # Fixed-width hex timestamps sort in save order
+            version = f"v{time.time_ns():016x}-{os.getpid()}"
+            version_dir = os.path.join(directory, version)
+            os.makedirs(version_dir)
+            live_rows = [row for row in range(len(self.node_ids)) if self._alive[row]]
+            remap = np.full(len(self.node_ids), -1, dtype=np.int32)
+            remap[live_rows] = np.arange(len(live_rows), dtype=np.int32)
+
+            vocabulary, offsets, row_chunks, tf_chunks = [], [0], [], []
+            for token, term in self._terms.items():
+                rows = remap[np.frombuffer(self._postings_rows[term], dtype=np.int32)]
+                live = rows >= 0
+                if not live.any():
+                    continue
+                vocabulary.append(token)
+                row_chunks.append(rows[live])
+                tf_chunks.append(np.frombuffer(self._postings_tfs[term], dtype=np.uint16)[live])
+                offsets.append(offsets[-1] + int(live.sum()))
+
+            with open(os.path.join(version_dir, POSTINGS_FILE), "wb") as f:
+                np.savez(
+                    f,
+                    offsets=np.asarray(offsets, dtype=np.int64),
+                    rows=np.concatenate(row_chunks) if row_chunks else np.empty(0, dtype=np.int32),
+                    tfs=np.concatenate(tf_chunks) if tf_chunks else np.empty(0, dtype=np.uint16),
+                    doc_lens=np.frombuffer(self._doc_lens, dtype=np.int32)[live_rows],
+                )
+
+            manifest = {
+                "format_version": FORMAT_VERSION,
+                "k1": self.k1,
+                "b": self.b,
+                "node_ids": [self.node_ids[row] for row in live_rows],
+                "ref_doc_ids": [self.ref_doc_ids[row] for row in live_rows],
+                "vocabulary": vocabulary,
+            }
+            with open(os.path.join(version_dir, MANIFEST_FILE), "w") as f:
+                json.dump(manifest, f)
+
+            current_path = os.path.join(directory, CURRENT_FILE)
+            with open(f"{current_path}.{version}.tmp", "w") as f:
+                f.write(version)
+            os.replace(f"{current_path}.{version}.tmp", current_path)
+            if previous is not None:
+                for name in os.listdir(directory):
+                    if name.startswith("v") and name < previous:
+                        shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+            logger.info(f"Saved BM25 index with {len(live_rows)} nodes and {len(vocabulary)} terms to {version_dir}")
+            return version
+
+    @classmethod
+    def load(cls, directory: str, version: Optional[str] = None) -> "BM25Index":
+        """
+        Loads the given version saved to `directory`, by default the current one.
+        """
+        version = version or cls.current_version(directory)
+        if version is None:
+            raise FileNotFoundError(f"No BM25 index saved in {directory}")
+        directory = os.path.join(directory, version)
+        with open(os.path.join(directory, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+        if manifest.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported BM25 index format in {directory}: {manifest.get('format_version')}")
+        postings = np.load(os.path.join(directory, POSTINGS_FILE))
+        offsets, rows, tfs = postings["offsets"], postings["rows"], postings["tfs"]
+
+        index = cls(k1=manifest["k1"], b=manifest["b"])
+        index.node_ids = manifest["node_ids"]
+        index.ref_doc_ids = manifest["ref_doc_ids"]
+        index._row_by_id = {node_id: row for row, node_id in enumerate(index.node_ids)}
+        for row, ref_doc_id in enumerate(index.ref_doc_ids):
+            index._rows_by_ref_doc.setdefault(ref_doc_id, []).append(row)
+        index._doc_lens = array("i", postings["doc_lens"].astype(np.int32).tobytes())
+        index._alive = bytearray(b"\x01" * len(index.node_ids))
+        index._live = len(index.node_ids)
+        index._total_len = int(postings["doc_lens"].sum())
+        for term, token in enumerate(manifest["vocabulary"]):
+            index._terms[token] = term
+            start, end = offsets[term], offsets[term + 1]
+            index._postings_rows.append(array("i", rows[start:end].astype(np.int32).tobytes()))
+            index._postings_tfs.append(array("H", tfs[start:end].astype(np.uint16).tobytes()))
+        logger.info(f"Loaded BM25 index with {len(index)} nodes from {directory}")
+        return index
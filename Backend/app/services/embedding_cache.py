@@ -0,0 +1,270 @@
+# app/services/embedding_cache.py
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.core.logging_config import setup_logging
+
+logger = setup_logging()
+
+CacheKey = Tuple[str, str]
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalizes text before hashing so trivially different inputs share a cache entry.
+    Only unicode composition and surrounding whitespace are normalized; inner whitespace
+    and casing are left untouched because the provider treats them as significant.
+    """
+    return unicodedata.normalize("NFC", text).strip()
+
+
+def make_cache_key(model: str, text: str) -> CacheKey:
+    """
+    Builds the content address of an embedding: (model name, sha256 of normalized text).
+    """
+    digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return model, digest
+
+
+class _SQLiteTier:
+    """
+    On-disk cache tier storing float32 blobs in SQLite, bounded by total blob bytes.
+    Least recently used rows are evicted first. The connection is shared between threads
+    and serialized by the tier's own lock.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                nbytes INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (model, digest)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON embeddings (last_access)")
+        row = self._conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM embeddings").fetchone()
+        self.current_bytes = int(row[0])
+        self._lock = threading.Lock()
+
+    def get(self, key: CacheKey) -> Optional[np.ndarray]:
+        with self._lock:
+            return self._get(key)
+
+    def _get(self, key: CacheKey) -> Optional[np.ndarray]:
+        row = self._conn.execute(
+            "SELECT vector FROM embeddings WHERE model = ? AND digest = ?", key
+        ).fetchone()
+        if row is None:
+            return None
+        self._conn.execute(
+            "UPDATE embeddings SET last_access = ? WHERE model = ? AND digest = ?",
+            (time.time(), *key),
+        )
+        return np.frombuffer(row[0], dtype=np.float32)
+
+    def get_many(self, keys: List[CacheKey]) -> List[Optional[np.ndarray]]:
+        with self._lock:
+            return [self._get(key) for key in keys]
+
+    def put(self, key: CacheKey, vector: np.ndarray) -> int:
+        """
+        Stores a vector and returns the number of rows evicted to stay within budget.
+        """
+        with self._lock:
+            return self._put(key, vector)
+
+    def put_many(self, keys: List[CacheKey], vectors: List[np.ndarray]) -> int:
+        with self._lock:
+            return sum(self._put(key, vector) for key, vector in zip(keys, vectors))
+
+    def _put(self, key: CacheKey, vector: np.ndarray) -> int:
+        blob = vector.tobytes()
+        if len(blob) > self.max_bytes:
+            return 0
+        previous = self._conn.execute(
+            "SELECT nbytes FROM embeddings WHERE model = ? AND digest = ?", key
+        ).fetchone()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO embeddings (model, digest, vector, nbytes, last_access) VALUES (?, ?, ?, ?, ?)",
+            (*key, blob, len(blob), time.time()),
+        )
+        self.current_bytes += len(blob) - (previous[0] if previous else 0)
+        return self._evict()
+
+    def _evict(self) -> int:
+        evicted = 0
+        while self.current_bytes > self.max_bytes:
+            row = self._conn.execute(
+                "SELECT model, digest, nbytes FROM embeddings ORDER BY last_access ASC LIMIT 1"
+            ).fetchone()
+            if row is None:
+                self.current_bytes = 0
+                break
+            self._conn.execute("DELETE FROM embeddings WHERE model = ? AND digest = ?", (row[0], row[1]))
+            self.current_bytes -= row[2]
+            evicted += 1
+        return evicted
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self.current_bytes = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache with an in-process LRU tier and an optional SQLite tier.
+
+    Vectors are stored as float32 and both tiers are bounded by bytes. Memory misses fall
+    through to disk, and disk hits are promoted back into memory. The async methods read and
+    write the disk tier in a worker thread, so SQLite never blocks the event loop.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, disk_path: Optional[str] = None,
+                 disk_max_bytes: int = 512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._memory: "OrderedDict[CacheKey, np.ndarray]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._disk = _SQLiteTier(disk_path, disk_max_bytes) if disk_path else None
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        key = make_cache_key(model, text)
+        vector = self._get_memory(key)
+        if vector is None:
+            vector = self._disk.get(key) if self._disk is not None else None
+            self._record_disk_lookup(key, vector)
+        return vector.tolist() if vector is not None else None
+
+    async def aget_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Looks up several texts, reading the memory misses from disk in one worker thread call.
+        """
+        keys = [make_cache_key(model, text) for text in texts]
+        vectors = [self._get_memory(key) for key in keys]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            if self._disk is not None:
+                found = await asyncio.to_thread(self._disk.get_many, [keys[i] for i in missing])
+            else:
+                found = [None] * len(missing)
+            for i, vector in zip(missing, found):
+                self._record_disk_lookup(keys[i], vector)
+                vectors[i] = vector
+        return [vector.tolist() if vector is not None else None for vector in vectors]
+
+    async def aget(self, model: str, text: str) -> Optional[List[float]]:
+        return (await self.aget_many(model, [text]))[0]
+
+    def _get_memory(self, key: CacheKey) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+            return vector
+
+    def _record_disk_lookup(self, key: CacheKey, vector: Optional[np.ndarray]):
+        with self._lock:
+            if vector is None:
+                self.misses += 1
+                return
+            self.hits += 1
+            self.disk_hits += 1
+            self._put_memory(key, vector)
+
+    def put(self, model: str, text: str, embedding: List[float]):
+        key = make_cache_key(model, text)
+        vector = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            self._put_memory(key, vector)
+        if self._disk is not None:
+            evicted = self._disk.put(key, vector)
+            with self._lock:
+                self.disk_evictions += evicted
+
+    async def aput_many(self, model: str, texts: List[str], embeddings: List[List[float]]):
+        """
+        Stores several embeddings, writing them to disk in one worker thread call.
+        """
+        keys = [make_cache_key(model, text) for text in texts]
+        vectors = [np.asarray(embedding, dtype=np.float32) for embedding in embeddings]
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                self._put_memory(key, vector)
+        if self._disk is not None:
+            evicted = await asyncio.to_thread(self._disk.put_many, keys, vectors)
+            with self._lock:
+                self.disk_evictions += evicted
+
+    async def aput(self, model: str, text: str, embedding: List[float]):
+        await self.aput_many(model, [text], [embedding])
+
+    def _put_memory(self, key: CacheKey, vector: np.ndarray):
+        if vector.nbytes > self.max_bytes:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= previous.nbytes
+        self._memory[key] = vector
+        self._memory_bytes += vector.nbytes
+        while self._memory_bytes > self.max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted.nbytes
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            if self._disk is not None:
+                self._disk.clear()
+
+    def stats(self) -> dict:
+        disk_entries = len(self._disk) if self._disk is not None else 0
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_evictions": self.disk_evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "memory_max_bytes": self.max_bytes,
+                "disk_entries": disk_entries,
+                "disk_bytes": self._disk.current_bytes if self._disk is not None else 0,
+            }
@@ -0,0 +1,118 @@
+# app/services/embedding_providers.py
+
+import threading
+
+from app.core.config import settings
+from app.core.logging_config import setup_logging
+
+logger = setup_logging()
+
+
+def _build_cohere(model_name: str, http_client=None, async_http_client=None, **options):
+    from llama_index.embeddings.cohere import CohereEmbedding
+    from app.services.scheduler import disable_cohere_retries
+
+    if not settings.COHERE_API_KEY:
+        raise ValueError(f"COHERE_API_KEY is not set, it is required by the Cohere model '{model_name}'.")
+    model = CohereEmbedding(
+        model_name=model_name,
+        api_key=settings.COHERE_API_KEY,
+        embed_batch_size=settings.EMBEDDING_BATCH_SIZE,
+        httpx_client=http_client,
+        httpx_async_client=async_http_client,
+        **options,
+    )
+    # Retries are left to the request scheduler, which also knows about the other callers
+    disable_cohere_retries(model._get_client())
+    disable_cohere_retries(model._get_async_client())
+    return model
+
+
+def _build_openai(model_name: str, http_client=None, async_http_client=None, **options):
+    from llama_index.embeddings.openai import OpenAIEmbedding
+
+    if not settings.OPENAI_API_KEY:
+        raise ValueError(f"OPENAI_API_KEY is not set, it is required by the OpenAI model '{model_name}'.")
+    # Retries are left to the request scheduler, which also knows about the other callers
+    options.setdefault("max_retries", 0)
+    return OpenAIEmbedding(
+        model=model_name,
+        api_key=settings.OPENAI_API_KEY,
+        http_client=http_client,
+        async_http_client=async_http_client,
+        **options,
+    )
+
+
+def _build_hash(model_name: str, http_client=None, async_http_client=None, **options):
+    from app.services.hash_embedding import HashEmbedding
+
+    return HashEmbedding(model_name=model_name, embed_batch_size=settings.EMBEDDING_BATCH_SIZE, **options)
+
+
+# Provider name -> factory(model_name, http_client, async_http_client, **options)
+PROVIDERS = {
+    "cohere": _build_cohere,
+    "openai": _build_openai,
+    "hash": _build_hash,
+}
+# Providers reached over the network, whose calls go through the request scheduler
+REMOTE_PROVIDERS = ("cohere", "openai")
+
+
+class EmbeddingProviderRegistry:
+    """
+    Embedding models by alias, declared in configuration and instantiated on first use.
+
+    Each spec names a provider from `PROVIDERS`, the provider's `model_name`, and any extra
+    provider options. Nothing is imported or constructed until an alias is requested, so
+    unused providers cost nothing at startup and need no API key. With a `scheduler`, remote
+    models are wrapped so their calls are rate limited, retried and coalesced.
+    """
+
+    def __init__(self, specs: dict, http_client=None, async_http_client=None, scheduler=None):
+        for alias, spec in specs.items():
+            if spec.get("provider") not in PROVIDERS:
+                raise ValueError(
+                    f"Invalid provider for embedding model '{alias}': {spec.get('provider')}. "
+                    f"Pick one of {', '.join(PROVIDERS)}."
+                )
+        self.specs = {alias: dict(spec) for alias, spec in specs.items()}
+        self.http_client = http_client
+        self.async_http_client = async_http_client
+        self.scheduler = scheduler
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def names(self) -> list:
+        return list(self.specs)
+
+    def loaded(self) -> list:
+        return list(self._models)
+
+    def get(self, alias: str):
+        """
+        Returns the model registered under `alias`, creating it on first use.
+        """
+        model = self._models.get(alias)
+        if model is not None:
+            return model
+        if alias not in self.specs:
+            raise ValueError(f"Invalid model specified. Choose from {', '.join(repr(name) for name in self.specs)}.")
+
+        with self._lock:
+            if alias not in self._models:
+                options = dict(self.specs[alias])
+                provider = options.pop("provider")
+                logger.info(f"Loading embedding model '{alias}' ({provider}: {options.get('model_name')})")
+                model = PROVIDERS[provider](
+                    http_client=self.http_client,
+                    async_http_client=self.async_http_client,
+                    **options,
+                )
+                if self.scheduler is not None and provider in REMOTE_PROVIDERS:
+                    from app.services.scheduled_embedding import ScheduledEmbedding
+
+                    model = ScheduledEmbedding(model, self.scheduler, scheduler_key=f"{provider}/{options.get('model_name')}")
+                self._models[alias] = model
+            return self._models[alias]
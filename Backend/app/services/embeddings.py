@@ -1,40 +1,105 @@
 import numpy as np
-import matplotlib.pyplot as plt
 from app.core.config import settings
-import nest_asyncio
-from llama_index.embeddings.cohere import CohereEmbedding
 from app.core.logging_config import setup_logging
-from sklearn.decomposition import PCA
-from mpl_toolkits.mplot3d import Axes3D
-from scipy.spatial.distance import cosine
+from app.core.tracing import bind_context, span
+from app.services.embedding_cache import EmbeddingCache
+from app.services.embedding_providers import EmbeddingProviderRegistry
+from app.services.micro_batcher import MicroBatcher
+from app.services.scheduler import get_scheduler
+from app.helpers.vector_math import pairwise_scores, top_k as select_top_k, higher_is_better
 import io
 import base64
+import asyncio
+import httpx
+from concurrent.futures import ThreadPoolExecutor
 
 logger = setup_logging()
 
-nest_asyncio.apply()
-
 class TextEmbeddingHandler:
     def __init__(self):
         logger.info("Initializing TextEmbeddingHandler")
         print("Initializing TextEmbeddingHandler")
         self.CO_API_KEY = settings.COHERE_API_KEY
-        self.embed_v3 = CohereEmbedding(api_key=self.CO_API_KEY, model_name="embed-english-v3.0")
-        self.embed_v3_light = CohereEmbedding(api_key=self.CO_API_KEY, model_name="embed-english-light-v3.0")
-        self.embed_v2 = CohereEmbedding(api_key=self.CO_API_KEY, model_name="embed-english-v2.0")
+
+        # One pooled HTTP client per flavour, shared by every model so connections are reused
+        limits = httpx.Limits(
+            max_connections=settings.EMBEDDING_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.EMBEDDING_HTTP_MAX_CONNECTIONS,
+        )
+        self.http_client = httpx.Client(limits=limits, timeout=settings.EMBEDDING_HTTP_TIMEOUT)
+        self.async_http_client = httpx.AsyncClient(limits=limits, timeout=settings.EMBEDDING_HTTP_TIMEOUT)
+
+        # Models are declared in settings.EMBEDDING_MODELS and only created when first requested.
+        # Provider calls share the process-wide scheduler with the RAG indexer.
+        self.scheduler = get_scheduler()
+        self.models = EmbeddingProviderRegistry(
+            settings.EMBEDDING_MODELS,
+            http_client=self.http_client,
+            async_http_client=self.async_http_client,
+            scheduler=self.scheduler,
+        )
+        self.cache = EmbeddingCache(
+            max_bytes=settings.EMBEDDING_CACHE_MAX_BYTES,
+            disk_path=settings.EMBEDDING_CACHE_DISK_PATH,
+            disk_max_bytes=settings.EMBEDDING_CACHE_DISK_MAX_BYTES,
+        )
+        self.batch_size = settings.EMBEDDING_BATCH_SIZE
+        self._batch_executor = ThreadPoolExecutor(
+            max_workers=settings.EMBEDDING_BATCH_CONCURRENCY,
+            thread_name_prefix="embedding-batch",
+        )
+        # Bounds the provider calls in flight per model on the async path
+        self._model_semaphores = {
+            name: asyncio.Semaphore(settings.EMBEDDING_MODEL_CONCURRENCY) for name in self.models.names()
+        }
+        # Concurrent single-text requests are sent to the provider together, one batcher per model
+        self._batchers = {}
+
+    async def aclose(self):
+        """
+        Release the pooled HTTP connections.
+        """
+        self._batch_executor.shutdown(wait=False)
+        self.http_client.close()
+        await self.async_http_client.aclose()
+
+    def _get_model(self, model: str):
+        return self.models.get(model)
+
+    def _get_batcher(self, model: str) -> MicroBatcher:
+        if model not in self._batchers:
+            embed_model = self._get_model(model)
+            semaphore = self._model_semaphores[model]
+
+            async def embed_batch(texts):
+                async with semaphore:
+                    with span("embeddings.provider_batch", model=model, texts=len(texts), micro_batch=True):
+                        embeddings = await embed_model.aget_text_embedding_batch(texts)
+                await self.cache.aput_many(embed_model.model_name, texts, embeddings)
+                return embeddings
+
+            self._batchers[model] = MicroBatcher(
+                model, embed_batch,
+                max_batch_size=min(settings.EMBEDDING_MICRO_BATCH_SIZE, self.batch_size),
+                max_delay=settings.EMBEDDING_MICRO_BATCH_MAX_DELAY_MS / 1000.0,
+            )
+        return self._batchers[model]
+
+    def batcher_stats(self) -> dict:
+        return {model: batcher.stats() for model, batcher in self._batchers.items()}
 
     def get_embedding(self, text: str, model: str = "light") -> list:
         logger.debug(f"Generating embedding for text: {text[:50]}... (model: {model})")
         print(f"Generating embedding for text: {text[:50]}... (model: {model})")
         try:
-            if model == "v3":
-                embedding = self.embed_v3.get_text_embedding(text)
-            elif model == "light":
-                embedding = self.embed_v3_light.get_text_embedding(text)
-            elif model == "v2":
-                embedding = self.embed_v2.get_text_embedding(text)
-            else:
-                raise ValueError("Invalid model specified. Choose from 'v3', 'light', or 'v2'.")
+            embed_model = self._get_model(model)
+            embedding = self.cache.get(embed_model.model_name, text)
+            if embedding is not None:
+                logger.debug("Embedding served from cache")
+                return embedding
+
+            embedding = embed_model.get_text_embedding(text)
+            self.cache.put(embed_model.model_name, text, embedding)
             logger.info("Embedding generated successfully")
             print("Embedding generated successfully")
             return embedding
@@ -43,11 +108,124 @@ class TextEmbeddingHandler:
             print(f"Error while generating embedding: {e}")
             raise
 
+    def _split_cached(self, model_name: str, texts: list):
+        """
+        Dedupe `texts` and look them up in the cache.
+        :return: A dict of cached embeddings by text, and the unique texts that still need embedding.
+        """
+        embeddings_by_text = {}
+        missing = []
+        for text in dict.fromkeys(texts):
+            embedding = self.cache.get(model_name, text)
+            if embedding is None:
+                missing.append(text)
+            else:
+                embeddings_by_text[text] = embedding
+        return embeddings_by_text, self._chunk(missing)
+
+    def _chunk(self, texts: list) -> list:
+        return [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+
+    def _store_chunk(self, model_name: str, embeddings_by_text: dict, chunk: list, chunk_embeddings: list):
+        for text, embedding in zip(chunk, chunk_embeddings):
+            self.cache.put(model_name, text, embedding)
+            embeddings_by_text[text] = embedding
+
+    @staticmethod
+    def _traced_chunk(embed_model, model: str):
+        def embed_chunk(chunk):
+            with span("embeddings.provider_batch", model=model, texts=len(chunk)):
+                return embed_model.get_text_embedding_batch(chunk)
+
+        return embed_chunk
+
+    def get_embeddings_batch(self, texts: list, model: str = "light") -> list:
+        """
+        Generate embeddings for many texts with as few provider calls as possible.
+        Identical texts are embedded once, cached texts are not sent at all, and the
+        remaining texts are split into provider-sized chunks that run concurrently.
+        :param texts: The texts to embed.
+        :param model: The model alias to use ('v3', 'light' or 'v2').
+        :return: A list of embeddings in the same order as `texts`.
+        """
+        logger.debug(f"Generating embeddings for {len(texts)} texts (model: {model})")
+        try:
+            embed_model = self._get_model(model)
+            embeddings_by_text, chunks = self._split_cached(embed_model.model_name, texts)
+
+            # Executor threads do not inherit the context, so the chunk spans are bound to this request
+            embed_chunk = bind_context(self._traced_chunk(embed_model, model))
+            results = self._batch_executor.map(embed_chunk, chunks)
+            for chunk, chunk_embeddings in zip(chunks, results):
+                self._store_chunk(embed_model.model_name, embeddings_by_text, chunk, chunk_embeddings)
+
+            logger.info(f"Batch embeddings generated: {len(texts)} texts in {len(chunks)} provider calls")
+            return [embeddings_by_text[text] for text in texts]
+        except Exception as e:
+            logger.error(f"Error while generating batch embeddings: {e}")
+            raise
+
+    async def aget_embedding(self, text: str, model: str = "light") -> list:
+        """
+        Async counterpart of `get_embedding`, awaiting the provider without blocking a worker thread.
+        Cache misses wait a few milliseconds in the model's micro-batcher, so concurrent requests
+        share one provider call.
+        """
+        logger.debug(f"Generating embedding for text: {text[:50]}... (model: {model})")
+        try:
+            embed_model = self._get_model(model)
+            embedding = await self.cache.aget(embed_model.model_name, text)
+            if embedding is not None:
+                logger.debug("Embedding served from cache")
+                return embedding
+
+            if settings.EMBEDDING_MICRO_BATCH_MAX_DELAY_MS > 0:
+                embedding = await self._get_batcher(model).submit(text)
+            else:
+                async with self._model_semaphores[model]:
+                    embedding = await embed_model.aget_text_embedding(text)
+                await self.cache.aput(embed_model.model_name, text, embedding)
+            logger.info("Embedding generated successfully")
+            return embedding
+        except Exception as e:
+            logger.error(f"Error while generating embedding: {e}")
+            raise
+
+    async def aget_embeddings_batch(self, texts: list, model: str = "light") -> list:
+        """
+        Async counterpart of `get_embeddings_batch`. Chunks are awaited concurrently,
+        bounded by the per-model concurrency limit.
+        """
+        logger.debug(f"Generating embeddings for {len(texts)} texts (model: {model})")
+        try:
+            embed_model = self._get_model(model)
+            unique = list(dict.fromkeys(texts))
+            cached = await self.cache.aget_many(embed_model.model_name, unique)
+            embeddings_by_text = {text: embedding for text, embedding in zip(unique, cached) if embedding is not None}
+            chunks = self._chunk([text for text, embedding in zip(unique, cached) if embedding is None])
+            semaphore = self._model_semaphores[model]
+
+            async def embed_chunk(chunk):
+                async with semaphore:
+                    with span("embeddings.provider_batch", model=model, texts=len(chunk)):
+                        return await embed_model.aget_text_embedding_batch(chunk)
+
+            results = await asyncio.gather(*(embed_chunk(chunk) for chunk in chunks))
+            for chunk, chunk_embeddings in zip(chunks, results):
+                await self.cache.aput_many(embed_model.model_name, chunk, chunk_embeddings)
+                embeddings_by_text.update(zip(chunk, chunk_embeddings))
+
+            logger.info(f"Batch embeddings generated: {len(texts)} texts in {len(chunks)} provider calls")
+            return [embeddings_by_text[text] for text in texts]
+        except Exception as e:
+            logger.error(f"Error while generating batch embeddings: {e}")
+            raise
+
     def calculate_cosine_similarity(self, embedding1: list, embedding2: list) -> float:
         logger.debug("Calculating cosine similarity")
         print("Calculating cosine similarity")
         try:
-            similarity = self.embed_v3.similarity(embedding1, embedding2, mode="cosine")
+            similarity = float(pairwise_scores(embedding1, embedding2, metric="cosine")[0, 0])
             logger.info(f"Cosine similarity calculated: {similarity}")
             print(f"Cosine similarity calculated: {similarity}")
             return similarity
@@ -75,6 +253,26 @@ class TextEmbeddingHandler:
             print(f"Error while calculating Euclidean distance: {e}")
             raise
 
+    def similarity_matrix(self, queries: list, candidates: list = None, metric: str = "cosine", top_k: int = None) -> dict:
+        """
+        Score N query embeddings against M candidate embeddings in one matrix multiply.
+        :param queries: The query embeddings.
+        :param candidates: The candidate embeddings. Defaults to the queries (all-pairs).
+        :param metric: "cosine", "dot" or "l2".
+        :param top_k: If set, return only the k best candidates per query instead of the full matrix.
+        :return: {"scores": [[...]]} or {"indices": [[...]], "scores": [[...]]} when top_k is set.
+        """
+        logger.debug(f"Calculating {metric} similarity matrix")
+        try:
+            scores = pairwise_scores(queries, queries if candidates is None else candidates, metric=metric)
+            if top_k is None:
+                return {"scores": scores.tolist()}
+            indices, values = select_top_k(scores, top_k, largest=higher_is_better(metric))
+            return {"indices": indices.tolist(), "scores": values.tolist()}
+        except Exception as e:
+            logger.error(f"Error while calculating similarity matrix: {e}")
+            raise
+
     def plot_embedding_comparison(self, embedding1: list, embedding2: list, type: str = "display"):
         """
         Plot a visual comparison of two embeddings as 2D vectors.
@@ -83,60 +281,15 @@ class TextEmbeddingHandler:
         :param type: The type of output. "display" to show the plot, "base64" to return base64 string.
         :return: Base64 string of the plot if type is "base64". None otherwise.
         """
-        try:
-            vector_a = np.array(embedding1[:2])  # Use first two dimensions for plotting
-            vector_b = np.array(embedding2[:2])
-
-            distance = np.linalg.norm(vector_a - vector_b)
-
-            plt.figure(figsize=(8, 8))
-            origin = np.array([0, 0])  # Origin point
-
-            # Plot vector A
-            plt.quiver(*origin, *vector_a, angles='xy', scale_units='xy', scale=1, color='blue', label='Vector A')
-            # Plot vector B
-            plt.quiver(*origin, *vector_b, angles='xy', scale_units='xy', scale=1, color='red', label='Vector B')
-
-            # Draw a line connecting the tips of the vectors
-            plt.plot([vector_a[0], vector_b[0]], [vector_a[1], vector_b[1]], linestyle='--', color='gray', label='Distance')
-
-            # Annotate the plot with the distance
-            midpoint = (vector_a + vector_b) / 2
-            plt.text(midpoint[0], midpoint[1], f'Distance: {distance:.2f}', fontsize=12, color='green')
-
-            # Dynamically set plot limits to zoom in when vectors are smaller
-            max_x = max(abs(vector_a[0]), abs(vector_b[0]))
-            max_y = max(abs(vector_a[1]), abs(vector_b[1]))
-
-            # Add some padding, but keep it proportional to the vector magnitude
-            padding = max(max_x, max_y) * 0.1  # 10% padding
-
-            # Set dynamic limits
-            plt.xlim(-max_x - padding, max_x + padding)
-            plt.ylim(-max_y - padding, max_y + padding)
-
-            # Add grid, legend, and labels
-            plt.grid()
-            plt.legend()
-            plt.axhline(0, color='black', linewidth=0.5)
-            plt.axvline(0, color='black', linewidth=0.5)
-            plt.xlabel('X-axis')
-            plt.ylabel('Y-axis')
-            plt.title('Embedding Comparison')
+        from app.helpers.plotting_helpers import render_comparison
 
+        try:
+            image = render_comparison(embedding1, embedding2, fmt="png")
             if type == "base64":
-                # Save the plot to a BytesIO buffer
-                buffer = io.BytesIO()
-                plt.savefig(buffer, format='png', bbox_inches='tight')
-                buffer.seek(0)
-                # Encode the image in base64
-                img_base64 = base64.b64encode(buffer.read()).decode('utf-8')
-                buffer.close()
-                plt.close()
-                return img_base64
-            else:
-                plt.show()
-                return None
+                return base64.b64encode(image).decode('utf-8')
+            from PIL import Image
+            Image.open(io.BytesIO(image)).show()
+            return None
         except Exception as e:
             logger.error(f"Error while plotting embeddings: {e}")
             print(f"Error while plotting embeddings: {e}")
@@ -151,58 +304,17 @@ class TextEmbeddingHandler:
         :param response_type: "coordinates" to return coordinates, "base64" to return the plot as a base64 string.
         :return: Either the 2D coordinates of the embeddings or a base64 string of the plot.
         """
-        try:
-            # Ensure embeddings are a numpy array
-            embeddings = np.array(embeddings)
-
-            # Apply PCA to reduce dimensions to 2 if necessary
-            if embeddings.shape[1] > 2:
-                pca = PCA(n_components=2)
-                reduced_embeddings = pca.fit_transform(embeddings)
-            else:
-                reduced_embeddings = embeddings  # Already 2D
+        from app.helpers.plotting_helpers import reduce_to_2d, render_scatter
 
+        try:
             if response_type == "coordinates":
                 # Return coordinates as a list of dictionaries
+                reduced_embeddings = reduce_to_2d(embeddings)
                 return [{"x": coord[0], "y": coord[1]} for coord in reduced_embeddings]
 
             elif response_type == "base64":
-                # Plot the embeddings
-                plt.figure(figsize=(8, 8))
-                if labels is not None:
-                    labels = np.array(labels)
-                    unique_labels = np.unique(labels)
-                    for label in unique_labels:
-                        indices = np.where(labels == label)
-                        plt.scatter(
-                            reduced_embeddings[indices, 0],
-                            reduced_embeddings[indices, 1],
-                            label=f"Label {label}",
-                            s=100
-                        )
-                else:
-                    plt.scatter(
-                        reduced_embeddings[:, 0],
-                        reduced_embeddings[:, 1],
-                        s=100,
-                        color='blue'
-                    )
-
-                plt.title('2D Visualization of Embeddings')
-                plt.xlabel('Dimension 1')
-                plt.ylabel('Dimension 2')
-                if labels is not None:
-                    plt.legend()
-                plt.grid(True)
-
-                # Convert the plot to a base64 string
-                buffer = io.BytesIO()
-                plt.savefig(buffer, format="png", bbox_inches="tight")
-                buffer.seek(0)
-                base64_image = base64.b64encode(buffer.read()).decode("utf-8")
-                buffer.close()
-                plt.close()
-                return base64_image
+                image = render_scatter(embeddings, labels=labels, fmt="png")
+                return base64.b64encode(image).decode("utf-8")
 
             else:
                 raise ValueError("Invalid response_type. Use 'coordinates' or 'base64'.")
@@ -217,6 +329,8 @@ class TextEmbeddingHandler:
         :param embeddings: A list of embedding vectors.
         :param labels: Optional list of labels for the embeddings.
         """
+        import matplotlib.pyplot as plt
+
         try:
             plt.figure(figsize=(12, 6))
 
@@ -242,6 +356,9 @@ class TextEmbeddingHandler:
         :param embedding1: The first embedding vector.
         :param embedding2: The second embedding vector.
         """
+        import matplotlib.pyplot as plt
+        from sklearn.decomposition import PCA
+
         try:
             # Combine embeddings into a matrix
             embeddings = np.vstack([embedding1, embedding2])
@@ -0,0 +1,264 @@
+# app/services/evaluation.py
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from app.core.logging_config import setup_logging
+from app.services.scheduler import BULK, RequestScheduler, estimate_tokens, request_priority
+
+logger = setup_logging()
+
+STAGES = ("retrieve", "synthesize")
+PERCENTILES = (50, 95, 99)
+
+
+def latency_percentiles(values) -> dict:
+    """
+    p50/p95/p99 of a list of seconds, or None for each when the list is empty.
+    """
+    values = [value for value in values if value is not None]
+    if not values:
+        return {f"p{q}": None for q in PERCENTILES}
+    return {f"p{q}": float(v) for q, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+
+
+def count_tokens(question: str, contexts: List[str], answer: str) -> dict:
+    """
+    Estimated prompt and completion tokens of one RAG answer: the prompt holds the question and
+    the retrieved contexts. Provider tokenizers differ, so these are estimates for cost tracking.
+    """
+    return {
+        "prompt_tokens": estimate_tokens([question, *contexts]),
+        "completion_tokens": estimate_tokens(answer),
+    }
+
+
+def pipeline_answer_fn(query_pipeline) -> Callable[[str], dict]:
+    """
+    Adapts a query pipeline (or anything with `.run(question)` returning a llama_index Response)
+    to the runner. The pipeline runs retrieval and synthesis as one step, so only the total
+    latency is recorded.
+    """
+    def answer(question: str) -> dict:
+        response = query_pipeline.run(question)
+        contexts = [node.node.get_content() for node in getattr(response, "source_nodes", None) or []]
+        return {"answer": str(response.response), **count_tokens(question, contexts, str(response.response))}
+
+    return answer
+
+
+class EvaluationCheckpoint:
+    """
+    Append-only JSON Lines file with one record per finished question.
+
+    Every record is flushed as soon as it is written, so a crashed or interrupted run loses at
+    most the questions that were in flight. A torn last line is ignored when loading.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def load(self) -> dict:
+        records = {}
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                records[record["index"]] = record
+        return records
+
+    def append(self, record: dict):
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(json.dumps(record) + "\n")
+                file.flush()
+                os.fsync(file.fileno())
+
+
+class EvaluationReport:
+    """
+    Records of an evaluation run, in dataset order, with their latency, token and cost summary.
+    """
+
+    def __init__(self, records: List[Optional[dict]], wall_seconds: float, completed_this_run: int,
+                 resumed: int, stopped_on_budget: bool):
+        self.records = records
+        self.wall_seconds = wall_seconds
+        self.completed_this_run = completed_this_run
+        self.resumed = resumed
+        self.stopped_on_budget = stopped_on_budget
+
+    def column(self, name: str) -> list:
+        """
+        One field of every record, None for questions that were not answered.
+        """
+        return [record.get(name) if record is not None else None for record in self.records]
+
+    def summary(self) -> dict:
+        finished = [record for record in self.records if record is not None]
+        answered = [record for record in finished if record["error"] is None]
+        return {
+            "questions": len(self.records),
+            "answered": len(answered),
+            "errors": len(finished) - len(answered),
+            "resumed": self.resumed,
+            "stopped_on_budget": self.stopped_on_budget,
+            "wall_seconds": self.wall_seconds,
+            # Only questions answered by this run count towards its throughput
+            "throughput_qps": self.completed_this_run / self.wall_seconds if self.wall_seconds > 0 else None,
+            "latency": latency_percentiles([record["latency_seconds"] for record in answered]),
+            **{
+                f"{stage}_latency": latency_percentiles([record[f"{stage}_seconds"] for record in answered])
+                for stage in STAGES
+            },
+            "prompt_tokens": sum(record["prompt_tokens"] or 0 for record in answered),
+            "completion_tokens": sum(record["completion_tokens"] or 0 for record in answered),
+            "cost": sum(record["cost"] or 0.0 for record in finished),
+        }
+
+
+class EvaluationRunner:
+    """
+    Answers a list of questions concurrently and measures every answer.
+
+    `answer_fn(question)` returns a dict with the "answer" and, when it can tell them apart,
+    "retrieve_seconds" and "synthesize_seconds" (see `NaiveIndexer.evaluate_query`), plus
+    "prompt_tokens" and "completion_tokens". The runner adds the end-to-end latency and the
+    cost, and writes each record to the checkpoint as soon as it is done, so a rerun with the
+    same checkpoint only answers the missing (and, by default, failed) questions.
+
+    A RequestScheduler holds the run under `requests_per_minute` when given. It does not retry
+    questions: throttled and failed provider calls are already retried one by one by the
+    provider scheduler, and retrying the whole question on top would multiply them. Questions
+    run at `BULK` priority by default, so an evaluation does not take provider quota from
+    interactive requests.
+    """
+
+    def __init__(self, answer_fn: Callable[[str], dict], concurrency: int = 4, checkpoint_path: str = None,
+                 requests_per_minute: float = None, prompt_cost_per_1k: float = 0.0,
+                 completion_cost_per_1k: float = 0.0, max_cost: float = None, priority: int = BULK,
+                 retry_failed: bool = True, progress: bool = True):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1.")
+        self.answer_fn = answer_fn
+        self.concurrency = concurrency
+        self.checkpoint = EvaluationCheckpoint(checkpoint_path) if checkpoint_path else None
+        limits = {"evaluation": {"rpm": requests_per_minute, "burst_seconds": 1}} if requests_per_minute else {}
+        self.scheduler = RequestScheduler(limits=limits, max_retries=0)
+        self.prompt_cost_per_1k = prompt_cost_per_1k
+        self.completion_cost_per_1k = completion_cost_per_1k
+        self.max_cost = max_cost
+        self.priority = priority
+        self.retry_failed = retry_failed
+        self.progress = progress
+
+    def _cost(self, prompt_tokens, completion_tokens) -> float:
+        return ((prompt_tokens or 0) * self.prompt_cost_per_1k + (completion_tokens or 0) * self.completion_cost_per_1k) / 1000.0
+
+    def _answer(self, index: int, question: str) -> dict:
+        record = {"index": index, "question": question, "answer": None, "error": None, "latency_seconds": None,
+                  **{f"{stage}_seconds": None for stage in STAGES},
+                  "prompt_tokens": None, "completion_tokens": None, "cost": 0.0}
+
+        def attempt():
+            # Latency of the attempt that succeeded, without the time spent waiting for quota
+            start = time.perf_counter()
+            result = self.answer_fn(question)
+            return result, time.perf_counter() - start
+
+        try:
+            with request_priority(self.priority):
+                result, latency = self.scheduler.call("evaluation", attempt)
+        except Exception as e:
+            logger.error(f"Evaluation of question {index} failed: {e}")
+            record["error"] = f"{type(e).__name__}: {e}"
+            return record
+
+        record["answer"] = result["answer"]
+        record["latency_seconds"] = latency
+        for key in ("retrieve_seconds", "synthesize_seconds", "prompt_tokens", "completion_tokens"):
+            record[key] = result.get(key)
+        record["cost"] = self._cost(record["prompt_tokens"], record["completion_tokens"])
+        return record
+
+    def _load_checkpoint(self, questions: List[str]) -> dict:
+        if self.checkpoint is None:
+            return {}
+        records = self.checkpoint.load()
+        for index, record in records.items():
+            if index >= len(questions) or record["question"] != questions[index]:
+                raise ValueError(f"Checkpoint {self.checkpoint.path} was written for a different set of questions.")
+        if self.retry_failed:
+            records = {index: record for index, record in records.items() if record["error"] is None}
+        return records
+
+    def run(self, questions: List[str]) -> EvaluationReport:
+        """
+        Answers every question that the checkpoint does not already hold.
+
+        Parameters:
+        - questions (list): The questions, in dataset order.
+
+        Returns:
+        - EvaluationReport: One record per question (None where the cost budget stopped the run).
+        """
+        from tqdm import tqdm
+
+        questions = list(questions)
+        records = self._load_checkpoint(questions)
+        resumed = len(records)
+        todo = deque(index for index in range(len(questions)) if index not in records)
+        if resumed:
+            logger.info(f"Resuming evaluation: {resumed} of {len(questions)} questions already answered")
+
+        spent = sum(record["cost"] for record in records.values())
+        completed = 0
+        stopped_on_budget = False
+        start = time.perf_counter()
+        with ThreadPoolExecutor(self.concurrency) as executor, \
+                tqdm(total=len(questions), initial=resumed, desc="Evaluating", disable=not self.progress) as bar:
+            futures = {}
+            while todo or futures:
+                while todo and len(futures) < self.concurrency:
+                    if self.max_cost is not None and spent >= self.max_cost:
+                        stopped_on_budget = True
+                        todo.clear()
+                        break
+                    index = todo.popleft()
+                    futures[executor.submit(self._answer, index, questions[index])] = index
+                if not futures:
+                    break
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    del futures[future]
+                    record = future.result()
+                    records[record["index"]] = record
+                    spent += record["cost"]
+                    completed += 1
+                    if self.checkpoint is not None:
+                        self.checkpoint.append(record)
+                    bar.update(1)
+        wall_seconds = time.perf_counter() - start
+
+        if stopped_on_budget:
+            logger.warning(f"Evaluation stopped after spending {spent:.4f} of the {self.max_cost} budget")
+        report = EvaluationReport(
+            [records.get(index) for index in range(len(questions))], wall_seconds, completed, resumed, stopped_on_budget
+        )
+        logger.info(f"Evaluation summary: {report.summary()}")
+        return report
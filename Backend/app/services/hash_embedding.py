@@ -0,0 +1,75 @@
+# app/services/hash_embedding.py
+
+import hashlib
+import re
+from typing import List
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import Field
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def _bucket(feature: str, dim: int):
+    """
+    Maps a feature to a (bucket, sign) pair with a stable hash, so vectors match across processes.
+    """
+    digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+    return digest % dim, 1.0 if (digest >> 63) & 1 else -1.0
+
+
+def hash_embed(text: str, dim: int = 384) -> List[float]:
+    """
+    Embeds text by feature hashing of its lowercased words and character trigrams.
+
+    The result is deterministic and L2-normalized. Texts that share words or spellings get
+    similar vectors, which is enough to exercise retrieval and similarity code paths offline.
+
+    Parameters:
+    - text (str): The text to embed.
+    - dim (int): The number of dimensions.
+
+    Returns:
+    - list: The embedding.
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    for word in TOKEN_RE.findall(text.lower()):
+        bucket, sign = _bucket(word, dim)
+        vector[bucket] += sign
+        padded = f"#{word}#"
+        for i in range(len(padded) - 2):
+            bucket, sign = _bucket(padded[i:i + 3], dim)
+            vector[bucket] += 0.5 * sign
+
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector.tolist()
+
+
+class HashEmbedding(BaseEmbedding):
+    """
+    Local, deterministic embedding model that needs no network access or API key.
+    """
+
+    dim: int = Field(default=384, description="Number of dimensions of the embeddings.")
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "HashEmbedding"
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return hash_embed(query, self.dim)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return hash_embed(text, self.dim)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return [hash_embed(text, self.dim) for text in texts]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embedding(text)
@@ -0,0 +1,75 @@
+# app/services/hybrid_retrieval.py
+
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle
+
+from app.core.logging_config import setup_logging
+from app.services.bm25 import BM25Index
+
+logger = setup_logging()
+
+RETRIEVAL_MODES = ("dense", "sparse", "hybrid")
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """
+    Fuses ranked id lists with reciprocal rank fusion: each id scores sum(1 / (k + rank)).
+
+    Parameters:
+    - rankings (list): Ranked lists of ids, best first.
+    - k (int): Damping constant; larger values flatten the contribution of top ranks.
+
+    Returns:
+    - list: (id, fused score) tuples, best first. Ties keep the order of first appearance.
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Retrieves with BM25 alone ("sparse") or fuses BM25 with a dense retriever ("hybrid").
+
+    Both retrievers return `candidates` results which are fused by reciprocal rank, and only
+    the fused `top_k` reach the prompt. Nodes found by BM25 alone are loaded through
+    `fetch_nodes`, since the BM25 index stores ids rather than text. `bm25` returns the
+    current BM25 index, so a reloaded index is picked up without rebuilding the retriever.
+    """
+
+    def __init__(self, dense_retriever: BaseRetriever, bm25: Callable[[], BM25Index],
+                 fetch_nodes: Callable[[List[str]], list], mode: str = "hybrid",
+                 top_k: int = 2, candidates: int = 10, rrf_k: int = 60):
+        if mode not in ("sparse", "hybrid"):
+            raise ValueError(f"Invalid retrieval mode: {mode}. Pick one of 'sparse' or 'hybrid'.")
+        super().__init__()
+        self.dense_retriever = dense_retriever
+        self.bm25 = bm25
+        self.fetch_nodes = fetch_nodes
+        self.mode = mode
+        self.top_k = top_k
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        sparse = self.bm25().search(query_bundle.query_str, k=self.candidates)
+        if self.mode == "sparse":
+            ranked, dense_nodes = sparse[:self.top_k], {}
+        else:
+            dense = self.dense_retriever.retrieve(query_bundle)
+            dense_nodes = {result.node.node_id: result.node for result in dense}
+            ranked = reciprocal_rank_fusion(
+                [[result.node.node_id for result in dense], [node_id for node_id, _ in sparse]],
+                k=self.rrf_k,
+            )[:self.top_k]
+
+        missing = [node_id for node_id, _ in ranked if node_id not in dense_nodes]
+        nodes = dict(dense_nodes)
+        if missing:
+            nodes.update((node.node_id, node) for node in self.fetch_nodes(missing))
+        # A node deleted from the vector store since the BM25 index was saved is skipped
+        return [NodeWithScore(node=nodes[node_id], score=score) for node_id, score in ranked if node_id in nodes]
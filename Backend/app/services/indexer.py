@@ -1,34 +1,39 @@
 import os
 import sys
+import threading
+import time
 from getpass import getpass
-import nest_asyncio
 from app.core.config import settings
 from dotenv import load_dotenv
 from app.core.logging_config import setup_logging
-nest_asyncio.apply()
-from app.helpers.utils import setup_llm, setup_embed_model, setup_vector_store, get_documents_from_docstore, ingest, create_index, create_query_engine, create_query_pipeline
-from app.helpers.text_cleaning_helpers import clean
-from llama_index.core.settings import Settings
-from llama_index.embeddings.openai import OpenAIEmbedding
-from llama_index.core import Document
-import fitz
-from llama_index.core.storage.docstore import SimpleDocumentStore
-from llama_index.core.storage import StorageContext
-from llama_index.core.constants import DEFAULT_CHUNK_SIZE
-from llama_index.core.node_parser.text import SentenceSplitter
-from llama_index.core import StorageContext
-
-from llama_index.core.query_pipeline import InputComponent
-
-Settings.embed_model = OpenAIEmbedding(
-    model="text-embedding-ada-002", embed_batch_size=100
-)
-
+from app.helpers.utils import setup_llm, setup_embed_model, setup_vector_store, get_documents_from_docstore, ingest, create_index, create_query_engine
+from app.services.pdf_ingestion import PDFIngestionStage, load_manifest, batched
+from app.services.jobs import file_lock
+from app.services.binary_store import BinaryStoreWriter, is_binary_store, remove_binary_store
+from app.services.semantic_cache import SemanticCache
+from app.services.bm25 import BM25Index
+from app.services.scheduler import BULK, disable_cohere_retries, get_scheduler, request_priority
+from app.core.metrics import collect_stages, observe_stage, stage_timer
+from app.core.tracing import span
+
+# llama_index is imported inside the methods that use it, so creating the indexer is cheap
+# and nothing heavy is loaded until the first ingestion or query.
 
 logger = setup_logging()
 
 #OPENAI_API_KEY = os.environ['OPENAI_API_KEY']
 
+def source_to_dict(node) -> dict:
+    """
+    Converts a retrieved NodeWithScore into the JSON-friendly source returned to clients.
+    """
+    return {
+        "node_id": node.node.node_id,
+        "score": node.score,
+        "text": node.node.get_content(),
+        "metadata": node.node.metadata,
+    }
+
 class NaiveIndexer:
     def __init__(self):
         logger.info("Initializing TextEmbeddingHandler")
@@ -36,195 +41,273 @@ class NaiveIndexer:
         self.CO_API_KEY = settings.COHERE_API_KEY
         self.QDRANT_API_KEY = settings.QDRANT_API_KEY
         self.QDRANT_URL = settings.QDRANT_URL
-
-        pass
-
-    def persist(self):
-
-        COLLECTION_NAME = "SAMPLE"
-
-        setup_llm(
-            provider="cohere", 
-            model="command-r-plus", 
-            api_key=self.CO_API_KEY
+        self.COLLECTION_NAME = settings.QDRANT_COLLECTION
+        self.persist_dir = settings.PERSIST_DIR
+        self.ingestion_dir = settings.INGESTION_PERSIST_DIR
+        self.pdf_source = settings.PDF_SOURCE
+        # Serializes persist/ingest runs across every process sharing the persist directory
+        self.lock_path = f"{os.path.normpath(self.persist_dir)}.lock"
+        # The BM25 index covers the ingested chunks, so it is persisted with the ingestion state
+        self.bm25_dir = os.path.join(self.ingestion_dir, "bm25")
+
+        # Models, vector store and query engines are created on first use and reused by every query
+        self._models_ready = False
+        self._vector_store = None
+        self._index = None
+        self._query_engines = {}
+        self._streaming_query_engines = {}
+        self._bm25 = None
+        self._bm25_version = None
+        self._lock = threading.Lock()
+        # Ingestion runs under its own lock, so queries keep being served while it lasts
+        self._ingest_lock = threading.Lock()
+        self._bm25_lock = threading.Lock()
+        # Model setup registers handlers on the global callback manager, so it must run only once
+        self._models_lock = threading.Lock()
+
+        # Answers to repeated or near-identical questions, dropped whenever the corpus changes
+        self.cache = SemanticCache(
+            threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+            ttl_seconds=settings.SEMANTIC_CACHE_TTL_SECONDS,
+            max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+        ) if settings.SEMANTIC_CACHE_ENABLED else None
+
+    def _setup_models(self):
+        if self._models_ready:
+            return
+        with self._models_lock:
+            if self._models_ready:
+                return
+            if settings.METRICS_ENABLED:
+                # Registered before the models are created, so they report to the shared callback manager
+                from llama_index.core.settings import Settings
+                from app.services.rag_metrics import StageTimingHandler
+
+                Settings.callback_manager.add_handler(StageTimingHandler())
+            if settings.TRACING_ENABLED:
+                from llama_index.core.settings import Settings
+                from app.services.rag_tracing import TracingCallbackHandler
+
+                Settings.callback_manager.add_handler(TracingCallbackHandler())
+            if settings.RAG_LLM_PROVIDER == "fake":
+                setup_llm(provider="fake", model=None, api_key=None, token_delay=settings.FAKE_LLM_TOKEN_DELAY)
+            else:
+                from llama_index.core.settings import Settings
+                from app.services.scheduled_llm import ScheduledLLM
+
+                # Retries are left to the request scheduler; a single attempt for the Cohere wrapper's own retry loop
+                setup_llm(
+                    provider=settings.RAG_LLM_PROVIDER, 
+                    model=settings.RAG_LLM_MODEL, 
+                    api_key=self.CO_API_KEY if settings.RAG_LLM_PROVIDER == "cohere" else self.OPENAI_API_KEY,
+                    max_retries=1 if settings.RAG_LLM_PROVIDER == "cohere" else 0,
+                    )
+                if settings.RAG_LLM_PROVIDER == "cohere":
+                    disable_cohere_retries(Settings.llm._client)
+                    disable_cohere_retries(Settings.llm._aclient)
+                # Answers share the provider quota and priorities with the embedding calls
+                Settings.llm = ScheduledLLM(
+                    Settings.llm, get_scheduler(), scheduler_key=f"{settings.RAG_LLM_PROVIDER}/{settings.RAG_LLM_MODEL}"
+                )
+
+            logger.info("Setting up Embed Model")
+            if settings.RAG_EMBED_PROVIDER == "hash":
+                setup_embed_model(provider="hash")
+            elif settings.RAG_EMBED_PROVIDER == "cohere":
+                setup_embed_model(provider="cohere", api_key=self.CO_API_KEY)
+            else:
+                setup_embed_model(
+                    provider="openai", 
+                    model="text-embedding-ada-002",
+                    api_key=self.OPENAI_API_KEY,
+                    max_retries=0
+                    )
+            if settings.RAG_EMBED_PROVIDER != "hash":
+                # Query and ingestion embeddings share the provider quota with the embedding endpoints
+                from llama_index.core.settings import Settings
+                from app.services.scheduled_embedding import ScheduledEmbedding
+
+                model = Settings.embed_model
+                if settings.RAG_EMBED_PROVIDER == "cohere":
+                    disable_cohere_retries(model._get_client())
+                    disable_cohere_retries(model._get_async_client())
+                Settings.embed_model = ScheduledEmbedding(
+                    model, get_scheduler(), scheduler_key=f"{settings.RAG_EMBED_PROVIDER}/{model.model_name}"
+                )
+            self._models_ready = True
+
+    def _get_vector_store(self):
+        if self._vector_store is None:
+            self._vector_store = setup_vector_store(
+                self.QDRANT_URL, self.QDRANT_API_KEY, self.COLLECTION_NAME, quantization=settings.QDRANT_QUANTIZATION
             )
-
-        logger.info("Setting up Embed Model")
-        logger.info(self.OPENAI_API_KEY)
-        setup_embed_model(
-            provider="openai", 
-            model="text-embedding-ada-002",
-            api_key=self.OPENAI_API_KEY
+        return self._vector_store
+
+    def has_persisted(self) -> bool:
+        """
+        Whether a source docstore has already been persisted, by this or another process.
+        """
+        return os.path.exists(os.path.join(self.persist_dir, "docstore.json")) or is_binary_store(self.persist_dir)
+
+    def corpus_version(self) -> tuple:
+        """
+        Identifies the current corpus by the modification times of the persisted docstore and
+        the ingestion state. Any persist or ingest run, in any process, changes it.
+        """
+        stamps = []
+        for directory in (self.persist_dir, self.ingestion_dir):
+            for name in ("docstore.json", "store.json"):
+                try:
+                    stamps.append(os.stat(os.path.join(directory, name)).st_mtime_ns)
+                except FileNotFoundError:
+                    stamps.append(None)
+        return tuple(stamps)
+
+    def _cache_lookup(self, question, retrieval_mode):
+        """
+        Looks `question` up in the semantic cache, among answers of the same retrieval mode.
+        :return: The cached entry or None, the question embedding if one was computed, and the
+                 cache generation to store a fresh answer under.
+        """
+        from llama_index.core.settings import Settings
+
+        with span("rag.cache_lookup") as current:
+            self.cache.ensure_version(self.corpus_version())
+            generation = self.cache.generation
+            entry, embedding = self.cache.lookup(question, Settings.embed_model.get_query_embedding, namespace=retrieval_mode)
+            current.set_attribute("hit", entry is not None)
+        return entry, embedding, generation
+
+    def _iter_vector_store_nodes(self, batch_size: int = 256):
+        """
+        Scrolls through every node stored in the Qdrant collection.
+        """
+        vector_store = self._get_vector_store()
+        if not vector_store.client.collection_exists(self.COLLECTION_NAME):
+            return
+        offset = None
+        while True:
+            points, offset = vector_store.client.scroll(
+                collection_name=self.COLLECTION_NAME, limit=batch_size, offset=offset,
+                with_payload=True, with_vectors=False,
             )
+            yield from vector_store.parse_to_query_result(points).nodes
+            if offset is None:
+                return
+
+    def _fetch_nodes(self, node_ids):
+        """
+        Loads nodes by id from the Qdrant collection, e.g. the ones only BM25 found.
+        """
+        vector_store = self._get_vector_store()
+        points = vector_store.client.retrieve(
+            collection_name=self.COLLECTION_NAME, ids=list(node_ids), with_payload=True, with_vectors=False,
+        )
+        return vector_store.parse_to_query_result(points).nodes
+
+    def _get_bm25(self) -> BM25Index:
+        """
+        Returns the BM25 index, reloading it when another process saved a newer one.
+
+        When none has been saved yet, e.g. for a collection ingested before hybrid retrieval
+        existed, it is built once from the nodes already in the vector store.
+        """
+        with self._bm25_lock:
+            version = BM25Index.current_version(self.bm25_dir)
+            if self._bm25 is None or version != self._bm25_version:
+                if version is not None:
+                    self._bm25 = BM25Index.load(self.bm25_dir, version)
+                else:
+                    self._bm25 = BM25Index()
+                    self._bm25.add_nodes(self._iter_vector_store_nodes())
+                    if len(self._bm25):
+                        logger.info(f"Built the BM25 index from {len(self._bm25)} nodes in the vector store")
+                        version = self._bm25.save(self.bm25_dir)
+                self._bm25_version = version
+            return self._bm25
+
+    def _update_bm25(self, nodes):
+        """
+        Adds freshly ingested nodes to the BM25 index and saves it.
+        """
+        bm25 = self._get_bm25()
+        with self._bm25_lock:
+            bm25.add_nodes(nodes)
+            self._bm25_version = bm25.save(self.bm25_dir)
+
+    def persist(self, progress_callback=None, ingest: bool = True):
+        """
+        Extracts the PDFs listed in `PDF_SOURCE` into the source docstore, then ingests them.
+
+        Pages are extracted and cleaned in a process pool and streamed into the docstore in
+        batches, so the full corpus is never held as one list of dictionaries.
+        :param progress_callback: Optional callable receiving (FileProgress, run metrics) updates.
+        :param ingest: Whether to run `ingest` once the docstore is persisted.
+        :return: The aggregate extraction metrics of the run.
+        """
+        from llama_index.core.storage import StorageContext
+        from llama_index.core.storage.docstore import SimpleDocumentStore
+
+        entries = load_manifest(self.pdf_source)
+        stage = PDFIngestionStage(
+            max_workers=settings.INGEST_WORKERS,
+            pages_per_task=settings.INGEST_PAGES_PER_TASK,
+            progress_callback=progress_callback,
+        )
 
-        #vector_store = setup_vector_store(self.QDRANT_URL, self.QDRANT_API_KEY, COLLECTION_NAME)
-
-        def get_document(file_path, pages):
-            """
-            Opens a PDF file and optionally selects specific pages to create a document object.
-
-            This function utilizes the `fitz` library to open a PDF file located at `file_path`. 
-            If a list of `pages` is provided, the function selects only these pages from the document.
-            This is useful for focusing on certain parts of a PDF without loading the entire document into memory.
-
-            Parameters:
-                file_path (str): The path to the PDF file to be opened.
-                pages (list of int, optional): A list of page numbers to select from the PDF. 
-                    If `None`, the entire document is loaded.
-
-            """
-            document = fitz.open(file_path)
-            if pages is not None:
-                document.select(pages)  # Select specific pages if pages are provided
-            return document
-
-
-        def handle_chapter_headers_footers(strings, flag):
-            """
-            Modify a list of strings based on a specified flag and join them into a single string.
-
-            This function first removes any empty strings from the input list. It then checks if the
-            remaining list has more than three elements. If so, it modifies the list by removing the
-            first element, last element, or both, based on the value of the flag. The final list is then
-            joined into a single string with spaces separating the elements.
-
-            Parameters:
-                strings (list of str): The list of strings to modify.
-                flag (str): A flag indicating the modification to perform on the list:
-                    - 'remove_first': Remove the first element of the list.
-                    - 'remove_last': Remove the last element of the list.
-                    - 'remove_first_last': Remove both the first and last elements of the list.
-                    - 'remove_first_two': Remove the first two elements of the list.
-                    - Any other value leaves the list unchanged.
-
-            Returns:
-                str: A single string composed of the modified list elements, separated by spaces.
-            """
-            # Filter out empty strings
-            filtered_strings = [s for s in strings if s]
-            
-            # Check if the filtered list has more than three elements
-            if len(filtered_strings) > 3:
-                if flag == 'remove_first':
-                    filtered_strings = filtered_strings[1:]  # Slice off the first element
-                elif flag == 'remove_last':
-                    filtered_strings = filtered_strings[:-1]  # Slice off the last element
-                elif flag == 'remove_first_last':
-                    filtered_strings = filtered_strings[1:-1]  # Slice off the first and last elements
-                elif flag == 'remove_first_two':
-                    filtered_strings = filtered_strings[2:]  # Slice off the first two elements
-            
-            # Join all strings with a space and return the result
-            return ' '.join(filtered_strings).strip()
-
-        def extract_text(page, file_name, title, author, flag, opt="text"):
-            """
-            Extracts text from a specified page of a document and returns a dictionary containing
-            the extracted text and associated metadata.
-
-            The function first retrieves text from the given `page` object using the specified `opt` method.
-            It then processes this text to remove chapter headers, footers, and applies various cleaning
-            procedures according to the `flag` and other parameters set in the `clean` function.
-
-            Parameters:
-                page (fitz.Page): The page object from which to extract text.
-                file_name (str): The name of the file from which the page is taken.
-                title (str): The title of the document.
-                author (str): The author of the document.
-                flag (str): A flag used to customize how chapter headers and footers are handled.
-                opt (str, optional): The method of text extraction to be used by `get_text`.
-                    Defaults to "text", but can be changed to other methods supported by the library.
-
-            Returns:
-                dict: A dictionary with two keys:
-                    - 'text': A string containing the cleaned and processed text from the page.
-                    - 'metadata': A dictionary containing metadata about the text, including the
-                                page number, file name, title, and author.
-            """
-            
-            text = page.get_text(opt, sort=True)
-
-            text = text.split("\n")
-
-            text = handle_chapter_headers_footers(text, flag)
-
-            text = clean(
-                text,
-                extra_whitespace=True,
-                broken_paragraphs=True,
-                bullets=True,
-                ascii=True,
-                lowercase=False,
-                citations=True,
-                merge_split_words=True,
-            )
-
-            return {
-                "text": text,
-                "metadata": {
-                    "page_number": page.number,
-                    "file_name": file_name,
-                    "title": title,
-                    "author": author
-                }
-            }
-
-        def extract_texts_from_pdf(file_path, title, author, pages, flag):
-            document = get_document(file_path, pages)
-            file_name = os.path.basename(file_path)
-            extracted_texts = [extract_text(page, file_path, title, author, flag) for page in document]
-            return extracted_texts
-        
-
-        pdf_files = [
-            {
-                "file_path": "app/database/sample/01-bert.pdf", 
-                "title": "BERT", 
-                "author": "Unknown",
-                "pages": list(range(0, 10)),
-                "flag": "remove_last"
-                },
-            {
-                "file_path": "app/database/sample/01-gpt-2.pdf", 
-                "title": "GPT 2", 
-                "author": "Balaji", 
-                "pages": list(range(0, 10)),
-                "flag": "remove_last"
-                },
-            {
-                "file_path": "app/database/sample/02-gpt-3.pdf", 
-                "title": "GPT 3", 
-                "author": "Paul Graham", 
-                "pages": list(range(0, 10)),
-                "flag": "remove_first_last"
-                },
-        ]
-
-        all_texts = []
-
-        for pdf in pdf_files:
-            print(f"Extracting texts from {pdf['title']} by {pdf['author']}...")
-            texts = extract_texts_from_pdf(pdf["file_path"], pdf["title"], pdf["author"], pdf["pages"], pdf["flag"])
-            print(f"Finished extracting texts from {pdf['title']}.")
-            all_texts.extend(texts)
-
-        llama_index_docs = [Document(text=doc["text"], metadata=doc["metadata"]) for doc in all_texts]
-
-        logger.info(f"Sample Document: {llama_index_docs[0].__dict__}")
-
-        # Create a SimpleDocumentStore and add the documents
-        docstore = SimpleDocumentStore()
-        docstore.add_documents(llama_index_docs)
-
-        # Create a storage context
-        storage_context = StorageContext.from_defaults(docstore=docstore)
-
-        # Persist the document store to disk
-        storage_context.persist("../database/persist/sample")
-
-    def query(self, question, index_store="../database/persist/sample"):
-        documents = get_documents_from_docstore(index_store)
-        logger.info(f"Retrived Sample Document: {documents[0].__dict__}")
+        documents = stage.iter_documents(entries)
+        if settings.PERSIST_FORMAT == "binary":
+            # Stream the pages straight to disk, nothing is kept in memory
+            with BinaryStoreWriter(self.persist_dir) as writer:
+                for batch in batched(documents, settings.INGEST_BATCH_SIZE):
+                    writer.add_documents(batch)
+                if not writer.count:
+                    raise ValueError(f"No pages could be extracted from {self.pdf_source}.")
+            metrics = stage.metrics()
+        else:
+            # Create a SimpleDocumentStore and add the documents batch by batch
+            docstore = SimpleDocumentStore()
+            for batch in batched(documents, settings.INGEST_BATCH_SIZE):
+                docstore.add_documents(batch)
+
+            metrics = stage.metrics()
+            if not docstore.docs:
+                raise ValueError(f"No pages could be extracted from {self.pdf_source}.")
+
+            # Create a storage context
+            storage_context = StorageContext.from_defaults(docstore=docstore)
+
+            # Persist the document store to disk, dropping a binary store that would shadow it
+            storage_context.persist(self.persist_dir)
+            remove_binary_store(self.persist_dir)
+        logger.info(f"Extracted {metrics['pages_done']} pages from {metrics['files']} files: {metrics}")
+
+        # Embed and upsert only the pages that are new or changed since the last run
+        if ingest:
+            self.ingest()
+        return metrics
+
+    def ingest(self):
+        """
+        Splits, embeds and upserts the persisted documents into the vector store.
+
+        The ingestion docstore records a content hash per document and the ingestion cache
+        records transformation outputs, both persisted under `ingestion_dir`, so unchanged
+        documents are skipped and only new or modified ones are embedded. The written nodes are
+        also added to the BM25 index used by sparse and hybrid retrieval.
+        :return: The number of nodes written to the vector store in this run.
+        """
+        from llama_index.core.constants import DEFAULT_CHUNK_SIZE
+        from llama_index.core.ingestion import IngestionCache
+        from llama_index.core.node_parser.text import SentenceSplitter
+        from llama_index.core.settings import Settings
+        from llama_index.core.storage.docstore import SimpleDocumentStore
+
+        self._setup_models()
+        with span("rag.docstore_load") as current, stage_timer("docstore_load"):
+            documents = get_documents_from_docstore(self.persist_dir)
+            current.set_attribute("documents", len(documents))
+        logger.info(f"Ingesting {len(documents)} documents from {self.persist_dir}")
 
         logger.info(f"This is the chunk size: {DEFAULT_CHUNK_SIZE}")
 
@@ -232,56 +315,268 @@ class NaiveIndexer:
             SentenceSplitter(chunk_size=DEFAULT_CHUNK_SIZE), 
             Settings.embed_model
             ]
-        COLLECTION_NAME = "SAMPLE"
 
-        setup_llm(
-            provider="cohere", 
-            model="command-r-plus", 
-            api_key=self.CO_API_KEY
+        with self._lock:
+            vector_store = self._get_vector_store()
+        # Ingestion embeds in bulk and yields the provider quota to interactive requests
+        with self._ingest_lock, request_priority(BULK), collect_stages() as stages, \
+                span("rag.ingestion_pipeline") as current:
+            start = time.perf_counter()
+            nodes = ingest(
+                documents=documents,
+                transformations=tranforms,
+                vector_store=vector_store,
+                docstore=SimpleDocumentStore(),
+                cache=IngestionCache(),
+                persist_dir=self.ingestion_dir,
             )
-
-        logger.info("Setting up Embed Model")
-        setup_embed_model(
-            provider="openai", 
-            model="text-embedding-ada-002",
-            api_key=self.OPENAI_API_KEY
-            )
-        vector_store = setup_vector_store(self.QDRANT_URL, self.QDRANT_API_KEY, COLLECTION_NAME)
-
-        nodes = ingest(
-            documents=documents,
-            transformations=tranforms,
-            vector_store=vector_store,
+            # The pipeline writes to the vector store itself, so the upsert stage is what is left
+            # of the run after splitting and embedding (deduplication and saving its state included)
+            pipeline_seconds = time.perf_counter() - start
+            current.set_attribute("nodes", len(nodes))
+        observe_stage("upsert", max(pipeline_seconds - stages.get("split", 0.0) - stages.get("embed", 0.0), 0.0))
+
+        if nodes:
+            with span("rag.bm25_update", nodes=len(nodes)):
+                self._update_bm25(nodes)
+
+        logger.info(f"Ingested {len(nodes)} new or changed nodes")
+        return len(nodes)
+
+    def run_persist_job(self, job, only_if_missing: bool = False) -> dict:
+        """
+        Background job: persists and ingests the PDFs while reporting progress on `job`.
+
+        Runs under the persist lock file, so concurrent workers never extract into the same
+        docstore at once. With `only_if_missing`, a docstore persisted by another worker in the
+        meantime is reused instead of extracted again.
+        :return: The extraction metrics and the number of ingested nodes.
+        """
+        with file_lock(self.lock_path, job):
+            if only_if_missing and self.has_persisted():
+                logger.info(f"Reusing the docstore persisted in {self.persist_dir}")
+                return {"skipped": True, "reason": f"Docstore already persisted in {self.persist_dir}"}
+
+            files = {}
+
+            def on_progress(file_progress, metrics):
+                files[file_progress.file_path] = file_progress.to_dict()
+                job.update_progress(stage="extracting", file_progress=dict(files), **metrics)
+
+            job.update_progress(stage="extracting")
+            metrics = self.persist(progress_callback=on_progress, ingest=False)
+            job.update_progress(stage="ingesting")
+            nodes = self.ingest()
+            job.update_progress(stage="done")
+        return {**metrics, "nodes": nodes}
+
+    def run_ingest_job(self, job) -> dict:
+        """
+        Background job: ingests the already persisted docstore.
+        :return: The number of ingested nodes.
+        """
+        with file_lock(self.lock_path, job):
+            job.update_progress(stage="ingesting")
+            nodes = self.ingest()
+            job.update_progress(stage="done")
+        return {"nodes": nodes}
+
+    def _get_index(self):
+        """
+        Builds the vector store index on first use. Callers must hold `self._lock`.
+        """
+        if self._index is None:
+            from llama_index.core.settings import Settings
+
+            with span("rag.create_index"):
+                self._index = create_index(
+                    from_where="vector_store",
+                    embed_model=Settings.embed_model, 
+                    vector_store=self._get_vector_store(), 
+                    )
+        return self._index
+
+    def _create_query_engine(self, retrieval_mode, streaming=False):
+        """
+        Builds a query engine for a retrieval mode. Callers must hold `self._lock`.
+
+        "dense" queries the Qdrant index alone; "sparse" and "hybrid" go through the BM25
+        index, hybrid fusing it with dense results. Every mode passes the same number of
+        nodes to the LLM.
+        """
+        if retrieval_mode == "dense":
+            return create_query_engine(
+                index=self._get_index(), 
+                mode="query",
+                streaming=streaming,
+                similarity_top_k=settings.RAG_SIMILARITY_TOP_K,
+                # llm=Settings.llm
+                )
+
+        from llama_index.core.query_engine import RetrieverQueryEngine
+        from app.services.hybrid_retrieval import HybridRetriever
+
+        retriever = HybridRetriever(
+            dense_retriever=create_query_engine(
+                index=self._get_index(), 
+                mode="retrieve", 
+                similarity_top_k=settings.RAG_HYBRID_CANDIDATES,
+                ),
+            bm25=self._get_bm25,
+            fetch_nodes=self._fetch_nodes,
+            mode=retrieval_mode,
+            top_k=settings.RAG_SIMILARITY_TOP_K,
+            candidates=settings.RAG_HYBRID_CANDIDATES,
+            rrf_k=settings.RAG_RRF_K,
         )
-
-        storage_context = StorageContext.from_defaults(
-        vector_store=vector_store
-        )
-
-        index = create_index(
-            from_where="vector_store",
-            embed_model=Settings.embed_model, 
-            vector_store=vector_store, 
-            # storage_context=storage_context
-            )
-
-        query_engine = create_query_engine(
-            index=index, 
-            mode="query",
-            # llm=Settings.llm
-            )
-        
-        input_component = InputComponent()
-
-        chain = [input_component, query_engine]
-
-        query_pipeline = create_query_pipeline(chain)
-
-        response_1 = query_pipeline.run(input=question)
+        return RetrieverQueryEngine.from_args(retriever=retriever, streaming=streaming)
+
+    def _get_query_engine(self, retrieval_mode="dense"):
+        """
+        Builds the index and query engine on first use and reuses them afterwards.
+        """
+        if retrieval_mode in self._query_engines:
+            return self._query_engines[retrieval_mode]
+
+        self._setup_models()
+        with self._lock:
+            if retrieval_mode not in self._query_engines:
+                self._query_engines[retrieval_mode] = self._create_query_engine(retrieval_mode)
+        return self._query_engines[retrieval_mode]
+
+    def _get_streaming_query_engine(self, retrieval_mode="dense"):
+        """
+        Builds a query engine over the same index whose synthesizer streams the LLM output.
+        """
+        if retrieval_mode in self._streaming_query_engines:
+            return self._streaming_query_engines[retrieval_mode]
+
+        self._setup_models()
+        with self._lock:
+            if retrieval_mode not in self._streaming_query_engines:
+                self._streaming_query_engines[retrieval_mode] = self._create_query_engine(retrieval_mode, streaming=True)
+        return self._streaming_query_engines[retrieval_mode]
+
+    def query(self, question, retrieval_mode=None):
+        """
+        Answers `question`, serving repeated or near-identical questions from the semantic cache.
+        :param retrieval_mode: "dense", "sparse" or "hybrid"; defaults to `RAG_RETRIEVAL_MODE`.
+        :return: A dict with the answer, its source nodes and whether it came from the cache.
+        """
+        from llama_index.core.schema import QueryBundle
+
+        retrieval_mode = retrieval_mode or settings.RAG_RETRIEVAL_MODE
+        start = time.perf_counter()
+        with span("rag.setup"):
+            query_engine = self._get_query_engine(retrieval_mode)
+
+        embedding = None
+        if self.cache is not None:
+            entry, embedding, generation = self._cache_lookup(question, retrieval_mode)
+            if entry is not None:
+                logger.info(f"Semantic cache hit for: {question}")
+                return {"answer": entry.answer, "sources": entry.sources, "cached": True}
+
+        # Reuse the embedding computed for the cache lookup instead of embedding the question again
+        query_bundle = QueryBundle(question, embedding=embedding.tolist() if embedding is not None else None)
+        with span("rag.query_engine", retrieval_mode=retrieval_mode):
+            response_1 = query_engine.query(query_bundle)
 
         logger.info(f"Response: {response_1}")
 
-        return response_1
+        answer = str(response_1)
+        sources = [source_to_dict(node) for node in response_1.source_nodes]
+        if self.cache is not None:
+            self.cache.store(question, embedding, answer, sources, time.perf_counter() - start, generation,
+                             namespace=retrieval_mode)
+        return {"answer": answer, "sources": sources, "cached": False}
+
+    def evaluate_query(self, question, retrieval_mode=None):
+        """
+        Answers `question` like `query`, timing retrieval and synthesis separately, for the
+        evaluation runner. The semantic cache is bypassed so every answer is generated.
+        :param retrieval_mode: "dense", "sparse" or "hybrid"; defaults to `RAG_RETRIEVAL_MODE`.
+        :return: A dict with the answer, its sources, the seconds of each stage and the
+                 estimated prompt and completion tokens.
+        """
+        from llama_index.core.schema import QueryBundle
+        from app.services.evaluation import count_tokens
+
+        query_engine = self._get_query_engine(retrieval_mode or settings.RAG_RETRIEVAL_MODE)
+        query_bundle = QueryBundle(question)
+
+        start = time.perf_counter()
+        nodes = query_engine.retrieve(query_bundle)
+        retrieved = time.perf_counter()
+        response = query_engine.synthesize(query_bundle, nodes)
+        synthesized = time.perf_counter()
+
+        answer = str(response)
+        return {
+            "answer": answer,
+            "sources": [source_to_dict(node) for node in nodes],
+            "retrieve_seconds": retrieved - start,
+            "synthesize_seconds": synthesized - retrieved,
+            **count_tokens(question, [node.node.get_content() for node in nodes], answer),
+        }
+
+    def stream_query(self, question, retrieval_mode=None):
+        """
+        Answers `question` as a stream of events instead of one string.
+
+        Retrieval runs first and its source nodes are yielded before the LLM is called, so the
+        first event arrives after retrieval time rather than after the whole generation. The
+        answer then follows token by token as the LLM streams it. A semantic cache hit yields
+        the cached sources and the whole answer as a single token.
+        :param question: The question to answer.
+        :param retrieval_mode: "dense", "sparse" or "hybrid"; defaults to `RAG_RETRIEVAL_MODE`.
+        :return: A generator of event dicts: one "sources" event, a "token" event per token and
+                 a final "done" event with the timings in seconds.
+        """
+        from llama_index.core.schema import QueryBundle
+
+        retrieval_mode = retrieval_mode or settings.RAG_RETRIEVAL_MODE
+        start = time.perf_counter()
+        query_engine = self._get_streaming_query_engine(retrieval_mode)
+
+        embedding = None
+        if self.cache is not None:
+            entry, embedding, generation = self._cache_lookup(question, retrieval_mode)
+            if entry is not None:
+                yield {"type": "sources", "sources": entry.sources}
+                yield {"type": "token", "text": entry.answer}
+                elapsed = time.perf_counter() - start
+                yield {"type": "done", "cached": True, "retrieval_seconds": elapsed,
+                       "first_token_seconds": elapsed, "total_seconds": elapsed}
+                return
+
+        # Reuse the embedding computed for the cache lookup instead of embedding the question again
+        query_bundle = QueryBundle(question, embedding=embedding.tolist() if embedding is not None else None)
+        nodes = query_engine.retrieve(query_bundle)
+        retrieval_seconds = time.perf_counter() - start
+        sources = [source_to_dict(node) for node in nodes]
+        yield {"type": "sources", "sources": sources}
+
+        response = query_engine.synthesize(query_bundle, nodes)
+        first_token_seconds = None
+        tokens = []
+        for token in response.response_gen:
+            if first_token_seconds is None:
+                first_token_seconds = time.perf_counter() - start
+            tokens.append(token)
+            yield {"type": "token", "text": token}
+
+        total_seconds = time.perf_counter() - start
+        if self.cache is not None:
+            self.cache.store(question, embedding, "".join(tokens), sources, total_seconds, generation,
+                             namespace=retrieval_mode)
+        yield {
+            "type": "done",
+            "cached": False,
+            "retrieval_seconds": retrieval_seconds,
+            "first_token_seconds": first_token_seconds,
+            "total_seconds": total_seconds,
+        }
   
         
 
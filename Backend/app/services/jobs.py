@@ -0,0 +1,210 @@
+# app/services/jobs.py
+
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+from app.core.logging_config import setup_logging
+
+logger = setup_logging()
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """
+    Raised inside a running job once cancellation has been requested.
+    """
+
+
+class Job:
+    """
+    A unit of background work with its status, progress and result.
+
+    The job function receives the job itself and reports through `update_progress`, which
+    also raises `JobCancelled` when the job should stop. Cancellation is cooperative: a running
+    job stops at its next progress report or `check_cancelled` call.
+    """
+
+    def __init__(self, kind: str, fn, params: dict = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.fn = fn
+        self.params = params or {}
+        self.status = QUEUED
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel_requested = threading.Event()
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel_requested.is_set()
+
+    def check_cancelled(self):
+        if self._cancel_requested.is_set():
+            raise JobCancelled(f"Job {self.id} was cancelled")
+
+    def update_progress(self, **progress):
+        self.progress.update(progress)
+        self.check_cancelled()
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "cancel_requested": self.cancel_requested,
+            "params": self.params,
+            "progress": dict(self.progress),
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """
+    Runs submitted jobs one at a time on a background worker thread.
+
+    Jobs are kept in memory, newest last, and the oldest finished jobs are dropped beyond
+    `max_history`. Submitting a kind that is already queued or running returns the active job
+    instead of queueing a duplicate, unless `dedupe=False`.
+    """
+
+    def __init__(self, max_history: int = 100):
+        self.max_history = max_history
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="job-worker", daemon=True)
+            self._worker.start()
+
+    def submit(self, kind: str, fn, params: dict = None, dedupe: bool = True) -> Job:
+        """
+        Queues `fn(job, **params)` and returns its job.
+        """
+        with self._lock:
+            if dedupe:
+                for job in self._jobs.values():
+                    if job.kind == kind and job.status in (QUEUED, RUNNING):
+                        return job
+
+            job = Job(kind, fn, params)
+            self._jobs[job.id] = job
+            self._trim()
+            self._queue.put(job)
+            self._ensure_worker()
+        logger.info(f"Queued {kind} job {job.id}")
+        return job
+
+    def get(self, job_id: str) -> Job:
+        if job_id not in self._jobs:
+            raise KeyError(f"Job '{job_id}' does not exist.")
+        return self._jobs[job_id]
+
+    def list(self) -> list:
+        return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> Job:
+        """
+        Cancels a queued job immediately, or asks a running job to stop.
+        """
+        job = self.get(job_id)
+        with self._lock:
+            if job.status == QUEUED:
+                job.status = CANCELLED
+                job.finished_at = time.time()
+            if job.status in (RUNNING, CANCELLED):
+                job._cancel_requested.set()
+        return job
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED]
+        for job_id in finished[:max(0, len(self._jobs) - self.max_history)]:
+            del self._jobs[job_id]
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            with self._lock:
+                if job.status == CANCELLED:
+                    continue
+                job.status = RUNNING
+                job.started_at = time.time()
+
+            logger.info(f"Running {job.kind} job {job.id}")
+            try:
+                job.result = job.fn(job, **job.params)
+                job.status = SUCCEEDED
+            except JobCancelled:
+                job.status = CANCELLED
+                logger.info(f"Cancelled {job.kind} job {job.id}")
+            except Exception as e:
+                job.status = FAILED
+                job.error = str(e)
+                logger.error(f"{job.kind} job {job.id} failed: {e}")
+            finally:
+                job.finished_at = time.time()
+
+    def shutdown(self, timeout: float = 5.0):
+        """
+        Cancels every unfinished job and stops the worker thread.
+        """
+        for job in self.list():
+            if job.status not in FINISHED:
+                self.cancel(job.id)
+        if self._worker is not None and self._worker.is_alive():
+            self._queue.put(None)
+            self._worker.join(timeout)
+
+
+@contextmanager
+def file_lock(path: str, job: Job = None, poll_interval: float = 0.5):
+    """
+    Holds an exclusive lock on `path` across processes, e.g. every uvicorn worker.
+
+    While waiting, the job (if given) reports that it is waiting and can still be cancelled.
+    Without `fcntl` (Windows) no lock is taken; jobs of one process still run one at a time.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "a") as handle:
+        if fcntl is not None:
+            while True:
+                try:
+                    fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if job is not None:
+                        job.update_progress(stage="waiting for lock")
+                    time.sleep(poll_interval)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_UN)
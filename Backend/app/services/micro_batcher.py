@@ -0,0 +1,121 @@
+# app/services/micro_batcher.py
+
+import asyncio
+import time
+from typing import Awaitable, Callable, List
+
+from app.core.logging_config import setup_logging
+
+logger = setup_logging()
+
+
+class MicroBatcher:
+    """
+    Collects single-text embedding requests for one model and sends them as one batch call.
+
+    The first text of a batch starts a `max_delay` timer; the batch is sent when the timer
+    fires or as soon as `max_batch_size` distinct texts are waiting, whichever comes first.
+    Identical texts waiting at the same time share one slot and one result. Every waiting
+    request gets its own embedding back, or the batch call's exception.
+
+    The batcher belongs to the event loop that first uses it; if the loop changes (e.g. a new
+    test client), batches of the old loop are dropped and a new state is started.
+    """
+
+    def __init__(self, name: str, embed_batch: Callable[[List[str]], Awaitable[list]],
+                 max_batch_size: int = 32, max_delay: float = 0.005):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1.")
+        self.name = name
+        self.embed_batch = embed_batch
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self._loop = None
+        self._pending = {}
+        self._opened_at = None
+        self._timer = None
+
+        self.requests = 0
+        self.texts = 0
+        self.batches = 0
+        self.full_batches = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _bind(self, loop: asyncio.AbstractEventLoop):
+        if self._loop is not loop:
+            self._loop = loop
+            self._pending = {}
+            self._timer = None
+
+    async def submit(self, text: str) -> list:
+        """
+        Waits for the embedding of `text` from the next batch call.
+        """
+        loop = asyncio.get_running_loop()
+        self._bind(loop)
+        self.requests += 1
+        future = self._pending.get(text)
+        if future is None:
+            future = loop.create_future()
+            if not self._pending:
+                self._opened_at = time.perf_counter()
+                self._timer = loop.call_later(self.max_delay, self._flush)
+            self._pending[text] = future
+            if len(self._pending) >= self.max_batch_size:
+                self.full_batches += 1
+                self._flush()
+        # A cancelled request must not cancel the result other requests are waiting for
+        return await asyncio.shield(future)
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        waited = time.perf_counter() - self._opened_at
+        self.wait_seconds += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        self.batches += 1
+        self.texts += len(batch)
+        self._loop.create_task(self._send(batch))
+
+    async def _send(self, batch: dict):
+        self.in_flight += 1
+        try:
+            embeddings = await self.embed_batch(list(batch))
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Micro-batch of {len(batch)} texts for {self.name} failed: {e}")
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self.in_flight -= 1
+        for future, embedding in zip(batch.values(), embeddings):
+            if not future.done():
+                future.set_result(embedding)
+
+    def stats(self) -> dict:
+        batches = self.batches or 1
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_delay_seconds": self.max_delay,
+            "requests": self.requests,
+            "batches": self.batches,
+            "full_batches": self.full_batches,
+            "errors": self.errors,
+            "pending": len(self._pending),
+            "in_flight": self.in_flight,
+            # Requests per provider call, including duplicates that shared a slot
+            "requests_per_batch": self.requests / batches if self.batches else 0.0,
+            "mean_fill": self.texts / (batches * self.max_batch_size),
+            # Wait of the first request of each batch, the longest any request of it was held
+            "mean_added_latency_seconds": self.wait_seconds / batches,
+            "max_added_latency_seconds": self.max_wait_seconds,
+        }
@@ -0,0 +1,217 @@
+# app/services/pdf_ingestion.py
+
+import glob
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from app.core.logging_config import setup_logging
+
+logger = setup_logging()
+
+DEFAULT_FLAG = "remove_last"
+
+
+def load_manifest(source: str) -> list:
+    """
+    Resolves the PDFs to ingest from either a directory or a JSON manifest.
+
+    A directory yields every `*.pdf` in it with default metadata (title from the file name,
+    author "Unknown", all pages). A manifest is a JSON list of objects with `file_path` and
+    optional `title`, `author`, `pages` and `flag`, exactly like the entries `persist` used to hard-code.
+
+    Parameters:
+    - source (str): A directory path or the path of a JSON manifest.
+
+    Returns:
+    - list: Manifest entries as dictionaries.
+    """
+    if os.path.isdir(source):
+        return [
+            {"file_path": path, "title": os.path.splitext(os.path.basename(path))[0]}
+            for path in sorted(glob.glob(os.path.join(source, "*.pdf")))
+        ]
+    with open(source) as f:
+        return json.load(f)
+
+
+class FileProgress:
+    """
+    Per-file progress and throughput of an ingestion run.
+    """
+
+    def __init__(self, file_path: str, total_pages: int):
+        self.file_path = file_path
+        self.total_pages = total_pages
+        self.done_pages = 0
+        self.status = "pending"
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def seconds(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    def to_dict(self) -> dict:
+        return {
+            "file_path": self.file_path,
+            "status": self.status,
+            "pages": self.total_pages,
+            "done_pages": self.done_pages,
+            "seconds": round(self.seconds, 3),
+            "pages_per_second": round(self.done_pages / self.seconds, 2) if self.seconds else 0.0,
+            "error": self.error,
+        }
+
+
+class PDFIngestionStage:
+    """
+    Streams `Document`s out of many PDFs, extracting and cleaning pages across a process pool.
+
+    Every file is split into tasks of `pages_per_task` pages. At most `max_pending` tasks are in
+    flight at once, so memory stays flat no matter how many files are in the manifest, and
+    documents are yielded as soon as their task completes.
+    """
+
+    def __init__(self, max_workers: int = None, pages_per_task: int = 8, max_pending: int = None,
+                 progress_callback=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.pages_per_task = pages_per_task
+        self.max_pending = max_pending or 2 * self.max_workers
+        self.progress_callback = progress_callback
+        self.files = {}
+        self.started_at = None
+        self.finished_at = None
+
+    def _tasks(self, entries: list):
+        """
+        Lazily yields (progress, task args) pairs; files are only opened to count pages when reached.
+        """
+        import fitz
+
+        for entry in entries:
+            file_path = entry["file_path"]
+            try:
+                with fitz.open(file_path) as document:
+                    page_count = document.page_count
+            except Exception as e:
+                logger.error(f"Skipping {file_path}: {e}")
+                progress = FileProgress(file_path, 0)
+                progress.status, progress.error = "failed", str(e)
+                self.files[file_path] = progress
+                self._report(progress)
+                continue
+
+            pages = entry.get("pages")
+            page_numbers = [p for p in pages if 0 <= p < page_count] if pages is not None else list(range(page_count))
+            progress = FileProgress(file_path, len(page_numbers))
+            self.files[file_path] = progress
+            title = entry.get("title", os.path.basename(file_path))
+            author = entry.get("author", "Unknown")
+            flag = entry.get("flag", DEFAULT_FLAG)
+            if not page_numbers:
+                progress.status = "done"
+                self._report(progress)
+                continue
+
+            for start in range(0, len(page_numbers), self.pages_per_task):
+                chunk = page_numbers[start:start + self.pages_per_task]
+                yield progress, (file_path, title, author, flag, chunk)
+
+    def _report(self, progress: FileProgress):
+        if self.progress_callback is not None:
+            self.progress_callback(progress, self.metrics())
+
+    def iter_documents(self, entries: list):
+        """
+        Yields one `Document` per extracted page, in completion order.
+
+        Parameters:
+        - entries (list): Manifest entries, see `load_manifest`.
+        """
+        from llama_index.core import Document
+
+        from app.helpers.pdf_helpers import extract_pages
+
+        self.started_at = time.perf_counter()
+        tasks = self._tasks(entries)
+        pending = {}
+        # Spawned workers only import the extraction helpers, and avoid forking a threaded server
+        with ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            def submit_next() -> bool:
+                for progress, args in tasks:
+                    if progress.started_at is None:
+                        progress.started_at = time.perf_counter()
+                        progress.status = "running"
+                    pending[executor.submit(extract_pages, *args)] = progress
+                    return True
+                return False
+
+            while len(pending) < self.max_pending and submit_next():
+                pass
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    progress = pending.pop(future)
+                    try:
+                        pages = future.result()
+                    except Exception as e:
+                        logger.error(f"Failed to extract pages from {progress.file_path}: {e}")
+                        progress.status, progress.error = "failed", str(e)
+                        progress.finished_at = time.perf_counter()
+                        self._report(progress)
+                        continue
+
+                    progress.done_pages += len(pages)
+                    if progress.done_pages >= progress.total_pages and progress.status != "failed":
+                        progress.status = "done"
+                        progress.finished_at = time.perf_counter()
+                        logger.info(f"Extracted {progress.file_path}: {progress.to_dict()}")
+                    self._report(progress)
+
+                    for page in pages:
+                        yield Document(
+                            # Stable ids (file + page) let ingestion recognise unchanged pages across runs
+                            id_=f"{page['metadata']['file_name']}:{page['metadata']['page_number']}",
+                            text=page["text"],
+                            metadata=page["metadata"],
+                        )
+
+                while len(pending) < self.max_pending and submit_next():
+                    pass
+        self.finished_at = time.perf_counter()
+
+    def metrics(self) -> dict:
+        """
+        Aggregate progress and throughput of the run so far.
+        """
+        elapsed = ((self.finished_at or time.perf_counter()) - self.started_at) if self.started_at else 0.0
+        done_pages = sum(f.done_pages for f in self.files.values())
+        return {
+            "files": len(self.files),
+            "files_done": sum(f.status == "done" for f in self.files.values()),
+            "files_failed": sum(f.status == "failed" for f in self.files.values()),
+            "pages_done": done_pages,
+            "seconds": round(elapsed, 3),
+            "pages_per_second": round(done_pages / elapsed, 2) if elapsed else 0.0,
+        }
+
+
+def batched(iterable, size: int):
+    """
+    Groups an iterable into lists of at most `size` items.
+    """
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
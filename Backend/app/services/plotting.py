@@ -0,0 +1,163 @@
+# app/services/plotting.py
+
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from app.core.logging_config import setup_logging
+from app.core.metrics import REGISTRY
+from app.helpers.plotting_helpers import IMAGE_FORMATS, RENDERERS
+
+logger = setup_logging()
+
+PLOT_RENDER_SECONDS = REGISTRY.histogram(
+    "plot_render_duration_seconds", "Time to render a plot that was not cached, queueing included", ("kind", "format")
+)
+
+
+def plot_cache_key(kind: str, fmt: str, **inputs) -> str:
+    """
+    Hashes everything that determines the rendered image, so identical requests share an entry.
+    """
+    payload = json.dumps([kind, fmt, inputs], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PlotRenderer:
+    """
+    Renders plots away from the event loop and caches the encoded images.
+
+    Figures are drawn in a dedicated process pool, so matplotlib never holds the GIL of the API
+    process and concurrent requests cannot interfere with each other. With `max_workers=0` the
+    renderers run in a thread pool instead; they only use the object-oriented Figure API, which
+    is safe there too. Results are kept in a byte-bounded LRU cache keyed on the input hash, and
+    concurrent requests for the same image wait on a single render, which keeps going when the
+    request that started it is cancelled.
+    """
+
+    def __init__(self, max_workers: int = 2, cache_max_bytes: int = 32 * 1024 * 1024):
+        self.max_workers = max_workers
+        self.cache_max_bytes = cache_max_bytes
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._cache_bytes = 0
+        self._in_flight = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _get_executor(self):
+        # Workers are started on the first plot request, not at import time
+        with self._executor_lock:
+            if self._executor is None:
+                if self.max_workers > 0:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(thread_name_prefix="plot")
+            return self._executor
+
+    def _reset_executor(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    async def render(self, kind: str, fmt: str = "png", **inputs) -> bytes:
+        """
+        Renders a plot, or returns it from the cache.
+
+        Parameters:
+        - kind (str): The plot to draw, a key of `RENDERERS` ("comparison" or "scatter").
+        - fmt (str): "png", "svg" or "webp".
+        - **inputs: Keyword arguments of the renderer.
+
+        Returns:
+        - bytes: The encoded image.
+        """
+        if kind not in RENDERERS:
+            raise ValueError(f"Invalid plot kind: {kind}. Pick one of {', '.join(RENDERERS)}.")
+        if fmt not in IMAGE_FORMATS:
+            raise ValueError(f"Invalid image format: {fmt}. Pick one of {', '.join(IMAGE_FORMATS)}.")
+
+        key = plot_cache_key(kind, fmt, **inputs)
+        image = self._cache.get(key)
+        if image is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return image
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            # The render is its own task, so a cancelled request does not cancel it for the others
+            task = self._in_flight[key] = asyncio.ensure_future(self._render_shared(key, kind, fmt, inputs))
+            # Retrieve the error here so one without waiters is not reported as unhandled
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        return await asyncio.shield(task)
+
+    async def _render_shared(self, key: str, kind: str, fmt: str, inputs: dict) -> bytes:
+        start = time.perf_counter()
+        try:
+            image = await asyncio.get_running_loop().run_in_executor(
+                self._get_executor(), _render, kind, fmt, inputs
+            )
+            PLOT_RENDER_SECONDS.observe(time.perf_counter() - start, kind=kind, format=fmt)
+        except BrokenProcessPool as e:
+            logger.error(f"Plot worker died, restarting the pool: {e}")
+            self._reset_executor()
+            raise
+        else:
+            self._store(key, image)
+            return image
+        finally:
+            del self._in_flight[key]
+
+    def _store(self, key: str, image: bytes):
+        if len(image) > self.cache_max_bytes:
+            return
+        self._cache[key] = image
+        self._cache_bytes += len(image)
+        while self._cache_bytes > self.cache_max_bytes:
+            _, evicted = self._cache.popitem(last=False)
+            self._cache_bytes -= len(evicted)
+            self.evictions += 1
+
+    def clear(self):
+        self._cache.clear()
+        self._cache_bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._cache),
+            "bytes": self._cache_bytes,
+            "max_bytes": self.cache_max_bytes,
+        }
+
+    def shutdown(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+
+
+def _render(kind: str, fmt: str, inputs: dict) -> bytes:
+    # Module-level so it can be pickled into the worker processes
+    return RENDERERS[kind](fmt=fmt, **inputs)
@@ -0,0 +1,490 @@
+# app/services/projection.py
+
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from app.core.logging_config import setup_logging
+from app.core.tracing import span
+from app.helpers.vector_math import as_float32_matrix, normalize_rows, top_k
+from app.services.vector_index import INDEX_NAME_RE
+
+logger = setup_logging()
+
+PROJECTION_METHODS = ("pca", "incremental_pca", "umap", "tsne")
+
+
+def _flip_signs(components: np.ndarray) -> np.ndarray:
+    """
+    Makes the largest |value| of every component positive. SVD signs are arbitrary, and
+    without this an update could mirror the whole plot.
+    """
+    signs = np.sign(components[np.arange(len(components)), np.abs(components).argmax(axis=1)])
+    signs[signs == 0] = 1.0
+    return components * signs[:, np.newaxis]
+
+
+def randomized_svd(matrix: np.ndarray, rank: int, oversamples: int = 10, power_iterations: int = 4, seed: int = 0):
+    """
+    Truncated SVD by random projection (Halko et al.): the top `rank` singular triplets of a
+    (n, d) matrix in O(n * d * rank) time, without the full O(n * d * min(n, d)) decomposition.
+
+    Returns:
+    - tuple: (singular values, right singular vectors of shape (rank, d)).
+    """
+    rng = np.random.default_rng(seed)
+    sketch = matrix @ rng.standard_normal((matrix.shape[1], min(rank + oversamples, min(matrix.shape))))
+    for _ in range(power_iterations):
+        # Re-orthonormalize between passes so small singular values are not lost to rounding
+        sketch, _ = np.linalg.qr(sketch)
+        sketch = matrix @ (matrix.T @ sketch)
+    basis, _ = np.linalg.qr(sketch)
+    _, singular_values, vt = np.linalg.svd(basis.T @ matrix, full_matrices=False)
+    return singular_values[:rank], vt[:rank]
+
+
+class Projection:
+    """
+    A fitted projection of embeddings into 2D or 3D that can place new points in its space.
+
+    `fit` computes the layout of an initial set of embeddings. `transform` projects new
+    embeddings without changing the projection, so earlier coordinates stay valid.
+    `partial_fit` projects new embeddings and also folds them into the projection, at a
+    cost proportional to the new points only.
+    """
+
+    method = None
+
+    def __init__(self, n_components: int = 2, seed: int = 0):
+        if n_components not in (2, 3):
+            raise ValueError("n_components must be 2 or 3.")
+        self.n_components = n_components
+        self.seed = seed
+        self.dim = None
+        self.n_seen = 0
+        self._lock = threading.RLock()
+
+    def _check(self, embeddings) -> np.ndarray:
+        matrix = as_float32_matrix(embeddings)
+        if self.dim is not None and matrix.shape[1] != self.dim:
+            raise ValueError(f"Dimension mismatch: the projection expects {self.dim} dimensions, got {matrix.shape[1]}.")
+        return matrix
+
+    def fit(self, embeddings) -> np.ndarray:
+        """
+        Fits the projection from scratch and returns the (n, n_components) coordinates.
+        """
+        matrix = as_float32_matrix(embeddings)
+        if len(matrix) < self.n_components:
+            raise ValueError(f"Fitting a {self.n_components}D projection needs at least {self.n_components} texts.")
+        with self._lock, span("projection.fit", method=self.method, rows=len(matrix), dim=matrix.shape[1]):
+            self.dim = matrix.shape[1]
+            self.n_seen = 0
+            coordinates = self._fit(matrix)
+            self.n_seen = len(matrix)
+            return coordinates
+
+    def transform(self, embeddings) -> np.ndarray:
+        with self._lock, span("projection.transform", method=self.method, rows=len(embeddings)):
+            return self._transform(self._check(embeddings))
+
+    def partial_fit(self, embeddings) -> np.ndarray:
+        with self._lock, span("projection.partial_fit", method=self.method, rows=len(embeddings)):
+            matrix = self._check(embeddings)
+            coordinates = self._partial_fit(matrix)
+            self.n_seen += len(matrix)
+            return coordinates
+
+    def info(self) -> dict:
+        return {
+            "method": self.method,
+            "n_components": self.n_components,
+            "dim": self.dim,
+            "n_seen": self.n_seen,
+        }
+
+    # ------------------------------------------------------------ method hooks
+
+    def _fit(self, matrix: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def _transform(self, matrix: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def _partial_fit(self, matrix: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def _params(self) -> dict:
+        return {}
+
+    def _arrays(self) -> dict:
+        return {}
+
+    def _restore(self, arrays: dict):
+        pass
+
+    # -------------------------------------------------------------- persistence
+
+    def save(self, directory: str, extra: dict = None):
+        """
+        Saves the projection to a directory as arrays.npz plus a JSON manifest, replaced last.
+        """
+        with self._lock:
+            os.makedirs(directory, exist_ok=True)
+            arrays_path = os.path.join(directory, "arrays.npz")
+            with open(arrays_path + ".tmp", "wb") as f:
+                np.savez(f, **self._arrays())
+            os.replace(arrays_path + ".tmp", arrays_path)
+            manifest = {**self.info(), "seed": self.seed, "params": self._params(), **(extra or {})}
+            manifest_path = os.path.join(directory, "projection.json")
+            with open(manifest_path + ".tmp", "w") as f:
+                json.dump(manifest, f)
+            os.replace(manifest_path + ".tmp", manifest_path)
+
+    @staticmethod
+    def load(directory: str):
+        """
+        Loads a projection saved with `save`.
+
+        Returns:
+        - tuple: The projection and its manifest.
+        """
+        with open(os.path.join(directory, "projection.json")) as f:
+            manifest = json.load(f)
+        projection = create_projection(
+            manifest["method"], n_components=manifest["n_components"], seed=manifest["seed"], **manifest["params"]
+        )
+        projection.dim = manifest["dim"]
+        projection.n_seen = manifest["n_seen"]
+        with np.load(os.path.join(directory, "arrays.npz")) as arrays:
+            projection._restore(dict(arrays))
+        return projection, manifest
+
+
+class PCAProjection(Projection):
+    """
+    Principal component analysis.
+
+    The fit uses a full SVD for small inputs and a randomized SVD for large ones. Only the
+    mean, the top components and their singular values are kept, so updates fold new points
+    in with the incremental PCA update (Ross et al.): one SVD of a small stacked matrix per
+    batch, in O(new points * dim) memory. A few components beyond those plotted are tracked,
+    which keeps repeated updates close to a refit on all points.
+    """
+
+    method = "pca"
+    # Matrices whose smaller side is at most this big use the exact SVD
+    full_svd_max = 500
+    extra_components = 8
+
+    def __init__(self, n_components: int = 2, seed: int = 0):
+        super().__init__(n_components=n_components, seed=seed)
+        self.mean = None
+        self.components = None
+        self.singular_values = None
+
+    def _rank(self, matrix: np.ndarray) -> int:
+        return min(self.n_components + self.extra_components, *matrix.shape)
+
+    def _fit(self, matrix: np.ndarray) -> np.ndarray:
+        data = matrix.astype(np.float64)
+        self.mean = data.mean(axis=0)
+        centered = data - self.mean
+        rank = self._rank(centered)
+        if min(centered.shape) <= self.full_svd_max:
+            _, singular_values, vt = np.linalg.svd(centered, full_matrices=False)
+        else:
+            singular_values, vt = randomized_svd(centered, rank, seed=self.seed)
+        self._set_components(singular_values[:rank], vt[:rank])
+        return self._transform(matrix)
+
+    def _set_components(self, singular_values: np.ndarray, components: np.ndarray):
+        self.singular_values = singular_values
+        self.components = _flip_signs(components)
+
+    def _transform(self, matrix: np.ndarray) -> np.ndarray:
+        return ((matrix - self.mean) @ self.components[:self.n_components].T).astype(np.float32)
+
+    def _partial_fit(self, matrix: np.ndarray) -> np.ndarray:
+        data = matrix.astype(np.float64)
+        total = self.n_seen + len(data)
+        batch_mean = data.mean(axis=0)
+        # The mean shift between the seen points and the batch is a rank-one term of the new covariance
+        correction = np.sqrt(self.n_seen * len(data) / total) * (self.mean - batch_mean)
+        stacked = np.vstack([
+            self.singular_values[:, np.newaxis] * self.components,
+            data - batch_mean,
+            correction[np.newaxis, :],
+        ])
+        _, singular_values, vt = np.linalg.svd(stacked, full_matrices=False)
+        rank = min(self.n_components + self.extra_components, len(singular_values))
+        self.mean = (self.n_seen * self.mean + len(data) * batch_mean) / total
+        self._set_components(singular_values[:rank], vt[:rank])
+        return self._transform(matrix)
+
+    def info(self) -> dict:
+        info = super().info()
+        if self.singular_values is not None and self.n_seen > 1:
+            variance = self.singular_values ** 2 / (self.n_seen - 1)
+            info["explained_variance"] = variance[:self.n_components].tolist()
+        return info
+
+    def _arrays(self) -> dict:
+        return {"mean": self.mean, "components": self.components, "singular_values": self.singular_values}
+
+    def _restore(self, arrays: dict):
+        self.mean = arrays["mean"]
+        self.components = arrays["components"]
+        self.singular_values = arrays["singular_values"]
+
+
+class IncrementalPCAProjection(PCAProjection):
+    """
+    PCA fitted batch by batch with the incremental update, so even the first fit never
+    decomposes more than `batch_size` rows at once.
+    """
+
+    method = "incremental_pca"
+
+    def __init__(self, n_components: int = 2, seed: int = 0, batch_size: int = 1024):
+        super().__init__(n_components=n_components, seed=seed)
+        self.batch_size = max(batch_size, n_components + self.extra_components)
+
+    def _fit(self, matrix: np.ndarray) -> np.ndarray:
+        PCAProjection._fit(self, matrix[:self.batch_size])
+        self.n_seen = min(len(matrix), self.batch_size)
+        for start in range(self.batch_size, len(matrix), self.batch_size):
+            batch = matrix[start:start + self.batch_size]
+            self._partial_fit(batch)
+            self.n_seen += len(batch)
+        return self._transform(matrix)
+
+    def _params(self) -> dict:
+        return {"batch_size": self.batch_size}
+
+
+class NeighborProjection(Projection):
+    """
+    Base for nonlinear layouts (UMAP, t-SNE), which have no formula for new points.
+
+    New points are placed at the similarity-weighted mean of the coordinates of their
+    `n_neighbors` nearest reference points by cosine similarity. The reference set starts as
+    the fitted points and grows with `partial_fit` up to `max_reference` points, which bounds
+    both the storage and the cost of placing a point.
+    """
+
+    def __init__(self, n_components: int = 2, seed: int = 0, n_neighbors: int = 10, max_reference: int = 20000):
+        super().__init__(n_components=n_components, seed=seed)
+        self.n_neighbors = n_neighbors
+        self.max_reference = max_reference
+        self.reference = None
+        self.coordinates = None
+
+    def _layout(self, matrix: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def _fit(self, matrix: np.ndarray) -> np.ndarray:
+        coordinates = np.asarray(self._layout(matrix), dtype=np.float32)
+        self._set_reference(matrix, coordinates)
+        return coordinates
+
+    def _set_reference(self, matrix: np.ndarray, coordinates: np.ndarray):
+        if len(matrix) > self.max_reference:
+            keep = np.sort(np.random.default_rng(self.seed).choice(len(matrix), self.max_reference, replace=False))
+            matrix, coordinates = matrix[keep], coordinates[keep]
+        self.reference = normalize_rows(matrix).astype(np.float16)
+        self.coordinates = coordinates
+
+    def _transform(self, matrix: np.ndarray) -> np.ndarray:
+        result = np.empty((len(matrix), self.n_components), dtype=np.float32)
+        reference = self.reference.astype(np.float32)
+        for start in range(0, len(matrix), 1024):
+            scores = normalize_rows(matrix[start:start + 1024]) @ reference.T
+            indices, similarities = top_k(scores, self.n_neighbors)
+            weights = np.maximum(similarities, 0.0) + 1e-6
+            weights /= weights.sum(axis=1, keepdims=True)
+            result[start:start + 1024] = np.einsum("ij,ijk->ik", weights, self.coordinates[indices])
+        return result
+
+    def _partial_fit(self, matrix: np.ndarray) -> np.ndarray:
+        coordinates = self._transform(matrix)
+        room = self.max_reference - len(self.reference)
+        if room > 0:
+            self.reference = np.vstack([self.reference, normalize_rows(matrix[:room]).astype(np.float16)])
+            self.coordinates = np.vstack([self.coordinates, coordinates[:room]])
+        return coordinates
+
+    def _params(self) -> dict:
+        return {"n_neighbors": self.n_neighbors, "max_reference": self.max_reference}
+
+    def _arrays(self) -> dict:
+        return {"reference": self.reference, "coordinates": self.coordinates}
+
+    def _restore(self, arrays: dict):
+        self.reference = arrays["reference"]
+        self.coordinates = arrays["coordinates"]
+
+
+class UMAPProjection(NeighborProjection):
+    """
+    UMAP layout; needs the optional `umap-learn` package.
+    """
+
+    method = "umap"
+
+    def _layout(self, matrix: np.ndarray) -> np.ndarray:
+        try:
+            import umap
+        except ImportError:
+            raise ValueError("The 'umap' method needs the optional 'umap-learn' package.")
+        n_neighbors = min(15, len(matrix) - 1)
+        return umap.UMAP(
+            n_components=self.n_components, n_neighbors=n_neighbors, metric="cosine", random_state=self.seed
+        ).fit_transform(matrix)
+
+
+class TSNEProjection(NeighborProjection):
+    """
+    t-SNE layout from scikit-learn.
+    """
+
+    method = "tsne"
+
+    def _layout(self, matrix: np.ndarray) -> np.ndarray:
+        # scikit-learn is imported on first use, not when the API starts
+        from sklearn.manifold import TSNE
+
+        perplexity = min(30.0, (len(matrix) - 1) / 3)
+        return TSNE(
+            n_components=self.n_components, perplexity=perplexity, metric="cosine", init="pca", random_state=self.seed
+        ).fit_transform(matrix)
+
+
+PROJECTIONS = {
+    PCAProjection.method: PCAProjection,
+    IncrementalPCAProjection.method: IncrementalPCAProjection,
+    UMAPProjection.method: UMAPProjection,
+    TSNEProjection.method: TSNEProjection,
+}
+
+
+def create_projection(method: str = "pca", **kwargs) -> Projection:
+    """
+    Creates an unfitted projection ("pca", "incremental_pca", "umap" or "tsne").
+    """
+    if method not in PROJECTIONS:
+        raise ValueError(f"Invalid projection method: {method}. Pick one of {', '.join(PROJECTIONS)}.")
+    return PROJECTIONS[method](**kwargs)
+
+
+class ProjectionManager:
+    """
+    Keeps named projections, e.g. one per session or corpus, and persists every change under
+    `persist_dir/<id>`. Up to `max_loaded` projections stay in memory; the least recently
+    used are dropped from memory and reloaded from disk on their next use.
+    """
+
+    def __init__(self, persist_dir: str, max_loaded: int = 32):
+        self.persist_dir = persist_dir
+        self.max_loaded = max_loaded
+        self._loaded: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _check_id(projection_id: str):
+        if not INDEX_NAME_RE.match(projection_id):
+            raise ValueError("Projection ids may only contain letters, digits, '-' and '_' (max 64 characters).")
+
+    def path(self, projection_id: str) -> str:
+        return os.path.join(self.persist_dir, projection_id)
+
+    def _remember(self, projection_id: str, projection: Projection, model: str):
+        self._loaded[projection_id] = (projection, model)
+        self._loaded.move_to_end(projection_id)
+        while len(self._loaded) > self.max_loaded:
+            self._loaded.popitem(last=False)
+
+    def exists(self, projection_id: str) -> bool:
+        self._check_id(projection_id)
+        with self._lock:
+            return projection_id in self._loaded or os.path.exists(os.path.join(self.path(projection_id), "projection.json"))
+
+    def get(self, projection_id: str):
+        """
+        Returns:
+        - tuple: The projection and the embedding model it was fitted with.
+        """
+        self._check_id(projection_id)
+        with self._lock:
+            if projection_id in self._loaded:
+                self._loaded.move_to_end(projection_id)
+                return self._loaded[projection_id]
+            path = self.path(projection_id)
+            if not os.path.exists(os.path.join(path, "projection.json")):
+                raise KeyError(f"Projection '{projection_id}' not found.")
+            projection, manifest = Projection.load(path)
+            self._remember(projection_id, projection, manifest.get("model"))
+            logger.info(f"Loaded {projection.method} projection '{projection_id}' from {path}")
+            return projection, manifest.get("model")
+
+    def create(self, projection_id: str, embeddings, method: str = "pca", n_components: int = 2, model: str = None):
+        """
+        Fits a new projection, replacing one with the same id, and saves it.
+
+        Returns:
+        - tuple: The projection and the coordinates of the embeddings.
+        """
+        self._check_id(projection_id)
+        projection = create_projection(method, n_components=n_components)
+        coordinates = projection.fit(embeddings)
+        with span("projection.save"):
+            projection.save(self.path(projection_id), extra={"model": model})
+        with self._lock:
+            self._remember(projection_id, projection, model)
+        logger.info(f"Fitted {method} projection '{projection_id}' on {projection.n_seen} embeddings")
+        return projection, coordinates
+
+    def project(self, projection_id: str, embeddings, update: bool = False, model: str = None):
+        """
+        Places embeddings in an existing projection. With `update`, they are also folded into
+        the projection, which is saved again.
+
+        Returns:
+        - tuple: The projection and the coordinates of the embeddings.
+        """
+        projection, fitted_model = self.get(projection_id)
+        if model is not None and fitted_model is not None and model != fitted_model:
+            raise ValueError(f"Projection '{projection_id}' was fitted on '{fitted_model}' embeddings, not '{model}'.")
+        if not update:
+            return projection, projection.transform(embeddings)
+        coordinates = projection.partial_fit(embeddings)
+        with span("projection.save"):
+            projection.save(self.path(projection_id), extra={"model": fitted_model})
+        return projection, coordinates
+
+    def drop(self, projection_id: str):
+        self._check_id(projection_id)
+        with self._lock:
+            loaded = self._loaded.pop(projection_id, None)
+            path = self.path(projection_id)
+            if loaded is None and not os.path.exists(path):
+                raise KeyError(f"Projection '{projection_id}' not found.")
+            shutil.rmtree(path, ignore_errors=True)
+
+    def list(self) -> dict:
+        """
+        Info of every saved projection, by id.
+        """
+        projections = {}
+        if os.path.isdir(self.persist_dir):
+            for projection_id in sorted(os.listdir(self.persist_dir)):
+                manifest_path = os.path.join(self.path(projection_id), "projection.json")
+                if os.path.exists(manifest_path):
+                    with open(manifest_path) as f:
+                        manifest = json.load(f)
+                    projections[projection_id] = manifest
+        return projections
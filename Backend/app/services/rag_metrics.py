@@ -0,0 +1,72 @@
+# app/services/rag_metrics.py
+
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from llama_index.core.callbacks.base_handler import BaseCallbackHandler
+from llama_index.core.callbacks.schema import CBEventType
+
+from app.core.metrics import observe_stage
+
+# llama_index events and the RAG stage they are timed as
+EVENT_STAGES = {
+    CBEventType.NODE_PARSING: "split",
+    CBEventType.CHUNKING: "split",
+    CBEventType.EMBEDDING: "embed",
+    CBEventType.RETRIEVE: "retrieve",
+    CBEventType.SYNTHESIZE: "synthesize",
+    CBEventType.LLM: "llm",
+}
+
+# Events whose end never arrives (an exception inside the event) are dropped past this many
+MAX_OPEN_EVENTS = 10000
+
+
+class StageTimingHandler(BaseCallbackHandler):
+    """
+    Times the llama_index events of ingestion and queries as RAG stages.
+
+    Events of the same stage nest (the hybrid retriever wraps the dense one, the node parser
+    emits chunking events), so only the outermost event of a stage is recorded. Stages of
+    different kinds do overlap: the query embedding is part of "retrieve" and also counted
+    as "embed".
+    """
+
+    def __init__(self):
+        super().__init__(event_starts_to_ignore=[], event_ends_to_ignore=[])
+        self._open = {}
+        self._lock = threading.Lock()
+
+    def _nested(self, stage: str, parent_id: Optional[str]) -> bool:
+        while parent_id in self._open:
+            parent_stage, _, parent_id = self._open[parent_id]
+            if parent_stage == stage:
+                return True
+        return False
+
+    def on_event_start(self, event_type: CBEventType, payload: Optional[Dict[str, Any]] = None,
+                       event_id: str = "", parent_id: str = "", **kwargs: Any) -> str:
+        stage = EVENT_STAGES.get(event_type)
+        if stage is not None:
+            with self._lock:
+                if len(self._open) >= MAX_OPEN_EVENTS:
+                    self._open.clear()
+                start = None if self._nested(stage, parent_id) else time.perf_counter()
+                self._open[event_id] = (stage, start, parent_id)
+        return event_id
+
+    def on_event_end(self, event_type: CBEventType, payload: Optional[Dict[str, Any]] = None,
+                     event_id: str = "", **kwargs: Any) -> None:
+        if event_type not in EVENT_STAGES:
+            return
+        with self._lock:
+            stage, start, _ = self._open.pop(event_id, (None, None, None))
+        if start is not None:
+            observe_stage(stage, time.perf_counter() - start)
+
+    def start_trace(self, trace_id: Optional[str] = None) -> None:
+        pass
+
+    def end_trace(self, trace_id: Optional[str] = None, trace_map: Optional[Dict[str, List[str]]] = None) -> None:
+        pass
@@ -0,0 +1,71 @@
+# app/services/rag_tracing.py
+
+import threading
+from typing import Any, Dict, List, Optional
+
+from llama_index.core.callbacks.base_handler import BaseCallbackHandler
+from llama_index.core.callbacks.schema import CBEventType, EventPayload
+
+from app.core.tracing import Span, current_span
+
+# Events inside a trace that are not worth a span of their own
+IGNORED_EVENTS = (CBEventType.TEMPLATING, CBEventType.CHUNKING)
+
+# Spans whose end never arrives (an exception inside the event) are dropped past this many
+MAX_OPEN_SPANS = 10000
+
+
+def event_attributes(event_type: CBEventType, payload: Optional[Dict[str, Any]]) -> dict:
+    if not payload:
+        return {}
+    if event_type == CBEventType.EMBEDDING and EventPayload.CHUNKS in payload:
+        return {"texts": len(payload[EventPayload.CHUNKS])}
+    if event_type == CBEventType.RETRIEVE and EventPayload.NODES in payload:
+        return {"nodes": len(payload[EventPayload.NODES])}
+    if event_type == CBEventType.NODE_PARSING and EventPayload.NODES in payload:
+        return {"nodes": len(payload[EventPayload.NODES])}
+    return {}
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """
+    Records the llama_index events of a traced request (retrieval, synthesis, LLM and
+    embedding calls, node parsing) as spans.
+
+    Each event span becomes the current span while the event runs, so provider calls made
+    inside an embedding event are nested under it. Outside a sampled trace nothing is done.
+    """
+
+    def __init__(self):
+        super().__init__(event_starts_to_ignore=list(IGNORED_EVENTS), event_ends_to_ignore=list(IGNORED_EVENTS))
+        self._open = {}
+        self._lock = threading.Lock()
+
+    def on_event_start(self, event_type: CBEventType, payload: Optional[Dict[str, Any]] = None,
+                       event_id: str = "", parent_id: str = "", **kwargs: Any) -> str:
+        parent = current_span()
+        if parent is None:
+            return event_id
+        with self._lock:
+            if len(self._open) >= MAX_OPEN_SPANS:
+                self._open.clear()
+            parent_span = self._open.get(parent_id, parent)
+            span = Span(parent.trace, f"llama_index.{event_type.value}", parent_span.span_id,
+                        event_attributes(event_type, payload))
+            self._open[event_id] = span
+        span.__enter__()
+        return event_id
+
+    def on_event_end(self, event_type: CBEventType, payload: Optional[Dict[str, Any]] = None,
+                     event_id: str = "", **kwargs: Any) -> None:
+        with self._lock:
+            span = self._open.pop(event_id, None)
+        if span is not None:
+            span.set_attributes(**event_attributes(event_type, payload))
+            span.__exit__(None, None, None)
+
+    def start_trace(self, trace_id: Optional[str] = None) -> None:
+        pass
+
+    def end_trace(self, trace_id: Optional[str] = None, trace_map: Optional[Dict[str, List[str]]] = None) -> None:
+        pass
@@ -0,0 +1,72 @@
+# app/services/scheduled_embedding.py
+
+from typing import List
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+
+from app.services.scheduler import RequestScheduler, estimate_tokens
+
+
+class ScheduledEmbedding(BaseEmbedding):
+    """
+    Sends the provider calls of an embedding model through the request scheduler.
+
+    The wrapper keeps the model's name and batch size, so it can replace the model anywhere
+    (the embedding handler, `Settings.embed_model`, ingestion pipelines). Each provider call
+    is rate limited, retried on throttling, and shared with identical calls in flight.
+    """
+
+    scheduler_key: str = Field(description="Limiter key of the model, 'provider/model'.")
+
+    _model: BaseEmbedding = PrivateAttr()
+    _scheduler: RequestScheduler = PrivateAttr()
+
+    def __init__(self, model: BaseEmbedding, scheduler: RequestScheduler, scheduler_key: str, **kwargs):
+        super().__init__(
+            model_name=model.model_name,
+            embed_batch_size=model.embed_batch_size,
+            callback_manager=model.callback_manager,
+            scheduler_key=scheduler_key,
+            **kwargs,
+        )
+        self._model = model
+        self._scheduler = scheduler
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "ScheduledEmbedding"
+
+    @property
+    def model(self) -> BaseEmbedding:
+        return self._model
+
+    @staticmethod
+    def _request(payload, kind: str) -> dict:
+        # Queries and documents embed differently for some providers, so the kind is part of the identity
+        identity = payload if isinstance(payload, str) else tuple(payload)
+        return {"cost": estimate_tokens(payload), "coalesce_key": (kind, identity)}
+
+    def _call(self, fn, payload, kind: str):
+        return self._scheduler.call(self.scheduler_key, fn, payload, **self._request(payload, kind))
+
+    async def _acall(self, fn, payload, kind: str):
+        return await self._scheduler.acall(self.scheduler_key, fn, payload, **self._request(payload, kind))
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._call(self._model._get_query_embedding, query, "query")
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._call(self._model._get_text_embedding, text, "text")
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._call(self._model._get_text_embeddings, texts, "texts")
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return await self._acall(self._model._aget_query_embedding, query, "query")
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        return await self._acall(self._model._aget_text_embedding, text, "text")
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return await self._acall(self._model._aget_text_embeddings, texts, "texts")
@@ -0,0 +1,131 @@
+# app/services/scheduled_llm.py
+
+from typing import Any, Sequence
+
+from llama_index.core.base.llms.types import (
+    ChatMessage,
+    ChatResponse,
+    ChatResponseAsyncGen,
+    ChatResponseGen,
+    CompletionResponse,
+    CompletionResponseAsyncGen,
+    CompletionResponseGen,
+    LLMMetadata,
+)
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.llms.llm import LLM
+
+from app.services.scheduler import RequestScheduler, estimate_tokens
+
+_END = object()
+
+
+class ScheduledLLM(LLM):
+    """
+    Sends the provider calls of an LLM through the request scheduler, like `ScheduledEmbedding`
+    does for embedding models: each call waits for quota in priority order and is retried on
+    throttling. LLM calls are never coalesced, as two identical prompts may be sampled apart.
+
+    A streaming call is admitted and retried until its first chunk arrives; a stream that
+    breaks after that is not retried, as part of the answer has already been sent.
+
+    The wrapped LLM keeps its own callback manager, so its events are reported once.
+    """
+
+    scheduler_key: str = Field(description="Limiter key of the model, 'provider/model'.")
+
+    _llm: LLM = PrivateAttr()
+    _scheduler: RequestScheduler = PrivateAttr()
+
+    def __init__(self, llm: LLM, scheduler: RequestScheduler, scheduler_key: str, **kwargs):
+        super().__init__(
+            callback_manager=llm.callback_manager,
+            system_prompt=llm.system_prompt,
+            messages_to_prompt=llm.messages_to_prompt,
+            completion_to_prompt=llm.completion_to_prompt,
+            pydantic_program_mode=llm.pydantic_program_mode,
+            scheduler_key=scheduler_key,
+            **kwargs,
+        )
+        self._llm = llm
+        self._scheduler = scheduler
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "ScheduledLLM"
+
+    @property
+    def llm(self) -> LLM:
+        return self._llm
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return self._llm.metadata
+
+    @staticmethod
+    def _cost(payload) -> int:
+        if isinstance(payload, str):
+            return estimate_tokens(payload)
+        return estimate_tokens([message.content or "" for message in payload])
+
+    def _call(self, fn, payload, **kwargs):
+        return self._scheduler.call(self.scheduler_key, fn, payload, cost=self._cost(payload), **kwargs)
+
+    async def _acall(self, fn, payload, **kwargs):
+        return await self._scheduler.acall(self.scheduler_key, fn, payload, cost=self._cost(payload), **kwargs)
+
+    def _stream(self, fn, payload, **kwargs):
+        def open_stream():
+            stream = fn(payload, **kwargs)
+            return next(stream, _END), stream
+
+        first, stream = self._scheduler.call(self.scheduler_key, open_stream, cost=self._cost(payload))
+
+        def gen():
+            if first is not _END:
+                yield first
+                yield from stream
+
+        return gen()
+
+    async def _astream(self, fn, payload, **kwargs):
+        async def open_stream():
+            stream = await fn(payload, **kwargs)
+            try:
+                return await stream.__anext__(), stream
+            except StopAsyncIteration:
+                return _END, stream
+
+        first, stream = await self._scheduler.acall(self.scheduler_key, open_stream, cost=self._cost(payload))
+
+        async def gen():
+            if first is not _END:
+                yield first
+                async for item in stream:
+                    yield item
+
+        return gen()
+
+    def chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        return self._call(self._llm.chat, messages, **kwargs)
+
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        return self._call(self._llm.complete, prompt, formatted=formatted, **kwargs)
+
+    def stream_chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponseGen:
+        return self._stream(self._llm.stream_chat, messages, **kwargs)
+
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponseGen:
+        return self._stream(self._llm.stream_complete, prompt, formatted=formatted, **kwargs)
+
+    async def achat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        return await self._acall(self._llm.achat, messages, **kwargs)
+
+    async def acomplete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        return await self._acall(self._llm.acomplete, prompt, formatted=formatted, **kwargs)
+
+    async def astream_chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponseAsyncGen:
+        return await self._astream(self._llm.astream_chat, messages, **kwargs)
+
+    async def astream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponseAsyncGen:
+        return await self._astream(self._llm.astream_complete, prompt, formatted=formatted, **kwargs)
@@ -0,0 +1,522 @@
+# app/services/scheduler.py
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from app.core.logging_config import setup_logging
+from app.core.metrics import REGISTRY
+from app.core.tracing import span
+
+logger = setup_logging()
+
+PROVIDER_REQUEST_SECONDS = REGISTRY.histogram(
+    "provider_request_duration_seconds", "Latency of provider call attempts", ("provider",)
+)
+PROVIDER_REQUESTS = REGISTRY.counter(
+    "provider_requests_total", "Provider call attempts by outcome: ok, throttled or error", ("provider", "outcome")
+)
+PROVIDER_ERRORS = REGISTRY.counter(
+    "provider_errors_total", "Failed provider call attempts by HTTP status or error type", ("provider", "status")
+)
+PROVIDER_QUEUE_SECONDS = REGISTRY.histogram(
+    "provider_queue_duration_seconds", "Time calls waited for provider quota before an attempt", ("provider",)
+)
+
+# Lower values are served first when a provider quota is the bottleneck
+INTERACTIVE = 0
+BULK = 10
+
+RETRYABLE_STATUS_CODES = frozenset({408, 425, 429, 500, 502, 503, 504})
+# Connection-level failures of httpx and the provider SDKs, matched by name to avoid importing them
+RETRYABLE_ERRORS = frozenset({
+    "ConnectError", "ConnectTimeout", "ReadError", "ReadTimeout", "RemoteProtocolError", "PoolTimeout",
+    "APIConnectionError", "APITimeoutError",
+})
+
+_priority = contextvars.ContextVar("request_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def request_priority(priority: int):
+    """
+    Runs the enclosed outbound calls at the given priority, e.g. `BULK` for ingestion.
+    """
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> int:
+    return _priority.get()
+
+
+def estimate_tokens(texts) -> int:
+    """
+    Rough token count of texts (about 4 characters per token), used for tokens-per-minute limits.
+    """
+    if isinstance(texts, str):
+        texts = [texts]
+    return sum(len(text) // 4 + 1 for text in texts)
+
+
+def status_code(error: Exception) -> Optional[int]:
+    """
+    The HTTP status of a provider error: httpx, Cohere and OpenAI errors all carry it somewhere.
+    """
+    for candidate in (error, getattr(error, "response", None)):
+        code = getattr(candidate, "status_code", None)
+        if isinstance(code, int):
+            return code
+    return None
+
+
+def is_retryable(error: Exception) -> bool:
+    return status_code(error) in RETRYABLE_STATUS_CODES or type(error).__name__ in RETRYABLE_ERRORS
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """
+    Seconds the provider asked to wait, from the Retry-After (or retry-after-ms) header.
+    """
+    headers = getattr(getattr(error, "response", None), "headers", None) or getattr(error, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms") is not None:
+            return float(headers["retry-after-ms"]) / 1000.0
+        if headers.get("retry-after") is not None:
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def disable_cohere_retries(client):
+    """
+    Turns off the retries of a Cohere SDK client (sync or async), which would otherwise retry
+    429s and 5xx twice underneath the scheduler's own retries.
+
+    The SDK only takes `max_retries` per call, so it is defaulted to 0 on the client's HTTP
+    wrapper; calls that pass their own `request_options` keep them.
+    """
+    http_client = client._client_wrapper.httpx_client
+    request = http_client.request
+
+    def request_without_retries(*args, request_options=None, **kwargs):
+        return request(*args, request_options={"max_retries": 0, **(request_options or {})}, **kwargs)
+
+    http_client.request = request_without_retries
+    return client
+
+
+class TokenBucket:
+    """
+    Refills at `rate_per_minute / 60` per second up to `capacity`. Consuming may overdraw the
+    bucket, so a request larger than the capacity still goes through once the bucket is full
+    and simply delays the ones after it.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: float = None):
+        if rate_per_minute <= 0:
+            raise ValueError("rate_per_minute must be positive.")
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(capacity or rate_per_minute, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float, now: float) -> float:
+        """
+        Seconds until `amount` tokens (at most a full bucket) are available.
+        """
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.tokens
+        return max(missing, 0.0) / self.rate
+
+    def consume(self, amount: float, now: float):
+        self._refill(now)
+        self.tokens -= amount
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "wake")
+
+    def __init__(self, priority: int, seq: int, wake: Callable[[], None]):
+        self.priority = priority
+        self.seq = seq
+        self.wake = wake
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class ProviderLimiter:
+    """
+    Requests-per-minute and tokens-per-minute buckets for one provider or model, with a
+    priority queue in front of them.
+
+    Callers are admitted one at a time in (priority, arrival) order: only the head of the
+    queue may take tokens, so bulk work cannot starve interactive requests of quota. Threads
+    and event-loop tasks share the same queue. After a 429 the whole limiter is paused, so
+    queued callers back off together instead of each hitting the provider again.
+    """
+
+    def __init__(self, name: str, rpm: float = None, tpm: float = None, burst_seconds: float = 10.0):
+        self.name = name
+        burst = max(burst_seconds, 1.0) / 60.0
+        self.requests = TokenBucket(rpm, capacity=rpm * burst) if rpm else None
+        self.tokens = TokenBucket(tpm, capacity=tpm * burst) if tpm else None
+        self.paused_until = 0.0
+        self._queue = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+        self.admitted = 0
+        self.retries = 0
+        self.throttled = 0
+        self.failures = 0
+        self.coalesced = 0
+        self.in_flight = 0
+        self.wait_seconds = 0.0
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def _enqueue(self, priority: int, wake: Callable[[], None]) -> _Waiter:
+        waiter = _Waiter(priority, next(self._seq), wake)
+        with self._lock:
+            heapq.heappush(self._queue, waiter)
+            if self._queue[0] is waiter:
+                # A new head may be admitted sooner than the previous one was waiting for
+                waiter.wake()
+        return waiter
+
+    def _try_admit(self, waiter: _Waiter, cost: float) -> Optional[float]:
+        """
+        Admits the waiter if it is at the head of the queue and the buckets allow it.
+
+        Returns:
+        - 0.0 when admitted, the seconds to wait when at the head but limited, or None when
+          other callers are ahead (the waiter is woken when it becomes the head).
+        """
+        with self._lock:
+            if self._queue[0] is not waiter:
+                return None
+            now = time.monotonic()
+            delay = self.paused_until - now
+            if self.requests is not None:
+                delay = max(delay, self.requests.delay(1, now))
+            if self.tokens is not None:
+                delay = max(delay, self.tokens.delay(cost, now))
+            if delay > 0:
+                return delay
+            heapq.heappop(self._queue)
+            if self.requests is not None:
+                self.requests.consume(1, now)
+            if self.tokens is not None:
+                self.tokens.consume(cost, now)
+            self.admitted += 1
+            self.in_flight += 1
+            if self._queue:
+                self._queue[0].wake()
+            return 0.0
+
+    def _leave(self, waiter: _Waiter):
+        with self._lock:
+            if waiter in self._queue:
+                self._queue.remove(waiter)
+                heapq.heapify(self._queue)
+                if self._queue:
+                    self._queue[0].wake()
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def acquire(self, cost: float = 1, priority: int = INTERACTIVE):
+        """
+        Blocks the calling thread until the call may be sent.
+        """
+        event = threading.Event()
+        waiter = self._enqueue(priority, event.set)
+        start = time.monotonic()
+        admitted = False
+        try:
+            while True:
+                delay = self._try_admit(waiter, cost)
+                if delay == 0.0:
+                    admitted = True
+                    return
+                event.wait(delay)
+                event.clear()
+        finally:
+            if not admitted:
+                self._leave(waiter)
+            self.wait_seconds += time.monotonic() - start
+
+    async def aacquire(self, cost: float = 1, priority: int = INTERACTIVE):
+        """
+        Waits without blocking the event loop until the call may be sent.
+        """
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        waiter = self._enqueue(priority, lambda: loop.call_soon_threadsafe(event.set))
+        start = time.monotonic()
+        admitted = False
+        try:
+            while True:
+                delay = self._try_admit(waiter, cost)
+                if delay == 0.0:
+                    admitted = True
+                    return
+                try:
+                    await asyncio.wait_for(event.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                event.clear()
+        finally:
+            if not admitted:
+                self._leave(waiter)
+            self.wait_seconds += time.monotonic() - start
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "rpm": self.requests.rate * 60 if self.requests else None,
+                "tpm": self.tokens.rate * 60 if self.tokens else None,
+                "queued": len(self._queue),
+                "in_flight": self.in_flight,
+                "admitted": self.admitted,
+                "retries": self.retries,
+                "throttled": self.throttled,
+                "failures": self.failures,
+                "coalesced": self.coalesced,
+                "wait_seconds": self.wait_seconds,
+                "paused_for": max(self.paused_until - time.monotonic(), 0.0),
+            }
+
+
+class RequestScheduler:
+    """
+    Shared gate for outbound provider calls.
+
+    Every call goes through the limiter of its key ("provider/model"), which enforces the
+    configured requests and tokens per minute in priority order. 429s and 5xx responses are
+    retried with full-jitter exponential backoff, or after the provider's Retry-After. Calls
+    with the same `coalesce_key` that overlap in time share a single provider request.
+
+    Parameters:
+    - limits (dict): Per "provider/model" or per "provider" limits, e.g.
+      {"cohere": {"rpm": 100, "tpm": 100000}}. A provider-wide entry is shared by its models.
+      Keys without an entry are only retried and coalesced, never delayed.
+    - max_retries (int): Retries after the first attempt.
+    - base_delay / max_delay (float): Backoff bounds in seconds.
+    """
+
+    def __init__(self, limits: dict = None, max_retries: int = 5, base_delay: float = 0.5, max_delay: float = 30.0,
+                 burst_seconds: float = 10.0):
+        self.limits = dict(limits or {})
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.burst_seconds = burst_seconds
+        self._limiters = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def limiter(self, key: str) -> ProviderLimiter:
+        name = key if key in self.limits else key.split("/", 1)[0]
+        if name not in self.limits:
+            name = key
+        with self._lock:
+            if name not in self._limiters:
+                spec = self.limits.get(name, {})
+                self._limiters[name] = ProviderLimiter(
+                    name, rpm=spec.get("rpm"), tpm=spec.get("tpm"),
+                    burst_seconds=spec.get("burst_seconds", self.burst_seconds),
+                )
+            return self._limiters[name]
+
+    def backoff(self, attempt: int, error: Exception = None) -> float:
+        """
+        Seconds to wait before retry `attempt` (0-based): Retry-After when the provider sent
+        one, otherwise a uniformly random delay below the exponential bound.
+        """
+        requested = retry_after(error) if error is not None else None
+        if requested is not None:
+            return min(requested, self.max_delay) + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    @staticmethod
+    def _record(limiter: ProviderLimiter, queued: float, started: float, error: Exception = None):
+        PROVIDER_QUEUE_SECONDS.observe(started - queued, provider=limiter.name)
+        PROVIDER_REQUEST_SECONDS.observe(time.perf_counter() - started, provider=limiter.name)
+        if error is None:
+            PROVIDER_REQUESTS.inc(provider=limiter.name, outcome="ok")
+            return
+        code = status_code(error)
+        PROVIDER_REQUESTS.inc(provider=limiter.name, outcome="throttled" if code == 429 else "error")
+        PROVIDER_ERRORS.inc(provider=limiter.name, status=code or type(error).__name__)
+
+    def _on_error(self, limiter: ProviderLimiter, error: Exception, attempt: int) -> Optional[float]:
+        """
+        Records a failed attempt. Returns the retry delay, or None when the error is final.
+        """
+        if not is_retryable(error) or attempt >= self.max_retries:
+            limiter.failures += 1
+            return None
+        limiter.retries += 1
+        delay = self.backoff(attempt, error)
+        if status_code(error) == 429:
+            limiter.throttled += 1
+            limiter.pause(delay)
+            delay = 0.0
+        logger.warning(f"Retrying {limiter.name} call in {delay:.2f}s after {type(error).__name__} ({status_code(error)})")
+        return delay
+
+    def _coalesce(self, key: str, coalesce_key):
+        """
+        Returns (future, leader): the shared future of identical in-flight calls, and whether
+        the caller has to make the call itself.
+        """
+        with self._lock:
+            future = self._in_flight.get((key, coalesce_key))
+            if future is not None:
+                return future, False
+            future = self._in_flight[(key, coalesce_key)] = Future()
+            return future, True
+
+    def _finish(self, key: str, coalesce_key, future: Future, result=None, error: BaseException = None):
+        with self._lock:
+            self._in_flight.pop((key, coalesce_key), None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def call(self, key: str, fn: Callable, *args, cost: float = 1, priority: int = None, coalesce_key=None, **kwargs):
+        """
+        Calls `fn(*args, **kwargs)` under the limits of `key`, retrying throttled and failed attempts.
+
+        Parameters:
+        - cost (float): Estimated tokens of the request, for tokens-per-minute limits.
+        - priority (int): Defaults to the priority of the current context (`request_priority`).
+        - coalesce_key: Hashable identity of the request; concurrent calls with the same key share one result.
+        """
+        limiter = self.limiter(key)
+        if coalesce_key is not None:
+            future, leader = self._coalesce(key, coalesce_key)
+            if not leader:
+                limiter.coalesced += 1
+                return future.result()
+        priority = current_priority() if priority is None else priority
+        try:
+            attempt = 0
+            while True:
+                queued = time.perf_counter()
+                limiter.acquire(cost, priority)
+                started = time.perf_counter()
+                try:
+                    with span("provider.call", provider=limiter.name, attempt=attempt,
+                              queued_seconds=started - queued):
+                        result = fn(*args, **kwargs)
+                    self._record(limiter, queued, started)
+                    break
+                except Exception as e:
+                    self._record(limiter, queued, started, e)
+                    delay = self._on_error(limiter, e, attempt)
+                    if delay is None:
+                        raise
+                finally:
+                    limiter._release()
+                time.sleep(delay)
+                attempt += 1
+        except BaseException as e:
+            if coalesce_key is not None:
+                self._finish(key, coalesce_key, future, error=e)
+            raise
+        if coalesce_key is not None:
+            self._finish(key, coalesce_key, future, result=result)
+        return result
+
+    async def acall(self, key: str, fn: Callable, *args, cost: float = 1, priority: int = None, coalesce_key=None,
+                    **kwargs):
+        """
+        Async counterpart of `call`: awaits `fn(*args, **kwargs)`.
+        """
+        limiter = self.limiter(key)
+        if coalesce_key is not None:
+            future, leader = self._coalesce(key, coalesce_key)
+            if not leader:
+                limiter.coalesced += 1
+                return await asyncio.wrap_future(future)
+        priority = current_priority() if priority is None else priority
+        try:
+            attempt = 0
+            while True:
+                queued = time.perf_counter()
+                await limiter.aacquire(cost, priority)
+                started = time.perf_counter()
+                try:
+                    with span("provider.call", provider=limiter.name, attempt=attempt,
+                              queued_seconds=started - queued):
+                        result = await fn(*args, **kwargs)
+                    self._record(limiter, queued, started)
+                    break
+                except Exception as e:
+                    self._record(limiter, queued, started, e)
+                    delay = self._on_error(limiter, e, attempt)
+                    if delay is None:
+                        raise
+                finally:
+                    limiter._release()
+                await asyncio.sleep(delay)
+                attempt += 1
+        except BaseException as e:
+            if coalesce_key is not None:
+                self._finish(key, coalesce_key, future, error=e)
+            raise
+        if coalesce_key is not None:
+            self._finish(key, coalesce_key, future, result=result)
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {name: limiter.stats() for name, limiter in limiters.items()}
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> RequestScheduler:
+    """
+    The process-wide scheduler shared by every provider call, configured from settings.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            from app.core.config import settings
+
+            _scheduler = RequestScheduler(
+                limits=settings.PROVIDER_RATE_LIMITS,
+                max_retries=settings.PROVIDER_MAX_RETRIES,
+                base_delay=settings.PROVIDER_RETRY_BASE_DELAY,
+                max_delay=settings.PROVIDER_RETRY_MAX_DELAY,
+            )
+        return _scheduler
@@ -0,0 +1,197 @@
+# app/services/semantic_cache.py
+
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.logging_config import setup_logging
+from app.services.embedding_cache import normalize_text
+from app.services.vector_index import ExactIndex
+
+logger = setup_logging()
+
+
+@dataclass
+class CacheEntry:
+    question: str
+    answer: str
+    sources: List[dict]
+    embedding: np.ndarray
+    answer_seconds: float
+    namespace: str = ""
+    created_at: float = field(default_factory=time.time)
+    hits: int = 0
+
+
+class SemanticCache:
+    """
+    Caches RAG answers by the meaning of the question.
+
+    A question that was answered before, or whose embedding has a cosine similarity of at
+    least `threshold` with one that was, gets the stored answer and sources back instead of
+    another retrieval and LLM call. Exact repeats (after normalization) are found without
+    embedding the question at all. Entries expire after `ttl_seconds` and the least recently
+    used are evicted beyond `max_entries`.
+
+    Entries live in namespaces, e.g. one per retrieval mode, and only match questions of the
+    same namespace. The cache belongs to one corpus version: `ensure_version` drops every
+    entry when the corpus has been re-persisted or re-ingested, by this or another process.
+    """
+
+    def __init__(self, threshold: float = 0.95, ttl_seconds: float = 3600, max_entries: int = 1024):
+        if not 0 < threshold <= 1:
+            raise ValueError("threshold must be in (0, 1].")
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.version = None
+        self._entries: "OrderedDict[int, CacheEntry]" = OrderedDict()
+        self._by_question = {}
+        self._indexes = {}
+        self._ids = itertools.count()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.saved_seconds = 0.0
+
+    @property
+    def generation(self) -> int:
+        """
+        Changes on every invalidation; pass it back to `store` so answers computed against an
+        older corpus are not cached.
+        """
+        return self._generation
+
+    def ensure_version(self, version: Any):
+        """
+        Invalidates the cache when the corpus version differs from the one it was filled with.
+        """
+        with self._lock:
+            if version != self.version:
+                if self.version is not None:
+                    logger.info(f"Corpus changed, invalidating {len(self._entries)} cached answers")
+                self._clear()
+                self.version = version
+
+    def invalidate(self):
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        if self._entries:
+            self.invalidations += 1
+        self._entries.clear()
+        self._by_question.clear()
+        self._indexes = {}
+        self._generation += 1
+
+    def _expired(self, entry: CacheEntry, now: float) -> bool:
+        return self.ttl_seconds is not None and now - entry.created_at > self.ttl_seconds
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        key = (entry.namespace, normalize_text(entry.question))
+        if self._by_question.get(key) == entry_id:
+            del self._by_question[key]
+        self._indexes[entry.namespace].delete([entry_id])
+
+    def _hit(self, entry_id: int) -> CacheEntry:
+        entry = self._entries[entry_id]
+        self._entries.move_to_end(entry_id)
+        entry.hits += 1
+        self.saved_seconds += entry.answer_seconds
+        return entry
+
+    def lookup(self, question: str, embed: Callable[[str], List[float]],
+               namespace: str = "") -> Tuple[Optional[CacheEntry], Optional[np.ndarray]]:
+        """
+        Finds a cached answer for `question`.
+
+        Parameters:
+        - question (str): The incoming question.
+        - embed (callable): Embeds the question; only called when there is no exact match.
+        - namespace (str): The namespace to search.
+
+        Returns:
+        - tuple: The matching entry (or None) and the question embedding, if one was computed,
+          so a miss can reuse it for retrieval and `store`.
+        """
+        now = time.time()
+        with self._lock:
+            entry_id = self._by_question.get((namespace, normalize_text(question)))
+            if entry_id is not None:
+                if not self._expired(self._entries[entry_id], now):
+                    self.exact_hits += 1
+                    return self._hit(entry_id), None
+                self._remove(entry_id)
+                self.expirations += 1
+
+        embedding = np.asarray(embed(question), dtype=np.float32)
+        with self._lock:
+            while namespace in self._indexes and len(self._indexes[namespace]):
+                matches = self._indexes[namespace].search(embedding[None, :], k=1)[0]
+                if not matches or matches[0][1] < self.threshold:
+                    break
+                entry_id = matches[0][0]
+                if self._expired(self._entries[entry_id], now):
+                    self._remove(entry_id)
+                    self.expirations += 1
+                    continue
+                self.semantic_hits += 1
+                return self._hit(entry_id), embedding
+            self.misses += 1
+        return None, embedding
+
+    def store(self, question: str, embedding, answer: str, sources: List[dict],
+              answer_seconds: float, generation: int = None, namespace: str = ""):
+        """
+        Caches an answer, unless the cache was invalidated since `generation` was read.
+        """
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            key = (namespace, normalize_text(question))
+            if key in self._by_question:
+                self._remove(self._by_question[key])
+
+            entry_id = next(self._ids)
+            embedding = np.asarray(embedding, dtype=np.float32)
+            self._entries[entry_id] = CacheEntry(question, answer, sources, embedding, answer_seconds, namespace)
+            self._by_question[key] = entry_id
+            index = self._indexes.setdefault(namespace, ExactIndex(metric="cosine"))
+            index.add([entry_id], embedding[None, :])
+
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits
+            lookups = hits + self.misses
+            return {
+                "hits": hits,
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_ratio": hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "ttl_seconds": self.ttl_seconds,
+                "saved_seconds": self.saved_seconds,
+            }
@@ -0,0 +1,631 @@
+# app/services/vector_index.py
+
+import json
+import os
+import re
+import threading
+
+import numpy as np
+
+from app.core.logging_config import setup_logging
+from app.helpers.quantization import QUANTIZATIONS, get_quantizer
+from app.helpers.vector_math import METRICS, as_float32_matrix, higher_is_better, normalize_rows, pairwise_scores
+
+logger = setup_logging()
+
+INDEX_NAME_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class VectorIndex:
+    """
+    Base class of the in-process vector indexes.
+
+    Vectors live in a growable float32 matrix. Deletes only flip a tombstone, so rows keep
+    their position and searches skip dead rows, until more than `compact_ratio` of the rows
+    are dead and the live ones are compacted. Cosine indexes store normalized vectors and
+    score them with a plain dot product.
+
+    With a `quantization` other than "none", searches scan compressed codes instead
+    (float16, int8 with a per-vector scale, or packed sign bits compared by Hamming
+    distance). With `rescore` > 0 the float32 vectors are kept as well and the best
+    `k * rescore` candidates of the compressed scan are rescored exactly; with `rescore=0`
+    only the codes are kept and scores are approximate.
+    """
+
+    backend = None
+    block_size = 16384
+    compact_ratio = 0.25
+
+    def __init__(self, dim: int = None, metric: str = "cosine", quantization: str = "none", rescore: int = 4):
+        if metric not in METRICS:
+            raise ValueError(f"Invalid metric: {metric}. Pick one of {', '.join(METRICS)}.")
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Invalid quantization: {quantization}. Pick one of {', '.join(QUANTIZATIONS)}.")
+        if rescore < 0:
+            raise ValueError("rescore must be zero or a positive oversampling factor.")
+        self.dim = dim
+        self.metric = metric
+        self.quantization = quantization
+        self.rescore = rescore if quantization != "none" else 0
+        self.quantizer = None
+        self._vectors = np.empty((0, dim or 0), dtype=np.float32)
+        self._codes = None
+        self._aux = None
+        if dim is not None:
+            self._init_codes()
+        self._alive = np.empty(0, dtype=bool)
+        self._size = 0
+        self.ids = []
+        self.metadata = {}
+        self._row_by_id = {}
+        self._lock = threading.RLock()
+
+    # ------------------------------------------------------------------ storage
+
+    @property
+    def _score_metric(self) -> str:
+        return "dot" if self.metric == "cosine" else self.metric
+
+    @property
+    def _keeps_vectors(self) -> bool:
+        """
+        Whether the float32 vectors are stored: always without quantization, else for rescoring.
+        """
+        return self.quantizer is None or self.rescore > 0
+
+    def _init_codes(self):
+        self.quantizer = get_quantizer(self.quantization, self.dim)
+        if self.quantizer is not None:
+            self._codes = np.empty((0, *self.quantizer.code_shape), dtype=self.quantizer.code_dtype)
+            self._aux = np.empty((0, self.quantizer.aux_size), dtype=np.float32)
+
+    def _prepare(self, vectors) -> np.ndarray:
+        vectors = as_float32_matrix(vectors)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+            self._vectors = np.empty((0, self.dim), dtype=np.float32)
+            self._init_codes()
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Dimension mismatch: index has {self.dim} dimensions, got {vectors.shape[1]}.")
+        return normalize_rows(vectors) if self.metric == "cosine" else vectors
+
+    @staticmethod
+    def _grow(array: np.ndarray, capacity: int, size: int) -> np.ndarray:
+        grown = np.empty((capacity, *array.shape[1:]), dtype=array.dtype)
+        grown[:size] = array[:size]
+        return grown
+
+    def _reserve(self, extra: int):
+        needed = self._size + extra
+        if needed <= len(self._alive):
+            return
+        capacity = max(needed, 2 * len(self._alive), 1024)
+        if self._keeps_vectors:
+            self._vectors = self._grow(self._vectors, capacity, self._size)
+        if self.quantizer is not None:
+            self._codes = self._grow(self._codes, capacity, self._size)
+            self._aux = self._grow(self._aux, capacity, self._size)
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self._size] = self._alive[:self._size]
+        self._alive = alive
+
+    def _float_rows(self, rows) -> np.ndarray:
+        """
+        The float32 vectors of the given rows, reconstructed from the codes when not stored.
+        """
+        if self._keeps_vectors:
+            return np.asarray(self._vectors[rows])
+        return self.quantizer.decode(self._codes[rows], self._aux[rows])
+
+    def memory_bytes(self) -> int:
+        """
+        Bytes held in memory by the stored rows: float32 vectors (unless memory-mapped) and codes.
+        """
+        total = 0
+        if self._keeps_vectors and not isinstance(self._vectors, np.memmap):
+            total += self._size * self.dim * 4
+        if self.quantizer is not None:
+            total += self._size * self.quantizer.bytes_per_vector()
+        return total
+
+    def __len__(self) -> int:
+        return len(self._row_by_id)
+
+    @property
+    def size(self) -> int:
+        """
+        The number of stored rows, tombstoned ones included.
+        """
+        return self._size
+
+    def add(self, ids: list, vectors, metadata: list = None) -> int:
+        """
+        Adds vectors under the given ids. Existing ids are replaced.
+
+        Returns:
+        - int: The number of vectors added.
+        """
+        if len(ids) != len(set(ids)):
+            raise ValueError("Duplicate ids in a single add call.")
+        with self._lock:
+            vectors = self._prepare(vectors)
+            if len(ids) != len(vectors):
+                raise ValueError(f"Got {len(ids)} ids for {len(vectors)} vectors.")
+            self.delete([i for i in ids if i in self._row_by_id])
+
+            self._reserve(len(ids))
+            start = self._size
+            rows = np.arange(start, start + len(ids))
+            if self._keeps_vectors:
+                self._vectors[rows] = vectors
+            if self.quantizer is not None:
+                self._codes[rows], self._aux[rows] = self.quantizer.encode(vectors)
+            self._alive[rows] = True
+            self._size += len(ids)
+            for offset, item_id in enumerate(ids):
+                self.ids.append(item_id)
+                self._row_by_id[item_id] = start + offset
+                if metadata is not None and metadata[offset] is not None:
+                    self.metadata[item_id] = metadata[offset]
+            self._on_add(rows)
+            return len(ids)
+
+    def delete(self, ids: list) -> int:
+        """
+        Removes vectors by id. Unknown ids are ignored.
+
+        Returns:
+        - int: The number of vectors removed.
+        """
+        with self._lock:
+            removed = 0
+            for item_id in ids:
+                row = self._row_by_id.pop(item_id, None)
+                if row is None:
+                    continue
+                self._alive[row] = False
+                self.metadata.pop(item_id, None)
+                removed += 1
+            if self._size - len(self) > self.compact_ratio * self._size:
+                self._compact()
+            return removed
+
+    def _compact(self):
+        """
+        Drops the tombstoned rows, renumbering the live ones in order. Like adding, this copies
+        memory-mapped vectors into memory.
+        """
+        rows = np.flatnonzero(self._alive[:self._size])
+        if self._keeps_vectors:
+            self._vectors = self._vectors[rows]
+        if self.quantizer is not None:
+            self._codes = self._codes[rows]
+            self._aux = self._aux[rows]
+        self._alive = np.ones(len(rows), dtype=bool)
+        self._size = len(rows)
+        self.ids = [self.ids[row] for row in rows]
+        self._row_by_id = {item_id: row for row, item_id in enumerate(self.ids)}
+        self._on_compact(rows)
+
+    def search(self, queries, k: int = 10) -> list:
+        """
+        Finds the k nearest stored vectors for each query.
+
+        Returns:
+        - list: For each query, a list of (id, score) tuples, best first.
+        """
+        if k <= 0:
+            raise ValueError("k must be a positive integer.")
+        with self._lock:
+            if not len(self):
+                return [[] for _ in range(len(as_float32_matrix(queries)))]
+            queries = self._prepare(queries)
+            rows, scores = self._search(queries, k)
+            return [
+                [(self.ids[row], float(score)) for row, score in zip(row_rows, row_scores) if row >= 0]
+                for row_rows, row_scores in zip(rows, scores)
+            ]
+
+    # ------------------------------------------------------------ backend hooks
+
+    def _on_add(self, rows: np.ndarray):
+        pass
+
+    def _on_compact(self, rows: np.ndarray):
+        """
+        Called after compaction with the old row numbers of the rows kept, in their new order.
+        """
+        pass
+
+    def _search(self, queries: np.ndarray, k: int):
+        raise NotImplementedError
+
+    def _params(self) -> dict:
+        return {}
+
+    def _state(self) -> dict:
+        return {}
+
+    def _save_arrays(self, directory: str):
+        pass
+
+    def _restore(self, state: dict, directory: str):
+        pass
+
+    def _score_rows(self, queries: np.ndarray, rows: np.ndarray, k: int):
+        """
+        Top-k of `queries` against the given rows. Exact without quantization; otherwise the
+        codes are scanned and, when rescoring, the best `k * rescore` are rescored exactly.
+        Returns row numbers and scores padded with -1 / inf when fewer than k rows exist.
+        """
+        if self.quantizer is None:
+            exact = lambda block: pairwise_scores(queries, self._vectors[block], metric=self._score_metric)
+            return self._scan_rows(queries, rows, k, exact, higher_is_better(self.metric))
+
+        largest = self.quantizer.higher_is_better(self.metric)
+        scan = lambda block: self.quantizer.scores(queries, self._codes[block], self._aux[block], self._score_metric)
+        if not self.rescore:
+            return self._scan_rows(queries, rows, k, scan, largest)
+
+        candidates, _ = self._scan_rows(queries, rows, k * self.rescore, scan, largest)
+        largest = higher_is_better(self.metric)
+        best_rows = np.full((len(queries), k), -1, dtype=np.int64)
+        best_scores = np.full((len(queries), k), -np.inf if largest else np.inf, dtype=np.float32)
+        for i, query_candidates in enumerate(candidates):
+            query_candidates = query_candidates[query_candidates >= 0]
+            if not len(query_candidates):
+                continue
+            # Candidate rows are sorted so a memory-mapped matrix is read in file order
+            query_candidates = np.sort(query_candidates)
+            scores = pairwise_scores(queries[i:i + 1], self._vectors[query_candidates], metric=self._score_metric)[0]
+            order = np.argsort(-scores if largest else scores, kind="stable")[:k]
+            best_rows[i, :len(order)] = query_candidates[order]
+            best_scores[i, :len(order)] = scores[order]
+        return best_rows, best_scores
+
+    def _scan_rows(self, queries: np.ndarray, rows: np.ndarray, k: int, score_block, largest: bool):
+        """
+        Top-k of `score_block(block_rows)` over the given rows, in blocks so memory stays bounded.
+        """
+        worst = -np.inf if largest else np.inf
+        best_rows = np.full((len(queries), k), -1, dtype=np.int64)
+        best_scores = np.full((len(queries), k), worst, dtype=np.float32)
+
+        for start in range(0, len(rows), self.block_size):
+            block = rows[start:start + self.block_size]
+            scores = score_block(block)
+            merged_scores = np.concatenate([best_scores, scores], axis=1)
+            merged_rows = np.concatenate([best_rows, np.broadcast_to(block, scores.shape)], axis=1)
+            ranked = -merged_scores if largest else merged_scores
+            keep = np.argpartition(ranked, k - 1, axis=1)[:, :k]
+            best_scores = np.take_along_axis(merged_scores, keep, axis=1)
+            best_rows = np.take_along_axis(merged_rows, keep, axis=1)
+
+        order = np.argsort(-best_scores if largest else best_scores, axis=1, kind="stable")
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_rows[~np.isfinite(best_scores)] = -1
+        return best_rows, best_scores
+
+    # -------------------------------------------------------------- persistence
+
+    def info(self) -> dict:
+        return {
+            "backend": self.backend,
+            "metric": self.metric,
+            "dim": self.dim,
+            "size": len(self),
+            "quantization": self.quantization,
+            "rescore": self.rescore,
+            "memory_bytes": self.memory_bytes(),
+            "params": self._params(),
+        }
+
+    def save(self, directory: str):
+        """
+        Saves the index to a directory as vectors.npy plus a JSON manifest.
+        Quantized indexes also save codes.npy (and aux.npy for int8), and only keep
+        vectors.npy when they rescore. Tombstoned rows are compacted away.
+        """
+        with self._lock:
+            os.makedirs(directory, exist_ok=True)
+            live_ids = list(self._row_by_id)
+            rows = np.fromiter((self._row_by_id[i] for i in live_ids), dtype=np.int64, count=len(live_ids))
+            for name in ("vectors.npy", "codes.npy", "aux.npy"):
+                if os.path.exists(os.path.join(directory, name)):
+                    os.remove(os.path.join(directory, name))
+            if self._keeps_vectors:
+                np.save(os.path.join(directory, "vectors.npy"), self._vectors[rows])
+            if self.quantizer is not None:
+                np.save(os.path.join(directory, "codes.npy"), self._codes[rows])
+                if self.quantizer.aux_size:
+                    np.save(os.path.join(directory, "aux.npy"), self._aux[rows])
+            self._save_arrays(directory)
+            manifest = {
+                "backend": self.backend,
+                "metric": self.metric,
+                "dim": self.dim,
+                "quantization": self.quantization,
+                "rescore": self.rescore,
+                "params": self._params(),
+                "ids": live_ids,
+                "metadata": {str(i): self.metadata[i] for i in live_ids if i in self.metadata},
+                "state": self._state(),
+            }
+            with open(os.path.join(directory, "index.json"), "w") as f:
+                json.dump(manifest, f)
+            logger.info(f"Saved {self.backend} index with {len(live_ids)} vectors to {directory}")
+
+    @staticmethod
+    def load(directory: str) -> "VectorIndex":
+        """
+        Loads an index saved with `save`, whatever its backend.
+
+        The float32 vectors of a quantized index are memory-mapped rather than read, since
+        only rescoring touches them; adding vectors later copies them into memory.
+        """
+        with open(os.path.join(directory, "index.json")) as f:
+            manifest = json.load(f)
+        index = create_index(
+            manifest["backend"], metric=manifest["metric"], dim=manifest["dim"],
+            quantization=manifest.get("quantization", "none"), rescore=manifest.get("rescore", 0),
+            **manifest["params"],
+        )
+        ids = manifest["ids"]
+        if ids and index.quantizer is not None:
+            index._codes = np.load(os.path.join(directory, "codes.npy"))
+            index._aux = np.load(os.path.join(directory, "aux.npy")) if index.quantizer.aux_size else \
+                np.empty((len(ids), 0), dtype=np.float32)
+            if index._keeps_vectors:
+                index._vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r")
+            index._alive = np.ones(len(ids), dtype=bool)
+        elif ids:
+            # Stored vectors are already normalized for cosine, so bypass _prepare
+            index._reserve(len(ids))
+            index._vectors[:len(ids)] = np.load(os.path.join(directory, "vectors.npy"))
+        if ids:
+            index._alive[:len(ids)] = True
+            index._size = len(ids)
+            index.ids = list(ids)
+            index._row_by_id = {item_id: row for row, item_id in enumerate(ids)}
+        index.metadata = {i: manifest["metadata"][str(i)] for i in ids if str(i) in manifest["metadata"]}
+        index._restore(manifest["state"], directory)
+        logger.info(f"Loaded {index.backend} index with {len(index)} vectors from {directory}")
+        return index
+
+
+class ExactIndex(VectorIndex):
+    """
+    Brute-force exact search: blocked float32 matrix multiplies over all live rows.
+    """
+
+    backend = "exact"
+
+    def _search(self, queries: np.ndarray, k: int):
+        rows = np.flatnonzero(self._alive[:self._size])
+        return self._score_rows(queries, rows, k)
+
+
+class IVFIndex(VectorIndex):
+    """
+    Inverted-file approximate search.
+
+    A k-means coarse quantizer splits the vectors into `nlist` cells; a query is only scored
+    against the rows of its `nprobe` closest cells. Until enough vectors are present to train
+    the quantizer, searches fall back to exact scoring.
+
+    Added rows are appended to the inverted list of their cell. Deleted rows stay listed and
+    are skipped by searches through their tombstone until the index is compacted, which
+    rebuilds the lists.
+    """
+
+    backend = "ivf"
+
+    def __init__(self, dim: int = None, metric: str = "cosine", nlist: int = 256, nprobe: int = 8,
+                 train_iterations: int = 10, seed: int = 0, **kwargs):
+        super().__init__(dim=dim, metric=metric, **kwargs)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_iterations = train_iterations
+        self.seed = seed
+        self.centroids = None
+        self._assignments = np.empty(0, dtype=np.int64)
+        self._lists = None
+        self._list_sizes = None
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def _params(self) -> dict:
+        return {"nlist": self.nlist, "nprobe": self.nprobe, "train_iterations": self.train_iterations, "seed": self.seed}
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        assignments = np.empty(len(vectors), dtype=np.int64)
+        largest = higher_is_better(self.metric)
+        for start in range(0, len(vectors), self.block_size):
+            scores = pairwise_scores(vectors[start:start + self.block_size], self.centroids, metric=self._score_metric)
+            assignments[start:start + self.block_size] = scores.argmax(axis=1) if largest else scores.argmin(axis=1)
+        return assignments
+
+    def train(self):
+        """
+        Fits the coarse quantizer on the live vectors and rebuilds the inverted lists.
+        """
+        with self._lock:
+            rows = np.flatnonzero(self._alive[:self._size])
+            nlist = min(self.nlist, len(rows))
+            if nlist == 0:
+                return
+            rng = np.random.default_rng(self.seed)
+            sample = self._float_rows(np.sort(rng.choice(rows, size=min(len(rows), nlist * 64), replace=False)))
+            centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+
+            for _ in range(self.train_iterations):
+                self.centroids = centroids
+                labels = self._assign(sample)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, labels, sample)
+                counts = np.bincount(labels, minlength=nlist)
+                empty = counts == 0
+                centroids = sums / np.maximum(counts, 1)[:, np.newaxis]
+                # Re-seed empty cells from random sample points
+                centroids[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+                if self.metric == "cosine":
+                    centroids = normalize_rows(centroids)
+
+            self._set_centroids(centroids)
+            logger.info(f"Trained IVF quantizer with {nlist} cells on {len(sample)} vectors")
+
+    def _set_centroids(self, centroids: np.ndarray):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self._assignments = np.full(len(self._alive), -1, dtype=np.int64)
+        self._assignments[:self._size] = self._assign(self._float_rows(slice(0, self._size)))
+        self._rebuild_lists()
+
+    def _rebuild_lists(self):
+        rows = np.flatnonzero(self._alive[:self._size])
+        assignments = self._assignments[rows]
+        order = np.argsort(assignments, kind="stable")
+        bounds = np.searchsorted(assignments[order], np.arange(len(self.centroids) + 1))
+        sorted_rows = rows[order]
+        self._lists = [sorted_rows[bounds[c]:bounds[c + 1]].copy() for c in range(len(self.centroids))]
+        self._list_sizes = np.diff(bounds)
+
+    def _append_to_lists(self, rows: np.ndarray):
+        """
+        Appends rows to the lists of their cells. Lists grow by doubling, so this stays
+        proportional to the number of rows added.
+        """
+        assignments = self._assignments[rows]
+        order = np.argsort(assignments, kind="stable")
+        cells, starts = np.unique(assignments[order], return_index=True)
+        for cell, cell_rows in zip(cells, np.split(rows[order], starts[1:])):
+            size = self._list_sizes[cell]
+            needed = size + len(cell_rows)
+            if needed > len(self._lists[cell]):
+                self._lists[cell] = self._grow(self._lists[cell], max(needed, 2 * len(self._lists[cell]), 16), size)
+            self._lists[cell][size:needed] = cell_rows
+            self._list_sizes[cell] = needed
+
+    def _on_add(self, rows: np.ndarray):
+        if not self.is_trained:
+            if len(self) >= self.nlist * 39:
+                self.train()
+            return
+        if len(self._assignments) < len(self._alive):
+            grown = np.full(len(self._alive), -1, dtype=np.int64)
+            grown[:len(self._assignments)] = self._assignments
+            self._assignments = grown
+        self._assignments[rows] = self._assign(self._float_rows(rows))
+        self._append_to_lists(rows)
+
+    def _on_compact(self, rows: np.ndarray):
+        if self.is_trained:
+            self._assignments = self._assignments[rows]
+            self._rebuild_lists()
+
+    def _search(self, queries: np.ndarray, k: int):
+        if not self.is_trained:
+            return self._score_rows(queries, np.flatnonzero(self._alive[:self._size]), k)
+
+        largest = higher_is_better(self.metric)
+        centroid_scores = pairwise_scores(queries, self.centroids, metric=self._score_metric)
+        nprobe = min(self.nprobe, len(self.centroids))
+        ranked = -centroid_scores if largest else centroid_scores
+        probes = np.argpartition(ranked, nprobe - 1, axis=1)[:, :nprobe] if nprobe < len(self.centroids) else \
+            np.broadcast_to(np.arange(len(self.centroids)), centroid_scores.shape)
+
+        all_rows = np.empty((len(queries), k), dtype=np.int64)
+        all_scores = np.empty((len(queries), k), dtype=np.float32)
+        for i, query_probes in enumerate(probes):
+            rows = np.concatenate([self._lists[c][:self._list_sizes[c]] for c in query_probes])
+            rows = rows[self._alive[rows]]
+            query_rows, query_scores = self._score_rows(queries[i:i + 1], rows, k)
+            all_rows[i] = query_rows[0]
+            all_scores[i] = query_scores[0]
+        return all_rows, all_scores
+
+    def _state(self) -> dict:
+        return {"trained": self.is_trained}
+
+    def _save_arrays(self, directory: str):
+        if self.is_trained:
+            np.save(os.path.join(directory, "centroids.npy"), self.centroids)
+
+    def _restore(self, state: dict, directory: str):
+        if state.get("trained"):
+            self._set_centroids(np.load(os.path.join(directory, "centroids.npy")))
+
+
+BACKENDS = {
+    ExactIndex.backend: ExactIndex,
+    IVFIndex.backend: IVFIndex,
+}
+
+
+def create_index(backend: str = "exact", **kwargs) -> VectorIndex:
+    """
+    Creates an empty index for the given backend ("exact" or "ivf").
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Invalid backend: {backend}. Pick one of {', '.join(BACKENDS)}.")
+    return BACKENDS[backend](**kwargs)
+
+
+class VectorIndexManager:
+    """
+    Keeps named indexes in memory and saves/loads them under `persist_dir/<name>`.
+    """
+
+    def __init__(self, persist_dir: str):
+        self.persist_dir = persist_dir
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _check_name(name: str):
+        if not INDEX_NAME_RE.match(name):
+            raise ValueError("Index names may only contain letters, digits, '-' and '_' (max 64 characters).")
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.persist_dir, name)
+
+    def create(self, name: str, backend: str = "exact", **kwargs) -> VectorIndex:
+        self._check_name(name)
+        with self._lock:
+            if name in self._indexes:
+                raise ValueError(f"Index '{name}' already exists.")
+            index = create_index(backend, **kwargs)
+            self._indexes[name] = index
+            return index
+
+    def get(self, name: str) -> VectorIndex:
+        with self._lock:
+            if name not in self._indexes:
+                raise KeyError(f"Index '{name}' not found.")
+            return self._indexes[name]
+
+    def drop(self, name: str):
+        with self._lock:
+            if self._indexes.pop(name, None) is None:
+                raise KeyError(f"Index '{name}' not found.")
+
+    def list(self) -> dict:
+        with self._lock:
+            return {name: index.info() for name, index in self._indexes.items()}
+
+    def save(self, name: str) -> str:
+        path = self.path(name)
+        self.get(name).save(path)
+        return path
+
+    def load(self, name: str) -> VectorIndex:
+        self._check_name(name)
+        path = self.path(name)
+        if not os.path.exists(os.path.join(path, "index.json")):
+            raise KeyError(f"No saved index '{name}' in {self.persist_dir}.")
+        index = VectorIndex.load(path)
+        with self._lock:
+            self._indexes[name] = index
+        return index
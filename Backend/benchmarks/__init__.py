@@ -0,0 +1 @@
+# Offline benchmarks, run from the Backend directory, e.g. `python -m benchmarks.vector_index`
@@ -0,0 +1,131 @@
+"""
+Compares loading a JSON docstore with opening a binary store as the corpus grows.
+
+For each size a synthetic corpus is written in both formats, then each measurement runs in a
+fresh interpreter and reports wall time and the peak RSS added. "load" opens the store and
+materializes 10 nodes; for the binary store "search" then runs one exact top-10 scan over the
+memory-mapped embeddings, which reads every embedding page once (file-backed, reclaimable):
+
+    python -m benchmarks.binary_store --sizes 1000 10000 100000
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+from app.services.binary_store import BinaryStoreWriter, migrate
+
+PROBE = r"""
+import json, sys, time
+import numpy as np
+# Import everything up front so only loading is timed
+from app.helpers.utils import get_documents_from_docstore
+from app.services.binary_store import BinaryStore
+from llama_index.core.storage.docstore import SimpleDocumentStore
+from llama_index.core.storage.docstore.utils import json_to_doc
+
+def peak_rss_mb():
+    # VmHWM is reset on exec, unlike ru_maxrss which keeps the parent's peak
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+
+baseline = peak_rss_mb()
+start = time.perf_counter()
+if sys.argv[1] == "json":
+    documents = get_documents_from_docstore(sys.argv[2])
+    touched = [documents[i].text for i in range(10)]
+else:
+    store = BinaryStore(sys.argv[2])
+    rng = np.random.default_rng(0)
+    touched = [store.get_row(int(i)).text for i in rng.integers(0, len(store), 10)]
+results = [{"step": "load", "seconds": time.perf_counter() - start, "max_rss_mb": peak_rss_mb() - baseline}]
+if sys.argv[1] == "binary":
+    start = time.perf_counter()
+    store.search(np.asarray(store.embeddings[0]), k=10)
+    results.append({"step": "search", "seconds": time.perf_counter() - start, "max_rss_mb": peak_rss_mb() - baseline})
+print(json.dumps(results))
+"""
+
+
+def write_json_corpus(path: str, n: int, dim: int, seed: int = 0):
+    """
+    Writes a docstore.json of n page documents, plus their embeddings in default__vector_store.json.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(path, exist_ok=True)
+    data, embeddings = {}, {}
+    for i in range(n):
+        node_id = f"doc-{i}"
+        data[node_id] = {
+            "__type__": "4",
+            "__data__": {
+                "id_": node_id,
+                "embedding": None,
+                "metadata": {"page_number": i % 300, "file_name": f"paper-{i // 300}.pdf", "title": "Synthetic", "author": "Unknown"},
+                "excluded_embed_metadata_keys": [],
+                "excluded_llm_metadata_keys": [],
+                "relationships": {},
+                "text": f"Synthetic page {i}. " + "lorem ipsum dolor sit amet " * 40,
+                "mimetype": "text/plain",
+                "start_char_idx": None,
+                "end_char_idx": None,
+                "text_template": "{metadata_str}\n\n{content}",
+                "metadata_template": "{key}: {value}",
+                "metadata_seperator": "\n",
+                "class_name": "Document",
+            },
+        }
+        embeddings[node_id] = rng.normal(size=dim).astype(np.float32).round(6).tolist()
+    with open(os.path.join(path, "docstore.json"), "w") as f:
+        json.dump({"docstore/data": data, "docstore/metadata": {k: {"doc_hash": k} for k in data}}, f)
+    with open(os.path.join(path, "default__vector_store.json"), "w") as f:
+        json.dump({"embedding_dict": embeddings, "text_id_to_ref_doc_id": {}, "metadata_dict": {}}, f)
+
+
+def measure(fmt: str, path: str) -> list:
+    result = subprocess.run([sys.executable, "-c", PROBE, fmt, path], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr[-2000:])
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def report(n: int, fmt: str, results: list):
+    for result in results:
+        print(f"{n:>10} {fmt:>7} {result['step']:>7} {result['seconds']:>9.3f} {result['max_rss_mb']:>13.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--skip-json-above", type=int, default=100000,
+                        help="Only build the binary store beyond this size (JSON gets too large)")
+    args = parser.parse_args()
+
+    print(f"{'nodes':>10} {'format':>7} {'step':>7} {'seconds':>9} {'+peak RSS MB':>13}")
+    with tempfile.TemporaryDirectory() as root:
+        for n in args.sizes:
+            json_dir = os.path.join(root, f"json-{n}")
+            binary_dir = os.path.join(root, f"binary-{n}")
+            if n <= args.skip_json_above:
+                write_json_corpus(json_dir, n, args.dim)
+                migrate(json_dir, binary_dir)
+                report(n, "json", measure("json", json_dir))
+            else:
+                rng = np.random.default_rng(0)
+                with BinaryStoreWriter(binary_dir) as writer:
+                    for i in range(n):
+                        writer.add(f"doc-{i}", "4", {"id_": f"doc-{i}", "text": f"Synthetic page {i}.", "metadata": {}},
+                                   embedding=rng.normal(size=args.dim).astype(np.float32))
+            report(n, "binary", measure("binary", binary_dir))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Measures micro-batching of single-text embed requests against a provider quota.
+
+`--clients` concurrent clients each send one short text at a time, for `--duration` seconds,
+to a simulated provider that takes `--latency` seconds per call plus `--per-text` seconds per
+text and allows `--rpm` calls per minute (enforced by the request scheduler, as in the API).
+Without batching every request is one provider call; with batching the requests of each
+model wait up to `--max-delay-ms` for up to `--batch-size` texts and share one call:
+
+    python -m benchmarks.micro_batching --clients 200 --rpm 600
+    python -m benchmarks.micro_batching --clients 8 --max-delay-ms 2 5 10
+"""
+
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+from app.services.micro_batcher import MicroBatcher
+from app.services.scheduler import RequestScheduler
+
+
+class SimulatedProvider:
+    def __init__(self, rpm: float, latency: float, per_text: float):
+        self.scheduler = RequestScheduler(limits={"stub": {"rpm": rpm, "burst_seconds": 1}})
+        self.latency = latency
+        self.per_text = per_text
+        self.calls = 0
+
+    async def _embed(self, texts):
+        self.calls += 1
+        await asyncio.sleep(self.latency + self.per_text * len(texts))
+        return [[float(len(text))] * 8 for text in texts]
+
+    async def embed_batch(self, texts):
+        return await self.scheduler.acall("stub", self._embed, texts)
+
+
+async def run(args, max_delay_ms: float) -> dict:
+    provider = SimulatedProvider(args.rpm, args.latency, args.per_text)
+    batcher = MicroBatcher("stub", provider.embed_batch, max_batch_size=args.batch_size, max_delay=max_delay_ms / 1000.0)
+    latencies = []
+    deadline = time.perf_counter() + args.duration
+
+    async def client(number):
+        sent = 0
+        while time.perf_counter() < deadline:
+            text = f"client {number} text {sent}"
+            start = time.perf_counter()
+            if max_delay_ms > 0:
+                await batcher.submit(text)
+            else:
+                await provider.embed_batch([text])
+            latencies.append(time.perf_counter() - start)
+            sent += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(number) for number in range(args.clients)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": len(latencies),
+        "elapsed": elapsed,
+        "calls": provider.calls,
+        "latencies": latencies,
+        "batcher": batcher.stats() if max_delay_ms > 0 else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--rpm", type=float, default=600, help="Provider calls allowed per minute")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds per provider call")
+    parser.add_argument("--per-text", type=float, default=0.0005, help="Extra seconds per text in a call")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--max-delay-ms", type=float, nargs="+", default=[5.0])
+    args = parser.parse_args()
+
+    print(f"{args.clients} clients, quota {args.rpm:.0f} calls/min, {args.latency * 1000:.0f} ms per call")
+    print(f"{'delay ms':>8} {'req/s':>9} {'calls':>7} {'req/call':>8} {'fill':>6} {'p50 ms':>8} {'p95 ms':>8} {'added ms':>8}")
+    for max_delay_ms in [0.0, *args.max_delay_ms]:
+        result = asyncio.run(run(args, max_delay_ms))
+        p50, p95 = np.percentile(result["latencies"], [50, 95]) * 1000
+        stats = result["batcher"]
+        fill = f"{stats['mean_fill']:>6.0%}" if stats else f"{'-':>6}"
+        added = f"{stats['mean_added_latency_seconds'] * 1000:>8.1f}" if stats else f"{'-':>8}"
+        print(
+            f"{max_delay_ms if max_delay_ms > 0 else 'off':>8} {result['requests'] / result['elapsed']:>9.1f} "
+            f"{result['calls']:>7} {result['requests'] / max(result['calls'], 1):>8.1f} {fill} "
+            f"{p50:>8.1f} {p95:>8.1f} {added}"
+        )
+
+
+if __name__ == "__main__":
+    main()
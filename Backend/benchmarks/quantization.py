@@ -0,0 +1,116 @@
+"""
+Compares the quantization modes of the local vector index on a real corpus.
+
+By default the corpus is the persisted sample docstore (the BERT/GPT PDFs) cut into
+overlapping word windows and embedded with an alias from EMBEDDING_MODELS ("local" needs no
+API key). Queries are windows offset from the indexed ones. `--embeddings` loads a saved
+(n, dim) .npy matrix instead, e.g. provider embeddings of a larger corpus, and holds out
+`--queries` of its rows. For every mode it reports memory per vector, query throughput and
+recall@k against exact float32 search, with and without rescoring:
+
+    python -m benchmarks.quantization --model local --k 10
+    python -m benchmarks.quantization --embeddings corpus.npy --rescore 4 8
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from app.helpers.vector_math import higher_is_better, pairwise_scores
+from app.services.vector_index import create_index
+
+MODES = ("none", "float16", "int8", "binary")
+
+
+def docstore_windows(persist_dir: str, size: int, stride: int, offset: int = 0) -> list:
+    from app.helpers.utils import get_documents_from_docstore
+
+    windows = []
+    for document in get_documents_from_docstore(persist_dir):
+        words = document.text.split()
+        for start in range(offset, max(len(words) - size, 0) + 1, stride):
+            windows.append(" ".join(words[start:start + size]))
+    return windows
+
+
+def embed_texts(texts: list, model: str) -> np.ndarray:
+    from app.core.config import settings
+    from app.services.embedding_providers import EmbeddingProviderRegistry
+
+    embed_model = EmbeddingProviderRegistry(settings.EMBEDDING_MODELS).get(model)
+    return np.asarray(embed_model.get_text_embedding_batch(texts), dtype=np.float32)
+
+
+def load_corpus(args):
+    if args.embeddings:
+        vectors = np.load(args.embeddings).astype(np.float32)
+        rng = np.random.default_rng(0)
+        held_out = np.zeros(len(vectors), dtype=bool)
+        held_out[rng.choice(len(vectors), size=args.queries, replace=False)] = True
+        return vectors[~held_out], vectors[held_out], args.embeddings
+
+    from app.core.config import settings
+
+    # Repeated windows (running headers, references) would make recall depend on tie-breaking
+    texts = list(dict.fromkeys(docstore_windows(settings.PERSIST_DIR, args.window, args.stride)))
+    query_texts = docstore_windows(settings.PERSIST_DIR, args.window, args.stride, offset=args.stride // 2)
+    rng = np.random.default_rng(0)
+    query_texts = [query_texts[i] for i in rng.choice(len(query_texts), size=min(args.queries, len(query_texts)), replace=False)]
+    return embed_texts(texts, args.model), embed_texts(query_texts, args.model), f"{settings.PERSIST_DIR} ({args.model})"
+
+
+def recall_at_k(results: list, truth: list, data: np.ndarray, queries: np.ndarray, metric: str) -> float:
+    """
+    Share of the exact top-k found. A result tied in exact score with the k-th true neighbour
+    counts as a hit, so ties broken differently are not reported as recall loss.
+    """
+    largest = higher_is_better(metric)
+    hits = 0
+    for query, result, true in zip(queries, results, truth):
+        rows = [int(i) for i, _ in result]
+        exact = pairwise_scores(query[np.newaxis, :], data[rows], metric=metric)[0] if rows else np.empty(0)
+        kth = true[-1][1]
+        hits += int(np.sum(exact >= kth - 1e-5 if largest else exact <= kth + 1e-5))
+    return hits / sum(len(t) for t in truth)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="local", help="EMBEDDING_MODELS alias used to embed the docstore")
+    parser.add_argument("--embeddings", help="Saved (n, dim) float matrix to use instead of the docstore")
+    parser.add_argument("--window", type=int, default=32, help="Words per docstore window")
+    parser.add_argument("--stride", type=int, default=8, help="Words between docstore windows")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--metric", default="cosine", choices=["cosine", "dot", "l2"])
+    parser.add_argument("--rescore", type=int, nargs="+", default=[4])
+    parser.add_argument("--repeat", type=int, default=3, help="Timed search passes, the best is reported")
+    args = parser.parse_args()
+
+    data, queries, source = load_corpus(args)
+    ids = [str(i) for i in range(len(data))]
+    print(f"corpus: {source}, {len(data)} vectors x {data.shape[1]} dims, {len(queries)} queries, k={args.k}")
+
+    truth = None
+    print(f"{'mode':>8} {'rescore':>8} {'bytes/vec':>10} {'scan B/vec':>11} {'queries/s':>11} {'recall@' + str(args.k):>10}")
+    for mode in MODES:
+        for rescore in ([0] if mode == "none" else [0, *args.rescore]):
+            index = create_index("exact", metric=args.metric, quantization=mode, rescore=rescore)
+            index.add(ids, data)
+            elapsed = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                results = index.search(queries, k=args.k)
+                elapsed = min(elapsed, time.perf_counter() - start)
+            if truth is None:
+                truth = results
+            scan_bytes = index.quantizer.bytes_per_vector() if index.quantizer is not None else 4 * index.dim
+            print(
+                f"{mode:>8} {rescore:>8} {index.memory_bytes() / len(index):>10.0f} {scan_bytes:>11} "
+                f"{len(queries) / elapsed:>11,.0f} {recall_at_k(results, truth, data, queries, args.metric):>10.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Runs the RAG path under the evaluation runner, as a quality run or a load test.
+
+Questions come from `--questions` (JSON Lines with a "question" field, or one question per
+line) or, by default, are made from sentences of the persisted docstore. Every question is
+answered by `NaiveIndexer.evaluate_query` with the configured LLM and embedding providers, so
+set RAG_LLM_PROVIDER=fake RAG_EMBED_PROVIDER=hash QDRANT_URL=:memory: (and FAKE_LLM_TOKEN_DELAY
+for a slower LLM) to run offline; `--ingest` fills an empty vector store first. For each
+`--concurrency` level it reports throughput, p50/p95/p99 latency, per-stage latency, tokens
+and cost:
+
+    python -m benchmarks.rag_eval --ingest --questions 200 --concurrency 1 4 16
+    python -m benchmarks.rag_eval --questions eval.jsonl --checkpoint runs/eval.jsonl --concurrency 8
+
+With `--checkpoint`, answers are saved as they arrive and an interrupted run picks up where it
+stopped; with several concurrency levels each level gets its own checkpoint file.
+"""
+
+import argparse
+import json
+import os
+import random
+
+
+def load_questions(path: str) -> list:
+    questions = []
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            questions.append(json.loads(line)["question"] if line.startswith("{") else line)
+    return questions
+
+
+def docstore_questions(persist_dir: str, n: int, seed: int = 0) -> list:
+    from app.helpers.utils import get_documents_from_docstore
+
+    sentences = []
+    for document in get_documents_from_docstore(persist_dir):
+        sentences.extend(
+            sentence.strip() for sentence in document.text.split(".") if 6 <= len(sentence.split()) <= 30
+        )
+    sentences = list(dict.fromkeys(sentences))
+    rng = random.Random(seed)
+    return [f"What does the paper say about: {sentence}?" for sentence in rng.sample(sentences, min(n, len(sentences)))]
+
+
+def format_seconds(value) -> str:
+    return f"{value:8.3f}" if value is not None else f"{'-':>8}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", default="100", help="A questions file, or how many to make from the docstore")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--retrieval-mode", choices=["dense", "sparse", "hybrid"])
+    parser.add_argument("--requests-per-minute", type=float, help="Hold each run under this rate")
+    parser.add_argument("--prompt-cost", type=float, default=0.0, help="Cost per 1000 prompt tokens")
+    parser.add_argument("--completion-cost", type=float, default=0.0, help="Cost per 1000 completion tokens")
+    parser.add_argument("--max-cost", type=float, help="Stop submitting questions once this much was spent")
+    parser.add_argument("--checkpoint", help="JSON Lines file to save answers to and resume from")
+    parser.add_argument("--ingest", action="store_true", help="Ingest the persisted docstore first")
+    args = parser.parse_args()
+
+    from app.core.config import settings
+    from app.services.evaluation import EvaluationRunner
+    from app.services.indexer import NaiveIndexer
+
+    if os.path.exists(args.questions):
+        questions = load_questions(args.questions)
+    else:
+        questions = docstore_questions(settings.PERSIST_DIR, int(args.questions))
+
+    indexer = NaiveIndexer()
+    if args.ingest:
+        indexer.ingest()
+
+    def answer(question):
+        return indexer.evaluate_query(question, retrieval_mode=args.retrieval_mode)
+
+    # Build the models and the query engine outside the timed runs
+    answer(questions[0])
+
+    print(f"{len(questions)} questions, {settings.RAG_LLM_PROVIDER} LLM, {settings.RAG_EMBED_PROVIDER} embeddings, "
+          f"{args.retrieval_mode or settings.RAG_RETRIEVAL_MODE} retrieval")
+    print(f"{'conc':>5} {'ok':>6} {'err':>5} {'q/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} "
+          f"{'retr p50':>8} {'synt p50':>8} {'tokens':>9} {'cost':>8}")
+    for concurrency in args.concurrency:
+        checkpoint = args.checkpoint
+        if checkpoint and len(args.concurrency) > 1:
+            root, ext = os.path.splitext(checkpoint)
+            checkpoint = f"{root}.c{concurrency}{ext}"
+        runner = EvaluationRunner(
+            answer, concurrency=concurrency, checkpoint_path=checkpoint,
+            requests_per_minute=args.requests_per_minute, prompt_cost_per_1k=args.prompt_cost,
+            completion_cost_per_1k=args.completion_cost, max_cost=args.max_cost, progress=False,
+        )
+        summary = runner.run(questions).summary()
+        latency = summary["latency"]
+        throughput = summary["throughput_qps"]
+        print(
+            f"{concurrency:>5} {summary['answered']:>6} {summary['errors']:>5} "
+            f"{throughput if throughput is not None else float('nan'):>8.2f} "
+            f"{format_seconds(latency['p50'])} {format_seconds(latency['p95'])} {format_seconds(latency['p99'])} "
+            f"{format_seconds(summary['retrieve_latency']['p50'])} {format_seconds(summary['synthesize_latency']['p50'])} "
+            f"{summary['prompt_tokens'] + summary['completion_tokens']:>9} {summary['cost']:>8.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Drives the request scheduler against a local stub provider that enforces a quota.
+
+The stub answers POST /embed after `--latency` seconds. Requests beyond its token bucket
+(`--limit` requests per minute, `--burst` seconds of capacity) get a 429 with Retry-After,
+and `--error-rate` of the others a 503. The same workload runs twice:
+
+- naive: at most `--concurrency` requests in flight, retried after a short fixed sleep
+  (the live endpoints had no retries at all);
+- scheduled: through a RequestScheduler configured with the stub's quota.
+
+The workload is a bulk backlog with interactive requests arriving on top. The benchmark
+reports throughput against the quota, the 429s the stub had to send, and the latency of
+each priority class:
+
+    python -m benchmarks.scheduler --limit 3000 --requests 400
+    python -m benchmarks.scheduler --error-rate 0.05 --scheduler-limit 3600
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+from app.services.scheduler import BULK, INTERACTIVE, RequestScheduler, TokenBucket
+
+
+class StubProvider:
+    """
+    A throttling embedding endpoint on localhost.
+    """
+
+    def __init__(self, limit: float, burst: float, latency: float, error_rate: float, seed: int = 0):
+        self.bucket = TokenBucket(limit, capacity=limit * burst / 60.0)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.counts = {"ok": 0, "throttled": 0, "errors": 0}
+        self.lock = threading.Lock()
+        ThreadingHTTPServer.request_queue_size = 256
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}/embed"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("content-length", 0)))
+                with stub.lock:
+                    now = time.monotonic()
+                    wait = stub.bucket.delay(1, now)
+                    if wait > 0:
+                        stub.counts["throttled"] += 1
+                        status = 429
+                    else:
+                        stub.bucket.consume(1, now)
+                        status = 503 if stub.random.random() < stub.error_rate else 200
+                        stub.counts["errors" if status == 503 else "ok"] += 1
+                if status == 200:
+                    time.sleep(stub.latency)
+                body = json.dumps({"embeddings": [[0.0] * 8]} if status == 200 else {"message": "slow down"}).encode()
+                self.send_response(status)
+                if status == 429:
+                    self.send_header("Retry-After", f"{wait:.3f}")
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def run_workload(stub: StubProvider, send, args) -> dict:
+    """
+    Submits the bulk backlog at once, then interactive requests at a steady pace.
+    `send(client, priority)` makes one request and raises on a final failure.
+    """
+    latencies = {INTERACTIVE: [], BULK: []}
+    failures = 0
+
+    async def one(client, priority):
+        nonlocal failures
+        start = time.perf_counter()
+        try:
+            await send(client, priority)
+            latencies[priority].append(time.perf_counter() - start)
+        except Exception:
+            failures += 1
+
+    n_interactive = int(args.requests * args.interactive_share)
+    limits = httpx.Limits(max_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        start = time.perf_counter()
+        tasks = [asyncio.create_task(one(client, BULK)) for _ in range(args.requests - n_interactive)]
+        for _ in range(n_interactive):
+            await asyncio.sleep(args.interactive_interval)
+            tasks.append(asyncio.create_task(one(client, INTERACTIVE)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+    succeeded = sum(len(values) for values in latencies.values())
+    return {"elapsed": elapsed, "succeeded": succeeded, "failures": failures, "latencies": latencies}
+
+
+async def naive(stub: StubProvider, args) -> dict:
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def send(client, priority):
+        for _ in range(args.naive_retries + 1):
+            async with semaphore:
+                response = await client.post(stub.url, json={"texts": ["hello"]})
+            if response.status_code == 200:
+                return
+            await asyncio.sleep(0.05)
+        response.raise_for_status()
+
+    return await run_workload(stub, send, args)
+
+
+async def scheduled(stub: StubProvider, args) -> dict:
+    scheduler = RequestScheduler(
+        limits={"stub": {"rpm": args.scheduler_limit or args.limit, "burst_seconds": args.burst}},
+        max_retries=args.naive_retries, base_delay=0.1, max_delay=5.0,
+    )
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def post(client):
+        async with semaphore:
+            response = await client.post(stub.url, json={"texts": ["hello"]})
+        response.raise_for_status()
+        return response
+
+    async def send(client, priority):
+        await scheduler.acall("stub/embed", post, client, priority=priority)
+
+    result = await run_workload(stub, send, args)
+    result["scheduler"] = scheduler.stats()["stub"]
+    return result
+
+
+def report(name: str, stub: StubProvider, result: dict, limit: float):
+    throughput = result["succeeded"] / result["elapsed"]
+    interactive, bulk = result["latencies"][INTERACTIVE], result["latencies"][BULK]
+    print(
+        f"{name:>9} {result['succeeded']:>6} {result['failures']:>5} {throughput:>9.1f} {throughput / (limit / 60):>8.0%} "
+        f"{stub.counts['throttled']:>6} {percentile(interactive, 0.5):>8.2f} {percentile(interactive, 0.95):>8.2f} "
+        f"{percentile(bulk, 0.5):>8.2f} {percentile(bulk, 0.95):>8.2f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limit", type=float, default=3000, help="Stub quota in requests per minute")
+    parser.add_argument("--burst", type=float, default=1.0, help="Seconds of quota the stub allows at once")
+    parser.add_argument("--scheduler-limit", type=float, help="Requests per minute given to the scheduler (default: --limit)")
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds the stub takes per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of admitted requests answered with 503")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--interactive-share", type=float, default=0.1)
+    parser.add_argument("--interactive-interval", type=float, default=0.1, help="Seconds between interactive requests")
+    parser.add_argument("--naive-retries", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"quota {args.limit:.0f} rpm ({args.limit / 60:.1f} req/s), {args.requests} requests, "
+          f"{args.interactive_share:.0%} interactive")
+    print(f"{'mode':>9} {'ok':>6} {'fail':>5} {'req/s':>9} {'of quota':>8} {'429s':>6} "
+          f"{'int p50':>8} {'int p95':>8} {'bulk p50':>8} {'bulk p95':>8}")
+    for name, run in (("naive", naive), ("scheduled", scheduled)):
+        with StubProvider(args.limit, args.burst, args.latency, args.error_rate) as stub:
+            result = asyncio.run(run(stub, args))
+            report(name, stub, result, args.limit)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Measures cold start of the API in fresh interpreters.
+
+`import` mode times `import app.main` and lists which heavy libraries were loaded by it.
+`serve` mode starts `uvicorn app.main:app` and times until `GET /` answers. Each run uses a new
+process, so nothing is warm except the OS file cache:
+
+    python -m benchmarks.startup --runs 5
+    python -m benchmarks.startup --mode serve --runs 3
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+HEAVY_MODULES = ("llama_index", "matplotlib", "sklearn", "scipy", "qdrant_client", "cohere", "openai")
+
+IMPORT_PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - start
+loaded = [name for name in {HEAVY_MODULES!r} if name in sys.modules]
+print(json.dumps({{"seconds": elapsed, "loaded": loaded}}))
+"""
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_import() -> dict:
+    result = subprocess.run([sys.executable, "-c", IMPORT_PROBE], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"import app.main failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def time_serve(timeout: float = 120.0) -> float:
+    port = _free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                if server.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with code {server.returncode}")
+                time.sleep(0.02)
+        raise TimeoutError(f"The server did not answer within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["import", "serve"], default="import")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    # Offline defaults so the benchmark does not depend on real credentials
+    os.environ.setdefault("QDRANT_URL", ":memory:")
+
+    timings = []
+    for run in range(args.runs):
+        if args.mode == "import":
+            result = time_import()
+            timings.append(result["seconds"])
+            print(f"run {run + 1}: import app.main {result['seconds']:.3f}s, heavy modules loaded: {result['loaded'] or 'none'}")
+        else:
+            seconds = time_serve()
+            timings.append(seconds)
+            print(f"run {run + 1}: uvicorn answered GET / after {seconds:.3f}s")
+
+    print(f"median {statistics.median(timings):.3f}s, min {min(timings):.3f}s, max {max(timings):.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,431 @@
+"""
+Micro-benchmark suite for the numeric, plotting, text and docstore hot paths.
+
+Runs fully offline: embeddings come from the deterministic hash provider and corpora are
+generated from fixed seeds, so two runs of the same commit measure the same work. Results are
+saved as JSON (by default under benchmarks/results/, named after the commit) and two result
+files can be compared to flag regressions:
+
+    python -m benchmarks run                     # every benchmark, all sizes
+    python -m benchmarks run --quick -k scatter  # small sizes only, names containing "scatter"
+    python -m benchmarks list
+    python -m benchmarks compare <baseline-ref> HEAD-dirty --threshold 0.1
+
+`compare` takes result files or commit ids of saved results. A benchmark regresses when its
+median got slower by more than the threshold and the interquartile ranges of the two runs do
+not overlap; the command then exits non-zero.
+"""
+
+import argparse
+import contextlib
+import datetime
+import gc
+import glob
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+SAMPLE_PDFS = "app/database/sample/*.pdf"
+DIM = 384
+
+# name -> (factory(param) -> zero-argument callable to time, params, quick params)
+BENCHMARKS = {}
+
+
+def benchmark(name: str, params=(None,), quick=None):
+    """
+    Registers a benchmark. The decorated factory does the setup for one parameter and
+    returns the callable that is timed.
+    """
+    def register(factory):
+        BENCHMARKS[name] = (factory, tuple(params), tuple(params if quick is None else quick))
+        return factory
+
+    return register
+
+
+def fake_embeddings(n: int, dim: int = DIM) -> list:
+    """
+    Deterministic embeddings of n synthetic texts from the offline hash provider.
+    """
+    from app.services.hash_embedding import hash_embed
+
+    return [hash_embed(f"benchmark text {i} about topic {i % 17} and vectors", dim) for i in range(n)]
+
+
+_handler = None
+
+
+def embedding_handler():
+    global _handler
+    if _handler is None:
+        from app.services.embeddings import TextEmbeddingHandler
+
+        _handler = TextEmbeddingHandler()
+    return _handler
+
+
+def sample_pages() -> list:
+    import fitz
+
+    pages = []
+    for path in sorted(glob.glob(SAMPLE_PDFS)):
+        with fitz.open(path) as document:
+            pages.extend(page.get_text("text", sort=True) for page in document)
+    if not pages:
+        raise RuntimeError(f"No sample PDFs found at {SAMPLE_PDFS}, run from the Backend directory.")
+    return pages
+
+
+@benchmark("cosine_similarity", params=(384, 1536))
+def bench_cosine_similarity(dim):
+    first, second = fake_embeddings(2, dim)
+    handler = embedding_handler()
+    return lambda: handler.calculate_cosine_similarity(first, second)
+
+
+@benchmark("euclidean_distance", params=(384, 1536))
+def bench_euclidean_distance(dim):
+    first, second = fake_embeddings(2, dim)
+    handler = embedding_handler()
+    return lambda: handler.calculate_euclidean_distance(first, second)
+
+
+@benchmark("scatter_coordinates", params=(10, 1000, 50000), quick=(10, 1000))
+def bench_scatter_coordinates(points):
+    embeddings = fake_embeddings(points)
+    handler = embedding_handler()
+    return lambda: handler.scatter_plot_embeddings(embeddings, response_type="coordinates")
+
+
+@benchmark("scatter_base64", params=(10, 1000, 50000), quick=(10, 1000))
+def bench_scatter_base64(points):
+    embeddings = fake_embeddings(points)
+    # Labels are categories that color the points, one legend entry each
+    labels = [f"topic {i % 5}" for i in range(points)]
+    handler = embedding_handler()
+    return lambda: handler.scatter_plot_embeddings(embeddings, labels=labels, response_type="base64")
+
+
+@benchmark("plot_embedding_comparison")
+def bench_plot_embedding_comparison(_):
+    import numpy as np
+
+    # Hash embeddings are sparse and mostly zero in the two plotted dimensions, which would
+    # collapse the axes, so the comparison draws seeded dense vectors instead
+    first, second = np.random.default_rng(0).normal(size=(2, DIM)).tolist()
+    handler = embedding_handler()
+    return lambda: handler.plot_embedding_comparison(first, second, type="base64")
+
+
+@benchmark("clean_sample_pdfs")
+def bench_clean(_):
+    from app.helpers.pdf_helpers import handle_chapter_headers_footers
+    from app.helpers.text_cleaning_helpers import clean
+    from benchmarks.text_cleaning import INGESTION_OPTIONS
+
+    pages = [handle_chapter_headers_footers(page.split("\n"), "remove_last") for page in sample_pages()]
+    return lambda: [clean(page, **INGESTION_OPTIONS) for page in pages]
+
+
+@benchmark("handle_chapter_headers_footers")
+def bench_handle_chapter_headers_footers(_):
+    from app.helpers.pdf_helpers import handle_chapter_headers_footers
+
+    lines = [page.split("\n") for page in sample_pages()]
+    return lambda: [handle_chapter_headers_footers(page, "remove_last") for page in lines]
+
+
+@benchmark("extract_text")
+def bench_extract_text(_):
+    import fitz
+
+    from app.helpers.pdf_helpers import extract_text
+
+    path = sorted(glob.glob(SAMPLE_PDFS))[0]
+
+    def run():
+        with fitz.open(path) as document:
+            return [extract_text(page, path, "Sample", "Unknown", "remove_last") for page in document]
+
+    return run
+
+
+def _docstore(fmt: str, n: int, root: str) -> str:
+    from benchmarks.binary_store import write_json_corpus
+    from app.services.binary_store import migrate
+
+    json_dir = os.path.join(root, f"json-{n}")
+    if not os.path.isdir(json_dir):
+        write_json_corpus(json_dir, n, DIM)
+    if fmt == "json":
+        return json_dir
+    binary_dir = os.path.join(root, f"binary-{n}")
+    if not os.path.isdir(binary_dir):
+        migrate(json_dir, binary_dir)
+    return binary_dir
+
+
+@benchmark("docstore_load_json", params=(1000, 5000, 20000), quick=(1000,))
+def bench_docstore_load_json(n):
+    from app.helpers.utils import get_documents_from_docstore
+
+    path = _docstore("json", n, _scratch())
+    return lambda: get_documents_from_docstore(path)
+
+
+@benchmark("docstore_load_binary", params=(1000, 5000, 20000), quick=(1000,))
+def bench_docstore_load_binary(n):
+    from app.helpers.utils import get_documents_from_docstore
+
+    path = _docstore("binary", n, _scratch())
+
+    def run():
+        documents = get_documents_from_docstore(path)
+        # The binary store is lazy, so touch a few documents as the RAG setup would
+        return [documents[i].text for i in range(0, len(documents), max(1, len(documents) // 10))]
+
+    return run
+
+
+_scratch_dir = None
+
+
+def _scratch() -> str:
+    global _scratch_dir
+    if _scratch_dir is None:
+        _scratch_dir = tempfile.TemporaryDirectory(prefix="benchmarks-")
+    return _scratch_dir.name
+
+
+def measure(fn, min_rounds: int = 5, min_time: float = 1.0, max_time: float = 10.0, round_time: float = 0.01) -> dict:
+    """
+    Times `fn` after one warm-up call. Fast callables are repeated within a round so one
+    round lasts about `round_time`; rounds continue until both `min_rounds` and `min_time`
+    are reached, or `max_time` has passed with at least three rounds.
+    """
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        fn()
+        once = time.perf_counter() - start
+        iterations = max(1, int(round_time / once)) if once > 0 else 1000
+        gc.collect()
+        timings = []
+        began = time.perf_counter()
+        while True:
+            start = time.perf_counter()
+            for _ in range(iterations):
+                fn()
+            timings.append((time.perf_counter() - start) / iterations)
+            elapsed = time.perf_counter() - began
+            if len(timings) >= min_rounds and elapsed >= min_time:
+                break
+            if elapsed >= max_time and len(timings) >= 3:
+                break
+
+    q1, _, q3 = statistics.quantiles(timings, n=4) if len(timings) > 1 else (timings[0],) * 3
+    median = statistics.median(timings)
+    return {
+        "min": min(timings),
+        "max": max(timings),
+        "mean": statistics.fmean(timings),
+        "median": median,
+        "stddev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        "q1": q1,
+        "q3": q3,
+        "rounds": len(timings),
+        "iterations": iterations,
+        "ops": 1 / median if median > 0 else None,
+    }
+
+
+def _git(*args) -> str:
+    try:
+        return subprocess.run(["git", *args], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def commit_info() -> dict:
+    return {
+        "id": _git("rev-parse", "HEAD") or None,
+        "branch": _git("rev-parse", "--abbrev-ref", "HEAD") or None,
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+    }
+
+
+def machine_info() -> dict:
+    import numpy as np
+
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+    }
+
+
+def selected(filters: list, quick: bool) -> list:
+    cases = []
+    for name, (factory, params, quick_params) in BENCHMARKS.items():
+        for param in (quick_params if quick else params):
+            full_name = name if param is None else f"{name}[{param}]"
+            if not filters or any(text in full_name for text in filters):
+                cases.append((full_name, name, param, factory))
+    return cases
+
+
+def run(args) -> int:
+    # Offline settings; the timed functions log every call, so keep the log quiet unless asked otherwise
+    os.environ.setdefault("QDRANT_URL", ":memory:")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    cases = selected(args.k, args.quick)
+    if not cases:
+        print("No benchmark matches the filter.")
+        return 1
+
+    results = []
+    for full_name, name, param, factory in cases:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            fn = factory(param)
+        stats = measure(fn, min_rounds=args.min_rounds, min_time=args.min_time, max_time=args.max_time)
+        results.append({"name": full_name, "group": name, "param": param, "stats": stats})
+        print(f"{full_name:<40} {_format_seconds(stats['median']):>10}  "
+              f"(IQR {_format_seconds(stats['q1'])} - {_format_seconds(stats['q3'])}, {stats['rounds']} rounds)")
+
+    info = commit_info()
+    output = args.output
+    if output is None:
+        name = (info["id"] or "unknown")[:12] + ("-dirty" if info["dirty"] else "")
+        output = os.path.join(RESULTS_DIR, f"{name}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "version": 1,
+            "datetime": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "quick": args.quick,
+            "commit_info": info,
+            "machine_info": machine_info(),
+            "benchmarks": results,
+        }, f, indent=2)
+    print(f"Saved {len(results)} results to {output}")
+
+    if args.compare:
+        return compare_files(resolve(args.compare), output, args.threshold)
+    return 0
+
+
+def resolve(reference: str) -> str:
+    """
+    A result file path, or the saved result of a commit id (prefix), e.g. "<commit>-dirty".
+    """
+    if os.path.isfile(reference):
+        return reference
+    matches = sorted(glob.glob(os.path.join(RESULTS_DIR, f"{reference}*.json")))
+    revision, dirty, suffix = reference.rpartition("-dirty") if reference.endswith("-dirty") else (reference, "", "")
+    if not matches and _git("rev-parse", "--verify", "--quiet", revision):
+        commit = _git("rev-parse", revision)[:12]
+        matches = glob.glob(os.path.join(RESULTS_DIR, f"{commit}{dirty}.json"))
+    if len(matches) != 1:
+        found = ", ".join(os.path.basename(match) for match in matches) or "none"
+        raise SystemExit(f"Could not resolve '{reference}' to one result file in {RESULTS_DIR} (found: {found}).")
+    return matches[0]
+
+
+def _format_seconds(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def compare_results(base: dict, new: dict, threshold: float) -> list:
+    """
+    Pairs the benchmarks of two runs. Returns (name, base stats, new stats, change, verdict) rows;
+    the verdict is "regression" or "improvement" when the medians differ by more than
+    `threshold` and the interquartile ranges do not overlap, else "same".
+    """
+    base_by_name = {item["name"]: item["stats"] for item in base["benchmarks"]}
+    rows = []
+    for item in new["benchmarks"]:
+        before, after = base_by_name.get(item["name"]), item["stats"]
+        if before is None:
+            rows.append((item["name"], None, after, None, "new"))
+            continue
+        change = after["median"] / before["median"] - 1
+        if change > threshold and after["q1"] > before["q3"]:
+            verdict = "regression"
+        elif change < -threshold and after["q3"] < before["q1"]:
+            verdict = "improvement"
+        else:
+            verdict = "same"
+        rows.append((item["name"], before, after, change, verdict))
+    return rows
+
+
+def compare_files(base_path: str, new_path: str, threshold: float) -> int:
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    if base.get("machine_info") != new.get("machine_info"):
+        print("Warning: the runs were made on different machines or Python/numpy versions.")
+
+    def label(results: dict, path: str) -> str:
+        commit = results.get("commit_info") or {}
+        return (commit.get("id") or os.path.basename(path))[:12] + ("-dirty" if commit.get("dirty") else "")
+
+    rows = compare_results(base, new, threshold)
+    print(f"{'benchmark':<40} {label(base, base_path):>14} {label(new, new_path):>14} {'change':>9}  verdict")
+    for name, before, after, change, verdict in rows:
+        before_text = _format_seconds(before["median"]) if before else "-"
+        change_text = f"{change:+.1%}" if change is not None else "-"
+        marker = verdict.upper() if verdict == "regression" else verdict
+        print(f"{name:<40} {before_text:>14} {_format_seconds(after['median']):>14} {change_text:>9}  {marker}")
+
+    regressions = [row for row in rows if row[4] == "regression"]
+    print(f"{len(regressions)} regression(s) above {threshold:.0%} out of {len(rows)} benchmarks")
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run the suite and save the results as JSON")
+    run_parser.add_argument("-k", action="append", default=[], help="Only benchmarks whose name contains this (repeatable)")
+    run_parser.add_argument("--quick", action="store_true", help="Skip the largest sizes")
+    run_parser.add_argument("--output", help="Result file (default: benchmarks/results/<commit>.json)")
+    run_parser.add_argument("--min-rounds", type=int, default=5)
+    run_parser.add_argument("--min-time", type=float, default=1.0, help="Seconds to spend on each benchmark at least")
+    run_parser.add_argument("--max-time", type=float, default=10.0, help="Seconds after which a slow benchmark stops at 3 rounds")
+    run_parser.add_argument("--compare", help="Compare the new results with this result file or commit")
+    run_parser.add_argument("--threshold", type=float, default=0.1)
+
+    compare_parser = commands.add_parser("compare", help="Compare two result files or commits")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="Relative slowdown of the median flagged as a regression")
+
+    commands.add_parser("list", help="List the benchmarks")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        sys.exit(run(args))
+    if args.command == "compare":
+        sys.exit(compare_files(resolve(args.base), resolve(args.new), args.threshold))
+    for full_name, _, _, _ in selected([], quick=False):
+        print(full_name)
+
+
+if __name__ == "__main__":
+    main()
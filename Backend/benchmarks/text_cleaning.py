@@ -0,0 +1,133 @@
+"""
+Micro-benchmark and golden-output check for the text cleaning helpers.
+
+Extracts every page of the sample PDFs the same way ingestion does, then:
+
+1. checks that `clean` and `TextCleaner` give byte-identical output to the original
+   pass-by-pass implementation for every combination of options (exits non-zero otherwise);
+2. times the original implementation, `clean`, and `TextCleaner.clean_many` with the options
+   used by ingestion.
+
+    python -m benchmarks.text_cleaning --repeat 5
+"""
+
+import argparse
+import glob
+import itertools
+import re
+import sys
+import time
+
+import fitz
+
+from app.helpers.pdf_helpers import handle_chapter_headers_footers
+from app.helpers.text_cleaning_helpers import TextCleaner, UNICODE_BULLETS_RE, clean
+
+OPTIONS = ("extra_whitespace", "broken_paragraphs", "bullets", "ascii", "lowercase", "citations", "merge_split_words")
+
+INGESTION_OPTIONS = dict(
+    extra_whitespace=True,
+    broken_paragraphs=True,
+    bullets=True,
+    ascii=True,
+    lowercase=False,
+    citations=True,
+    merge_split_words=True,
+)
+
+
+def reference_clean(text, extra_whitespace=False, broken_paragraphs=False, bullets=False, ascii=False,
+                    lowercase=False, citations=False, merge_split_words=False):
+    """
+    The original implementation of `clean`, kept verbatim as the golden reference.
+    """
+    def clean_non_ascii_chars(text):
+        return text.encode("ascii", "ignore").decode()
+
+    def clean_bullets(text):
+        if UNICODE_BULLETS_RE.match(text) is None:
+            return text
+        return UNICODE_BULLETS_RE.sub(" ", text, 1).strip()
+
+    def clean_extra_whitespace(text):
+        cleaned_text = re.sub(r"[\xa0\n]", " ", text)
+        cleaned_text = re.sub(r"([ ]{2,})", " ", cleaned_text)
+        return cleaned_text.strip()
+
+    def merge_hyphenated_words(text):
+        return re.sub(r'(\w+)-\s+(\w+)', r'\1\2', text)
+
+    def remove_citations(text):
+        return re.sub(r"\[\d{1,3}\]", "", text)
+
+    cleaned_text = text.lower() if lowercase else text
+    cleaned_text = clean_non_ascii_chars(cleaned_text) if ascii else cleaned_text
+    cleaned_text = remove_citations(cleaned_text) if citations else cleaned_text
+    cleaned_text = clean_extra_whitespace(cleaned_text) if extra_whitespace else cleaned_text
+    cleaned_text = clean_bullets(cleaned_text) if bullets else cleaned_text
+    cleaned_text = merge_hyphenated_words(cleaned_text) if merge_split_words else cleaned_text
+    return cleaned_text.strip()
+
+
+def load_pages(pattern: str) -> list:
+    """
+    Raw page texts as `extract_text` sees them before cleaning, plus the unjoined text
+    so that newline handling is exercised too.
+    """
+    pages = []
+    for path in sorted(glob.glob(pattern)):
+        with fitz.open(path) as document:
+            for page in document:
+                raw = page.get_text("text", sort=True)
+                pages.append(raw)
+                pages.append(handle_chapter_headers_footers(raw.split("\n"), "remove_last"))
+    return pages
+
+
+def check_golden(pages: list) -> int:
+    mismatches = 0
+    for flags in itertools.product((False, True), repeat=len(OPTIONS)):
+        options = dict(zip(OPTIONS, flags))
+        expected = [reference_clean(page, **options) for page in pages]
+        cleaner = TextCleaner(**options)
+        if [clean(page, **options) for page in pages] != expected or cleaner.clean_many(pages) != expected:
+            mismatches += 1
+            print(f"MISMATCH for options {options}")
+    return mismatches
+
+
+def best_of(repeat: int, fn) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdfs", default="app/database/sample/*.pdf")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    pages = load_pages(args.pdfs)
+    characters = sum(len(page) for page in pages)
+    print(f"Loaded {len(pages)} page texts ({characters / 1e6:.2f}M characters)")
+
+    combinations = 2 ** len(OPTIONS)
+    mismatches = check_golden(pages)
+    print(f"Golden check: {combinations - mismatches}/{combinations} option combinations identical")
+
+    cleaner = TextCleaner(**INGESTION_OPTIONS)
+    reference = best_of(args.repeat, lambda: [reference_clean(page, **INGESTION_OPTIONS) for page in pages])
+    per_call = best_of(args.repeat, lambda: [clean(page, **INGESTION_OPTIONS) for page in pages])
+    batch = best_of(args.repeat, lambda: cleaner.clean_many(pages))
+    for name, seconds in (("reference", reference), ("clean()", per_call), ("clean_many()", batch)):
+        print(f"{name:>14}: {1000 * seconds:8.2f} ms  {characters / seconds / 1e6:8.1f} M chars/s  x{reference / seconds:.2f}")
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmarks the local vector index backends on a synthetic clustered corpus.
+
+Reports build time, query throughput and recall@k of the approximate backend against the
+exact backend. Runs fully offline:
+
+    python -m benchmarks.vector_index --n 50000 --dim 384 --k 10
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from app.services.vector_index import create_index
+
+
+def make_corpus(n: int, dim: int, n_clusters: int, seed: int = 0):
+    """
+    Gaussian blobs around random centers, which is closer to real embedding corpora than uniform noise.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, n_clusters, size=n)
+    return centers[labels] + 0.35 * rng.normal(size=(n, dim)).astype(np.float32)
+
+
+def recall_at_k(approximate: list, exact: list) -> float:
+    hits = sum(len({i for i, _ in a} & {i for i, _ in e}) for a, e in zip(approximate, exact))
+    return hits / sum(len(e) for e in exact)
+
+
+def timed_search(index, queries: np.ndarray, k: int):
+    start = time.perf_counter()
+    results = index.search(queries, k=k)
+    return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--metric", default="cosine", choices=["cosine", "dot", "l2"])
+    parser.add_argument("--nlist", type=int, default=256)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.n + args.queries, args.dim, n_clusters=max(args.nlist // 2, 8))
+    data, queries = corpus[:args.n], corpus[args.n:]
+    ids = [str(i) for i in range(args.n)]
+
+    start = time.perf_counter()
+    exact = create_index("exact", metric=args.metric)
+    exact.add(ids, data)
+    print(f"exact: built {args.n} x {args.dim} in {time.perf_counter() - start:.2f}s")
+    truth, elapsed = timed_search(exact, queries, args.k)
+    print(f"exact: {len(queries) / elapsed:,.0f} queries/s ({1000 * elapsed / len(queries):.2f} ms/query)")
+
+    start = time.perf_counter()
+    ivf = create_index("ivf", metric=args.metric, nlist=args.nlist)
+    ivf.add(ids, data)
+    if not ivf.is_trained:
+        ivf.train()
+    print(f"ivf:   built and trained nlist={args.nlist} in {time.perf_counter() - start:.2f}s")
+
+    print(f"{'nprobe':>8} {'queries/s':>12} {'ms/query':>10} {'recall@' + str(args.k):>10}")
+    for nprobe in args.nprobe:
+        ivf.nprobe = nprobe
+        results, elapsed = timed_search(ivf, queries, args.k)
+        print(
+            f"{nprobe:>8} {len(queries) / elapsed:>12,.0f} {1000 * elapsed / len(queries):>10.2f} "
+            f"{recall_at_k(results, truth):>10.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()